@@ -1,6 +1,20 @@
+from typing import TYPE_CHECKING, Optional
 import httpx
-from typing import AsyncGenerator
+from fastapi import Request
+from starlette.requests import HTTPConnection
+from app.services.quote_stream import QuoteStreamHub
 
-async def get_http_client() -> AsyncGenerator[httpx.AsyncClient, None]:
-    async with httpx.AsyncClient() as client:
-        yield client
\ No newline at end of file
+if TYPE_CHECKING:
+    from app.services.shared_quote_cache import RedisQuoteCache
+
+async def get_http_client(request: Request) -> httpx.AsyncClient:
+    """Retorna o cliente HTTP compartilhado criado no lifespan da aplicação"""
+    return request.app.state.http_client
+
+async def get_quote_stream_hub(connection: HTTPConnection) -> QuoteStreamHub:
+    """Retorna o hub de streaming de cotações criado no lifespan da aplicação"""
+    return connection.app.state.quote_stream_hub
+
+async def get_shared_quote_cache(request: Request) -> Optional["RedisQuoteCache"]:
+    """Retorna o cache de cotações compartilhado (Redis), ou None se REDIS_URL não estiver configurado"""
+    return getattr(request.app.state, "shared_quote_cache", None)
@@ -1,43 +1,150 @@
-from fastapi import APIRouter, Depends, Path, Request
+import asyncio
+import hashlib
+import re
+from functools import lru_cache
+from typing import TYPE_CHECKING, AsyncIterator, Dict, FrozenSet, Iterable, List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Path, Query, Request, WebSocket, status
+from fastapi.responses import Response, StreamingResponse
 import httpx
-from app.api.dependencies import get_http_client
-from app.services.coin_desk_api_service import ExternalApiService
-from app.schemas.coin_desk import BTCDataResponse
-from slowapi.util import get_remote_address
-from slowapi import Limiter
+from app.api.dependencies import get_http_client, get_quote_stream_hub, get_shared_quote_cache
+from app.core.config import get_settings
+from app.core.exceptions import InstrumentNotFoundError
+from app.core.rate_limit import rate_limits, websocket_allowed
+from app.core.tracing import span
+from app.services.coin_desk_api_service import ExternalApiService, get_instrument_catalog, get_quote_cache, get_quote_history
+from app.services.prefetch_scheduler import instrument_popularity
+from app.services.quote_stream import QuoteStreamHub, StreamEnded
+from app.services.retry_policy import Deadline
+from app.schemas.coin_desk import BTCData, BTCDataResponse, CrossRate, BatchActivesResponse, BatchCrossRatesResponse, HistoryResponse, InstrumentSearchResponse
 from app.core.metrics import (
     FINANCE_API_ERROR_COUNTER,
     FINANCE_API_REQUESTS,
     MetricsTimer,
-    FINANCE_API_DURATION
+    FINANCE_API_DURATION,
+    FINANCE_BATCH_API_DURATION,
+    FINANCE_BATCH_SIZE,
+    bounded_label
 )
 
+if TYPE_CHECKING:
+    from app.services.shared_quote_cache import RedisQuoteCache
+
 router = APIRouter(prefix="/finance", tags=["Finance"])
-limiter = Limiter(key_func=get_remote_address)
+
+@lru_cache(maxsize=1)
+def _metrics_active_names() -> FrozenSet[str]:
+    """Ativos com label próprio nas métricas (METRICS_ACTIVE_NAME_ALLOWLIST)"""
+    return frozenset(
+        name.strip() for name in get_settings().METRICS_ACTIVE_NAME_ALLOWLIST.split(",") if name.strip()
+    )
+
+STREAM_RATE_LIMIT = "10/minute"
+
+def _parse_names(names: str, max_names: Optional[int] = None) -> List[str]:
+    """Converte a lista de ativos separados por vírgula, validando a quantidade (padrão: FINANCE_BATCH_MAX_NAMES)"""
+    actives = list(dict.fromkeys(name.strip() for name in names.split(",") if name.strip()))
+    if not actives:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Informe ao menos um ativo.")
+    max_names = max_names or get_settings().FINANCE_BATCH_MAX_NAMES
+    if len(actives) > max_names:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"No máximo {max_names} ativos por requisição."
+        )
+    return actives
+
+def _parse_stream_names(names: str) -> List[str]:
+    """
+    Converte e valida localmente os ativos de uma assinatura: cada ativo aceito
+    inicia um poller permanente no serviço externo.
+
+    Raises:
+        HTTPException: Se a lista for vazia ou tiver mais de STREAM_MAX_NAMES ativos
+        InstrumentNotFoundError: Se algum ativo for inválido ou inexistente
+    """
+    actives = _parse_names(names, get_settings().STREAM_MAX_NAMES)
+    catalog = get_instrument_catalog()
+    for active in actives:
+        catalog.validate(active)
+    return actives
+
+def _cache_headers(etag: str, actives: Iterable[str]) -> Dict[str, str]:
+    """
+    ETag e Cache-Control de uma resposta de cotações. O max-age é o menor tempo
+    restante no cache entre os ativos da resposta, para que clientes e CDN não
+    reaproveitem o corpo além da expiração da cotação (0 se já expirou ou não está no cache).
+    """
+    cache = get_quote_cache()
+    remaining = [cache.time_to_expiry(active) for active in actives]
+    max_age = min((ttl or 0.0 for ttl in remaining), default=0.0)
+    return {"ETag": etag, "Cache-Control": f"public, max-age={int(max(max_age, 0.0))}"}
+
+def _is_not_modified(request: Request, etag: str) -> bool:
+    """Verifica se o ETag atual está em If-None-Match (comparação fraca, como exige a RFC 9110)"""
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+def _batch_etag(quotes: Dict[str, BTCData], errors: Dict[str, str]) -> str:
+    """ETag de um lote: muda quando o CCSEQ de algum ativo ou a lista de erros muda"""
+    digest = hashlib.blake2b(digest_size=12)
+    for name in sorted(quotes):
+        digest.update(f"{name}:{quotes[name].ccseq};".encode())
+    for name in sorted(errors):
+        digest.update(f"{name}!{errors[name]};".encode())
+    return f'"{digest.hexdigest()}"'
+
+DURATION_PATTERN = re.compile(r"^(\d+)([smhd])$")
+DURATION_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+HISTORY_MAX_CANDLES = 1440
+
+def _parse_duration(value: str, name: str) -> int:
+    """Converte durações como "30s", "1m", "1h" ou "1d" em segundos"""
+    match = DURATION_PATTERN.match(value.strip())
+    if not match or int(match.group(1)) == 0:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Parâmetro {name} inválido: use um número seguido de s, m, h ou d (ex: 1m)."
+        )
+    return int(match.group(1)) * DURATION_UNITS[match.group(2)]
 
 @router.get(
     "/active/{active_name}",
     response_model=BTCDataResponse,
     summary="Busca informações de um ativo financeiro em um serviço externo"
 )
-@limiter.limit("10/minute")
+@rate_limits.limit("10/minute")
 async def get_integrated_active(
     active_name: str = Path(..., title="O nome do ativo a ser buscado", example="BTC-BRL"),
     http_client: httpx.AsyncClient = Depends(get_http_client),
+    shared_cache: Optional["RedisQuoteCache"] = Depends(get_shared_quote_cache),
     request: Request = None
 ):
     """
     Endpoint que orquestra a busca de informações de um ativo financeiro
     """
-    FINANCE_API_REQUESTS.labels(endpoint="/finance/active", active_name=active_name).inc()
+    metric_active_name = bounded_label(active_name, _metrics_active_names())
+    FINANCE_API_REQUESTS.labels(endpoint="/finance/active", active_name=metric_active_name).inc()
     
-    service = ExternalApiService(client=http_client)
+    service = ExternalApiService(client=http_client, shared_cache=shared_cache)
+    deadline = Deadline.after(get_settings().FINANCE_REQUEST_DEADLINE)
     
-    with MetricsTimer(FINANCE_API_DURATION, {"endpoint": "/finance/active", "active_name": active_name}):
+    with MetricsTimer(FINANCE_API_DURATION, {"endpoint": "/finance/active", "active_name": metric_active_name}):
         try:
-            external_active_data = await service.get_active_by_name(active_name)
-            response = BTCDataResponse(**{"BTC-DATA": external_active_data})
-            return response
+            external_active_data = await service.get_active_by_name(active_name, deadline)
+            # Só ativos válidos entram na popularidade usada pelo prefetch
+            instrument_popularity.record(active_name)
+            headers = _cache_headers(external_active_data.etag, [active_name])
+            if _is_not_modified(request, external_active_data.etag):
+                return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+            # A cotação já foi validada ao ser lida do serviço externo e o JSON
+            # fica memorizado com ela, então a resposta é enviada sem nova validação.
+            with span("serialize"):
+                content = external_active_data.to_response_json()
+            return Response(content=content, media_type="application/json", headers=headers)
         except Exception as e:
             FINANCE_API_ERROR_COUNTER.labels(
                 endpoint="/finance/active", 
@@ -45,5 +152,250 @@ async def get_integrated_active(
             ).inc()
             
             from app.core.logging import logger
-            logger.error(f"Erro no endpoint /finance/active: {e}")
+            logger.error("Erro no endpoint /finance/active: %s", e)
+            raise
+
+
+@router.get(
+    "/active/{active_name}/history",
+    response_model=HistoryResponse,
+    summary="Retorna candles OHLC/VWAP das cotações já buscadas de um ativo"
+)
+@rate_limits.limit("10/minute")
+async def get_active_history(
+    active_name: str = Path(..., title="O nome do ativo", example="BTC-BRL"),
+    interval: str = Query("1m", title="Duração de cada candle", example="1m"),
+    window: str = Query("1h", title="Janela de tempo até o último tick", example="1h"),
+    request: Request = None
+):
+    """
+    Endpoint que agrega o histórico em memória dos ticks recebidos do serviço
+    externo, sem fazer novas chamadas a ele.
+    """
+    interval_seconds = _parse_duration(interval, "interval")
+    window_seconds = _parse_duration(window, "window")
+    if window_seconds // interval_seconds > HISTORY_MAX_CANDLES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"A janela deve conter no máximo {HISTORY_MAX_CANDLES} candles."
+        )
+
+    metric_active_name = bounded_label(active_name, _metrics_active_names())
+    FINANCE_API_REQUESTS.labels(endpoint="/finance/active/history", active_name=metric_active_name).inc()
+
+    quote_history = get_quote_history()
+    if quote_history.get(active_name) is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Nenhum histórico registrado para o ativo {active_name}."
+        )
+
+    candles = quote_history.aggregate(active_name, interval_seconds, window_seconds)
+    return HistoryResponse(instrument=active_name, interval=interval_seconds, window=window_seconds, candles=candles)
+
+
+@router.get(
+    "/instruments",
+    response_model=InstrumentSearchResponse,
+    summary="Busca instrumentos no catálogo local pelo prefixo do nome"
+)
+@rate_limits.limit("30/minute")
+async def search_instruments(
+    query: str = Query("", title="Prefixo do nome do instrumento", example="BTC", max_length=32),
+    limit: int = Query(20, ge=1, le=100, title="Número máximo de instrumentos"),
+    request: Request = None
+):
+    """
+    Endpoint que consulta o catálogo de instrumentos atualizado periodicamente
+    a partir do serviço externo, sem chamá-lo a cada requisição.
+    """
+    catalog = get_instrument_catalog()
+    return InstrumentSearchResponse(query=query, catalog_loaded=catalog.loaded, instruments=catalog.search(query, limit))
+
+
+@router.get(
+    "/rate/{pair}",
+    response_model=CrossRate,
+    summary="Taxa de conversão de um par, derivada das cotações em cache quando possível"
+)
+@rate_limits.limit("30/minute")
+async def get_cross_rate(
+    pair: str = Path(..., title="Par de moedas", example="BTC-EUR"),
+    http_client: httpx.AsyncClient = Depends(get_http_client),
+    shared_cache: Optional["RedisQuoteCache"] = Depends(get_shared_quote_cache),
+    request: Request = None
+):
+    """
+    Endpoint que calcula o par a partir das cotações recentes já em cache
+    (ex: BTC-EUR via BTC-USD e EUR-USD) e só consulta o serviço externo
+    quando não há caminho de conversão recente o bastante.
+    """
+    service = ExternalApiService(client=http_client, shared_cache=shared_cache)
+    deadline = Deadline.after(get_settings().FINANCE_REQUEST_DEADLINE)
+    try:
+        return await service.get_cross_rate(pair, deadline)
+    except Exception as e:
+        FINANCE_API_ERROR_COUNTER.labels(endpoint="/finance/rate", error_type=e.__class__.__name__).inc()
+        raise
+
+
+@router.get(
+    "/rates",
+    response_model=BatchCrossRatesResponse,
+    summary="Taxas de conversão de vários pares em uma única requisição"
+)
+@rate_limits.limit("10/minute")
+async def get_cross_rates(
+    pairs: str = Query(..., title="Pares de moedas separados por vírgula", example="BTC-EUR,ETH-BRL"),
+    http_client: httpx.AsyncClient = Depends(get_http_client),
+    shared_cache: Optional["RedisQuoteCache"] = Depends(get_shared_quote_cache),
+    request: Request = None
+):
+    """
+    Endpoint que calcula juntos os pares com caminho de conversão recente nas
+    cotações em cache e busca os demais no serviço externo em chamadas agrupadas.
+    Pares com erro são reportados em "Err" sem invalidar o lote.
+    """
+    pair_names = _parse_names(pairs)
+    FINANCE_BATCH_SIZE.labels(endpoint="/finance/rates").observe(len(pair_names))
+
+    service = ExternalApiService(client=http_client, shared_cache=shared_cache)
+    deadline = Deadline.after(get_settings().FINANCE_REQUEST_DEADLINE)
+    with MetricsTimer(FINANCE_BATCH_API_DURATION, {"endpoint": "/finance/rates"}):
+        try:
+            rates, errors = await service.get_cross_rates(pair_names, deadline)
+            return BatchCrossRatesResponse(Data=rates, Err=errors)
+        except Exception as e:
+            FINANCE_API_ERROR_COUNTER.labels(endpoint="/finance/rates", error_type=e.__class__.__name__).inc()
+            raise
+
+
+@router.get(
+    "/actives",
+    response_model=BatchActivesResponse,
+    summary="Busca informações de vários ativos financeiros em uma única requisição"
+)
+@rate_limits.limit("10/minute")
+async def get_integrated_actives(
+    names: str = Query(..., title="Nomes dos ativos separados por vírgula", example="BTC-BRL,ETH-USD"),
+    http_client: httpx.AsyncClient = Depends(get_http_client),
+    shared_cache: Optional["RedisQuoteCache"] = Depends(get_shared_quote_cache),
+    request: Request = None,
+    response: Response = None
+):
+    """
+    Endpoint que busca vários ativos agrupando-os no menor número de chamadas
+    ao serviço externo. Ativos com erro são reportados em "Err" sem invalidar o lote.
+    """
+    actives = _parse_names(names)
+    FINANCE_BATCH_SIZE.labels(endpoint="/finance/actives").observe(len(actives))
+
+    service = ExternalApiService(client=http_client, shared_cache=shared_cache)
+    deadline = Deadline.after(get_settings().FINANCE_REQUEST_DEADLINE)
+
+    with MetricsTimer(FINANCE_BATCH_API_DURATION, {"endpoint": "/finance/actives"}):
+        try:
+            quotes, errors = await service.get_actives_by_names(actives, deadline)
+            etag = _batch_etag(quotes, errors)
+            if _is_not_modified(request, etag):
+                return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=_cache_headers(etag, quotes))
+            response.headers.update(_cache_headers(etag, quotes))
+            return BatchActivesResponse(Data=quotes, Err=errors)
+        except Exception as e:
+            FINANCE_API_ERROR_COUNTER.labels(
+                endpoint="/finance/actives",
+                error_type=e.__class__.__name__
+            ).inc()
+
+            from app.core.logging import logger
+            logger.error("Erro no endpoint /finance/actives: %s", e)
             raise
+
+
+async def _sse_events(hub: QuoteStreamHub, actives: List[str]) -> AsyncIterator[str]:
+    heartbeat_interval = get_settings().STREAM_HEARTBEAT_INTERVAL
+    subscription = hub.subscribe(actives, transport="sse")
+    try:
+        while True:
+            try:
+                message = await asyncio.wait_for(subscription.get(), timeout=heartbeat_interval)
+            except asyncio.TimeoutError:
+                yield ": heartbeat\n\n"
+                continue
+            if isinstance(message, StreamEnded):
+                yield f"event: end\ndata: {message.to_json()}\n\n"
+                if subscription.finished:
+                    return
+                continue
+            yield f"event: quote\ndata: {message.model_dump_json(by_alias=True)}\n\n"
+    finally:
+        hub.unsubscribe(subscription)
+
+
+@router.get(
+    "/stream/sse",
+    summary="Recebe cotações em tempo real via Server-Sent Events"
+)
+@rate_limits.limit(STREAM_RATE_LIMIT)
+async def stream_actives_sse(
+    names: str = Query(..., title="Nomes dos ativos separados por vírgula", example="BTC-BRL,ETH-USD"),
+    hub: QuoteStreamHub = Depends(get_quote_stream_hub),
+    request: Request = None
+):
+    """
+    Endpoint SSE que envia um evento "quote" a cada atualização dos ativos assinados
+    e um evento "end" quando um ativo deixa de existir no serviço externo.
+    """
+    actives = _parse_stream_names(names)
+    return StreamingResponse(
+        _sse_events(hub, actives),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.websocket("/stream/ws")
+async def stream_actives_ws(
+    websocket: WebSocket,
+    names: str = Query(..., title="Nomes dos ativos separados por vírgula"),
+    hub: QuoteStreamHub = Depends(get_quote_stream_hub)
+):
+    """
+    Endpoint WebSocket que envia cada atualização dos ativos assinados como JSON.
+    Um ativo que deixa de existir no serviço externo recebe uma mensagem final
+    {"instrument", "detail"}; sem ativos restantes, a conexão é fechada.
+    """
+    if not websocket_allowed(websocket, STREAM_RATE_LIMIT):
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="Limite de conexões excedido.")
+        return
+    try:
+        actives = _parse_stream_names(names)
+    except (HTTPException, InstrumentNotFoundError) as e:
+        # Recusado antes do handshake: o cliente recebe 403 e nenhum poller é criado
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason=str(e.detail).encode()[:120].decode(errors="ignore"))
+        return
+    await websocket.accept()
+    subscription = hub.subscribe(actives, transport="websocket")
+
+    async def send_quotes():
+        while True:
+            message = await subscription.get()
+            if isinstance(message, StreamEnded):
+                await websocket.send_text(message.to_json())
+                if subscription.finished:
+                    await websocket.close(reason="Nenhum ativo assinado continua disponível.")
+                    return
+                continue
+            await websocket.send_text(message.model_dump_json(by_alias=True))
+
+    async def wait_disconnect():
+        while (await websocket.receive())["type"] != "websocket.disconnect":
+            pass
+
+    tasks = [asyncio.create_task(send_quotes()), asyncio.create_task(wait_disconnect())]
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in tasks:
+            task.cancel()
+        hub.unsubscribe(subscription)
@@ -1,3 +1,4 @@
+from typing import Optional
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 class Settings(BaseSettings):
@@ -5,8 +6,114 @@ class Settings(BaseSettings):
 
     COIN_DESK_API: str
     GENDERIZE_API: str
+    COIN_DESK_MIRROR_APIS: str = "" # comma-separated base URLs serving the same tick API, used for failover
     LOG_LEVEL: str = "INFO"
+    LOG_JSON: bool = False
+    LOG_QUEUE_SIZE: int = 10000
+    LOG_SAMPLING: str = "api.health=100" # logger=N keeps 1 in N records below WARNING
+    TRACING_SAMPLE_RATE: float = 0.1 # fraction of requests traced; a W3C traceparent from TRACING_TRUSTED_NETWORKS overrides it
+    TRACING_TRUSTED_NETWORKS: str = "" # comma-separated client networks whose traceparent sampled flag is honored, e.g. 10.0.0.0/8
+    TRACING_EXPORT_PATH: str = "" # JSONL file receiving OTLP/JSON traces (empty disables)
+    TRACING_OTLP_ENDPOINT: str = "" # OTLP/HTTP collector URL, e.g. http://otel-collector:4318/v1/traces (empty disables)
+    TRACING_EXPORT_QUEUE_SIZE: int = 1000
+    EVENT_LOOP_MONITOR_ENABLED: bool = False
+    EVENT_LOOP_MONITOR_INTERVAL: float = 0.25 # in seconds
+    EVENT_LOOP_SLOW_CALLBACK_THRESHOLD: float = 0.1 # in seconds
+    DEBUG_PROFILE_TOKEN: str = "" # bearer token for /debug/profile (empty disables the endpoint)
+    DEBUG_PROFILE_MAX_SECONDS: float = 30.0 # in seconds
+    DEBUG_PROFILE_SAMPLE_INTERVAL: float = 0.005 # in seconds
+    LATENCY_STATS_WINDOW: float = 60.0 # in seconds
+    LATENCY_STATS_SLICES: int = 6
+    LATENCY_STATS_RELATIVE_ACCURACY: float = 0.01
+    LATENCY_STATS_MAX_BINS: int = 1024
+    LATENCY_STATS_MAX_SERIES: int = 256
+    LATENCY_SLO_TARGET: float = 0.5 # in seconds
+    METRICS_ACTIVE_NAME_ALLOWLIST: str = "BTC-BRL,BTC-USD,BTC-EUR,ETH-BRL,ETH-USD,ETH-EUR,SOL-USD,XRP-USD"
     CIRCUIT_BREAKER_FAIL_MAX: int = 5
     CIRCUIT_BREAKER_RESET_TIMEOUT: int = 30 # in seconds
+    CIRCUIT_BREAKER_WINDOW_SIZE: int = 20
+    CIRCUIT_BREAKER_FAILURE_RATE_THRESHOLD: float = 0.5
+    CIRCUIT_BREAKER_SLOW_CALL_DURATION: float = 5.0 # in seconds
+    CIRCUIT_BREAKER_HALF_OPEN_MAX_CALLS: int = 2
+    FINANCE_REQUEST_DEADLINE: float = 5.0 # in seconds
+    RETRY_MAX_ATTEMPTS: int = 3
+    RETRY_BACKOFF_BASE: float = 0.1 # in seconds
+    RETRY_BACKOFF_MAX: float = 1.0 # in seconds
+    RETRY_BUDGET_RATIO: float = 0.2
+    RETRY_BUDGET_WINDOW: int = 10 # in seconds
+    RETRY_BUDGET_MIN_PER_SECOND: float = 1.0
+    HEDGE_ENABLED: bool = False
+    HEDGE_MIN_DELAY: float = 0.05 # in seconds
+    HEDGE_QUANTILE: float = 0.95
+    CONCURRENCY_INITIAL_LIMIT: int = 20
+    CONCURRENCY_MIN_LIMIT: int = 2
+    CONCURRENCY_MAX_LIMIT: int = 50
+    CONCURRENCY_LATENCY_THRESHOLD: float = 1.0 # in seconds
+    CONCURRENCY_BACKOFF_RATIO: float = 0.9
+    CONCURRENCY_QUEUE_SIZE: int = 100
+    CONCURRENCY_MAX_QUEUE_WAIT: float = 1.0 # in seconds
+    CONCURRENCY_RETRY_AFTER: int = 1 # in seconds
+    HTTP_CLIENT_TIMEOUT: float = 10.0 # in seconds
+    HTTP_CLIENT_MAX_CONNECTIONS: int = 100
+    HTTP_CLIENT_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    HTTP_CLIENT_KEEPALIVE_EXPIRY: float = 30.0 # in seconds
+    HTTP_CLIENT_MAX_CONNECTIONS_PER_HOST: int = 50
+    HTTP_CLIENT_HTTP2: bool = False
+    QUOTE_CACHE_TTL: float = 5.0 # in seconds
+    QUOTE_CACHE_MAX_SIZE: int = 1024
+    QUOTE_CACHE_MAX_STALENESS: float = 10.0 # in seconds
+    HISTORY_ENABLED: bool = True
+    HISTORY_MAX_POINTS: int = 3600 # ticks per instrument
+    HISTORY_MAX_INSTRUMENTS: int = 256
+    HISTORY_SNAPSHOT_PATH: str = "" # empty disables snapshots
+    HISTORY_SNAPSHOT_INTERVAL: float = 60.0 # in seconds
+    WARM_START_SNAPSHOT_PATH: str = "" # empty disables the warm start snapshot
+    WARM_START_SNAPSHOT_INTERVAL: float = 30.0 # in seconds
+    WARM_START_MAX_AGE: float = 15.0 # in seconds
+    WARM_START_MAX_INSTRUMENTS: int = 200
+    REDIS_URL: str = "" # empty disables the shared quote cache
+    REDIS_SOCKET_TIMEOUT: float = 0.1 # in seconds
+    REDIS_RETRY_AFTER: float = 5.0 # in seconds
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_STORAGE_URI: str = "memory://"
+    RATE_LIMIT_STRATEGY: str = "moving-window"
+    PREFETCH_ENABLED: bool = True
+    PREFETCH_TOP_N: int = 20
+    PREFETCH_INTERVAL: float = 1.0 # in seconds
+    PREFETCH_REFRESH_AHEAD: float = 1.5 # in seconds
+    PREFETCH_DECAY: float = 0.9
+    STREAM_POLL_INTERVAL: float = 1.0 # in seconds
+    STREAM_CLIENT_QUEUE_SIZE: int = 32
+    STREAM_HEARTBEAT_INTERVAL: float = 15.0 # in seconds
+    STREAM_MAX_NAMES: int = 20
+    INSTRUMENT_CATALOG_ENABLED: bool = True
+    INSTRUMENT_CATALOG_REFRESH_INTERVAL: float = 3600.0 # in seconds
+    INSTRUMENT_NEGATIVE_CACHE_TTL: float = 30.0 # in seconds
+    INSTRUMENT_NEGATIVE_CACHE_MAX_SIZE: int = 4096
+    COIN_DESK_MAX_INSTRUMENTS_PER_REQUEST: int = 25
+    MICRO_BATCH_ENABLED: bool = True
+    MICRO_BATCH_WINDOW: float = 0.005 # in seconds
+    MICRO_BATCH_MAX_SIZE: int = 25
+    FINANCE_BATCH_MAX_NAMES: int = 100
+    CROSS_RATE_MAX_AGE: float = 5.0 # in seconds
+    CROSS_RATE_MAX_HOPS: int = 3
 
-settings = Settings()
\ No newline at end of file
+_settings: Optional[Settings] = None
+
+def get_settings() -> Settings:
+    """Retorna as configurações da aplicação, lidas do ambiente na primeira chamada"""
+    global _settings
+    if _settings is None:
+        _settings = Settings()
+    return _settings
+
+def set_settings(settings: Settings):
+    """Define as configurações usadas pelos componentes criados depois desta chamada"""
+    global _settings
+    _settings = settings
+
+def __getattr__(name: str):
+    # Mantém "from app.core.config import settings" funcionando sem ler o ambiente na importação
+    if name == "settings":
+        return get_settings()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
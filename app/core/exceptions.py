@@ -1,12 +1,28 @@
 from fastapi import Request, status
 from fastapi.responses import JSONResponse
-from pybreaker import CircuitBreakerError
 from slowapi.errors import RateLimitExceeded
 
 class ExternalAPIServiceError(Exception):
     def __init__(self, detail: str):
         self.detail = detail
 
+class InstrumentNotFoundError(ExternalAPIServiceError):
+    """Levantada quando o ativo é inválido ou não existe no serviço externo; nunca é repetida"""
+
+class CircuitBreakerError(Exception):
+    """Levantada quando o Circuit Breaker rejeita uma chamada por estar aberto"""
+
+class DeadlineExceededError(Exception):
+    """Levantada quando o prazo da requisição se esgota antes da resposta do serviço externo"""
+    def __init__(self, detail: str):
+        self.detail = detail
+
+class ServiceOverloadedError(Exception):
+    """Levantada quando uma chamada ao serviço externo é descartada pelo limitador de concorrência"""
+    def __init__(self, detail: str, retry_after: int = 1):
+        self.detail = detail
+        self.retry_after = retry_after
+
 def external_api_service_exception_handler(request: Request, exc: ExternalAPIServiceError):
     return JSONResponse(
         status_code=status.HTTP_400_BAD_REQUEST,
@@ -22,6 +38,19 @@ def circuit_breaker_open_exception_handler(request: Request, exc: CircuitBreaker
         },
     )
 
+def deadline_exceeded_exception_handler(request: Request, exc: DeadlineExceededError):
+    return JSONResponse(
+        status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+        content={"message": "O serviço externo não respondeu a tempo", "detail": exc.detail},
+    )
+
+def service_overloaded_exception_handler(request: Request, exc: ServiceOverloadedError):
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"message": "Serviço sobrecarregado. Tente novamente mais tarde.", "detail": exc.detail},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
 def rate_limit_exceeded_handler(request: Request, exc: RateLimitExceeded):
     return JSONResponse(
         status_code=status.HTTP_429_TOO_MANY_REQUESTS,
@@ -0,0 +1,193 @@
+"""
+Cliente HTTP compartilhado para chamadas a serviços externos.
+O cliente é criado uma única vez no lifespan da aplicação e reaproveita
+as conexões (keep-alive) entre requisições, evitando um novo handshake
+TCP+TLS a cada chamada.
+"""
+import asyncio
+from typing import Callable, Dict, Tuple
+
+import httpx
+from prometheus_client import Gauge
+
+from app.core.config import Settings
+from app.core.logging import logger
+from app.core.metrics import (
+    EXTERNAL_SERVICE_POOL_IDLE_CONNECTIONS,
+    EXTERNAL_SERVICE_POOL_IN_USE_CONNECTIONS,
+    EXTERNAL_SERVICE_POOL_WAITING_REQUESTS
+)
+
+DEFAULT_POOL_NAME = "default"
+
+
+class _ReleasingStream(httpx.AsyncByteStream):
+    """
+    Envolve o corpo da resposta e libera a vaga do host somente quando
+    a resposta for fechada (corpo lido ou descartado).
+    """
+
+    def __init__(self, stream: httpx.AsyncByteStream, release: Callable[[], None]):
+        self._stream = stream
+        self._release = release
+        self._released = False
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self):
+        try:
+            await self._stream.aclose()
+        finally:
+            if not self._released:
+                self._released = True
+                self._release()
+
+
+class PerHostLimitedTransport(httpx.AsyncBaseTransport):
+    """
+    Transport que limita o número de requisições simultâneas por host
+    sobre um transport com pool de conexões, expondo o estado do pool
+    para as métricas Prometheus.
+
+    Os gauges do pool são atualizados a cada requisição que entra na fila,
+    obtém uma vaga ou libera a conexão: no modo multiprocesso do Prometheus
+    só valores atribuídos com set() são exportados.
+    """
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, max_connections_per_host: int):
+        self._transport = transport
+        self.max_connections_per_host = max_connections_per_host
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self.in_flight = 0
+        self.waiting = 0
+        self._pool_gauges: Tuple = ()
+
+    def _semaphore_for(self, host: str) -> asyncio.Semaphore:
+        semaphore = self._semaphores.get(host)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.max_connections_per_host)
+            self._semaphores[host] = semaphore
+        return semaphore
+
+    def _pool_connections(self) -> list:
+        pool = getattr(self._transport, "_pool", None)
+        return list(getattr(pool, "connections", []))
+
+    def idle_connections(self) -> int:
+        return sum(1 for connection in self._pool_connections() if connection.is_idle())
+
+    def in_use_connections(self) -> int:
+        connections = self._pool_connections()
+        if not connections:
+            return self.in_flight
+        return sum(1 for connection in connections if not connection.is_idle())
+
+    def waiting_requests(self) -> int:
+        pool = getattr(self._transport, "_pool", None)
+        pool_requests = getattr(pool, "_requests", [])
+        waiting_in_pool = sum(1 for pool_request in pool_requests if pool_request.connection is None)
+        return self.waiting + waiting_in_pool
+
+    def set_pool_gauges(self, idle: Gauge, in_use: Gauge, waiting: Gauge):
+        self._pool_gauges = (idle, in_use, waiting)
+        self.update_pool_gauges()
+
+    def update_pool_gauges(self):
+        if not self._pool_gauges:
+            return
+        idle, in_use, waiting = self._pool_gauges
+        idle.set(self.idle_connections())
+        in_use.set(self.in_use_connections())
+        waiting.set(self.waiting_requests())
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        semaphore = self._semaphore_for(request.url.host)
+
+        self.waiting += 1
+        self.update_pool_gauges()
+        try:
+            await semaphore.acquire()
+        finally:
+            self.waiting -= 1
+
+        self.in_flight += 1
+        self.update_pool_gauges()
+
+        def release():
+            self.in_flight -= 1
+            semaphore.release()
+            self.update_pool_gauges()
+
+        try:
+            response = await self._transport.handle_async_request(request)
+        except BaseException:
+            release()
+            raise
+        self.update_pool_gauges()
+
+        return httpx.Response(
+            status_code=response.status_code,
+            headers=response.headers,
+            stream=_ReleasingStream(response.stream, release),
+            extensions=response.extensions
+        )
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def register_pool_metrics(transport: PerHostLimitedTransport, pool_name: str = DEFAULT_POOL_NAME):
+    """Associa ao transport os gauges do pool de conexões, atualizados por ele a cada requisição"""
+    transport.set_pool_gauges(
+        EXTERNAL_SERVICE_POOL_IDLE_CONNECTIONS.labels(pool_name=pool_name),
+        EXTERNAL_SERVICE_POOL_IN_USE_CONNECTIONS.labels(pool_name=pool_name),
+        EXTERNAL_SERVICE_POOL_WAITING_REQUESTS.labels(pool_name=pool_name)
+    )
+
+
+def create_http_client(settings: Settings, pool_name: str = DEFAULT_POOL_NAME) -> httpx.AsyncClient:
+    """
+    Cria o cliente HTTP de longa duração usado pelos serviços externos.
+
+    Args:
+        settings: Configurações da aplicação (limites do pool, keep-alive, HTTP/2)
+        pool_name: Nome do pool para identificação nas métricas
+
+    Returns:
+        Um httpx.AsyncClient que deve ser fechado no encerramento da aplicação
+    """
+    http2 = settings.HTTP_CLIENT_HTTP2
+    if http2 and not _http2_available():
+        logger.warning("HTTP/2 solicitado, mas o pacote 'h2' não está instalado. Usando HTTP/1.1.")
+        http2 = False
+
+    limits = httpx.Limits(
+        max_connections=settings.HTTP_CLIENT_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.HTTP_CLIENT_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=settings.HTTP_CLIENT_KEEPALIVE_EXPIRY
+    )
+    transport = PerHostLimitedTransport(
+        httpx.AsyncHTTPTransport(limits=limits, http2=http2),
+        max_connections_per_host=settings.HTTP_CLIENT_MAX_CONNECTIONS_PER_HOST
+    )
+    register_pool_metrics(transport, pool_name)
+
+    logger.info(
+        "Cliente HTTP '%s' criado com max_connections=%s, max_keepalive=%s, per_host=%s, http2=%s",
+        pool_name,
+        settings.HTTP_CLIENT_MAX_CONNECTIONS,
+        settings.HTTP_CLIENT_MAX_KEEPALIVE_CONNECTIONS,
+        settings.HTTP_CLIENT_MAX_CONNECTIONS_PER_HOST,
+        http2
+    )
+    return httpx.AsyncClient(transport=transport, timeout=settings.HTTP_CLIENT_TIMEOUT)
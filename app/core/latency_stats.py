@@ -0,0 +1,303 @@
+"""
+Percentis de latência em janela deslizante, calculados no próprio processo.
+
+Os buckets fixos dos histogramas Prometheus são grossos demais para p99 e
+p99.9, e componentes adaptativos (ex: o hedge das retentativas) precisam do
+percentil atual sem consultar o Prometheus. Cada série (rota HTTP ou endpoint
+de um serviço externo) mantém um DDSketch:
+- erro relativo garantido em todos os quantis (LATENCY_STATS_RELATIVE_ACCURACY,
+  ex: 1% de 250ms = 2.5ms), inclusive na cauda
+- memória constante: no máximo LATENCY_STATS_MAX_BINS contadores por sketch
+- mesclável: somar sketches dá o sketch da união das observações
+
+A janela deslizante (LATENCY_STATS_WINDOW) é dividida em
+LATENCY_STATS_SLICES fatias; a fatia mais antiga é descartada inteira quando
+uma nova começa. As estatísticas são por processo: com vários workers, cada
+um responde /internal/stats com as suas.
+
+Exemplo de uso:
+
+    stats = get_latency_stats()
+    with stats.timer(UPSTREAM, "coin_desk_api /index/cc/v1/latest/tick"):
+        ...
+    p95 = stats.quantile(UPSTREAM, "coin_desk_api /index/cc/v1/latest/tick", 0.95)
+"""
+import math
+import time
+from collections import deque
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Callable, Dict, Iterator, List, Optional, Sequence
+
+from app.core.config import get_settings
+from app.core.metrics import OTHER_LABEL
+
+ROUTE = "routes"
+UPSTREAM = "upstreams"
+REPORTED_QUANTILES = {"p50": 0.5, "p90": 0.9, "p99": 0.99, "p999": 0.999}
+# Latências abaixo disso (1ns) são contadas como zero
+MIN_INDEXABLE_VALUE = 1e-9
+
+
+class DDSketch:
+    """
+    Sketch de quantis com erro relativo limitado (Masson et al., VLDB 2019).
+    Cada valor cai no bin ceil(log_gamma(valor)); o quantil é o valor
+    representativo do bin, a no máximo relative_accuracy do valor real.
+    """
+
+    __slots__ = ("relative_accuracy", "max_bins", "_gamma", "_log_gamma", "bins", "zero_count", "count", "sum", "min", "max")
+
+    def __init__(self, relative_accuracy: float = 0.01, max_bins: int = 1024):
+        """
+        Args:
+            relative_accuracy: Erro relativo máximo dos quantis (ex: 0.01 = 1%)
+            max_bins: Máximo de bins; acima disso os bins mais baixos são unidos,
+                perdendo precisão apenas nos menores quantis
+        """
+        self.relative_accuracy = relative_accuracy
+        self.max_bins = max_bins
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self._gamma)
+        self.bins: Dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value: float):
+        if value < MIN_INDEXABLE_VALUE:
+            self.zero_count += 1
+            value = max(value, 0.0)
+        else:
+            index = math.ceil(math.log(value) / self._log_gamma)
+            self.bins[index] = self.bins.get(index, 0) + 1
+            if len(self.bins) > self.max_bins:
+                self._collapse()
+        self.count += 1
+        self.sum += value
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other: "DDSketch"):
+        """Soma as observações de outro sketch com a mesma precisão"""
+        if other.count == 0:
+            return
+        for index, count in other.bins.items():
+            self.bins[index] = self.bins.get(index, 0) + count
+        if len(self.bins) > self.max_bins:
+            self._collapse()
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def quantiles(self, quantiles: Sequence[float]) -> List[Optional[float]]:
+        """Estima vários quantis (0 a 1) em uma única passada pelos bins; None se o sketch estiver vazio"""
+        if self.count == 0:
+            return [None] * len(quantiles)
+        ranks = sorted((q * (self.count - 1), position) for position, q in enumerate(quantiles))
+        results: List[Optional[float]] = [None] * len(quantiles)
+        pending = iter(ranks)
+        rank, position = next(pending)
+        seen = self.zero_count
+        while seen > rank:
+            results[position] = max(self.min, 0.0)
+            rank, position = next(pending, (None, None))
+            if rank is None:
+                return results
+        for index in sorted(self.bins):
+            seen += self.bins[index]
+            while seen > rank:
+                results[position] = min(max(self._value(index), self.min), self.max)
+                rank, position = next(pending, (None, None))
+                if rank is None:
+                    return results
+        return results
+
+    def quantile(self, q: float) -> Optional[float]:
+        return self.quantiles((q,))[0]
+
+    def rank(self, value: float) -> float:
+        """Fração aproximada das observações menores ou iguais ao valor"""
+        if self.count == 0:
+            return 0.0
+        if value < MIN_INDEXABLE_VALUE:
+            return self.zero_count / self.count
+        limit = math.ceil(math.log(value) / self._log_gamma)
+        below = self.zero_count + sum(count for index, count in self.bins.items() if index <= limit)
+        return below / self.count
+
+    def _value(self, index: int) -> float:
+        # Ponto do bin (gamma^(i-1), gamma^i] com erro relativo igual nas duas pontas
+        return 2 * self._gamma ** index / (self._gamma + 1)
+
+    def _collapse(self):
+        indexes = sorted(self.bins)
+        excess = len(indexes) - self.max_bins
+        target = indexes[excess]
+        self.bins[target] += sum(self.bins.pop(index) for index in indexes[:excess])
+
+
+class SlidingWindowSketch:
+    """DDSketch das observações dos últimos `window` segundos, com memória constante"""
+
+    def __init__(
+        self,
+        window: float,
+        slices: int,
+        relative_accuracy: float,
+        max_bins: int,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        """
+        Args:
+            window: Duração da janela em segundos
+            slices: Número de fatias da janela; a granularidade do descarte é window / slices
+            relative_accuracy: Erro relativo máximo dos quantis
+            max_bins: Máximo de bins de cada fatia
+            clock: Relógio monotônico
+        """
+        self.window = window
+        self.slice_duration = window / slices
+        self.relative_accuracy = relative_accuracy
+        self.max_bins = max_bins
+        self._clock = clock
+        self._slices: deque = deque(maxlen=slices)
+        self._current_slot: Optional[int] = None
+        self._current = self._new_sketch()
+        # Fatias anteriores à atual já mescladas, refeito apenas quando a fatia muda
+        self._completed = self._new_sketch()
+
+    def _new_sketch(self) -> DDSketch:
+        return DDSketch(self.relative_accuracy, self.max_bins)
+
+    def _rotate(self):
+        slot = int(self._clock() // self.slice_duration)
+        if slot == self._current_slot:
+            return
+        if self._current_slot is not None:
+            self._slices.append((self._current_slot, self._current))
+        self._current_slot = slot
+        self._current = self._new_sketch()
+        oldest = slot - self._slices.maxlen + 1
+        self._completed = self._new_sketch()
+        for slice_slot, sketch in self._slices:
+            if slice_slot >= oldest:
+                self._completed.merge(sketch)
+
+    def add(self, value: float):
+        self._rotate()
+        self._current.add(value)
+
+    def merged(self) -> DDSketch:
+        """Sketch de todas as observações da janela"""
+        self._rotate()
+        sketch = self._new_sketch()
+        sketch.merge(self._completed)
+        sketch.merge(self._current)
+        return sketch
+
+    def quantile(self, q: float) -> Optional[float]:
+        return self.merged().quantile(q)
+
+
+class LatencyStats:
+    """Sketches de latência por série (ex: rota HTTP, endpoint de serviço externo)"""
+
+    def __init__(
+        self,
+        window: float,
+        slices: int,
+        relative_accuracy: float,
+        max_bins: int,
+        max_series: int,
+        slo_target: float,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        """
+        Args:
+            window: Duração em segundos da janela deslizante
+            slices: Número de fatias da janela
+            relative_accuracy: Erro relativo máximo dos quantis
+            max_bins: Máximo de bins de cada sketch
+            max_series: Máximo de séries por tipo; as excedentes são agrupadas em "other"
+            slo_target: Latência em segundos usada para calcular a fração dentro do SLO
+            clock: Relógio monotônico
+        """
+        self.window = window
+        self.slices = slices
+        self.relative_accuracy = relative_accuracy
+        self.max_bins = max_bins
+        self.max_series = max_series
+        self.slo_target = slo_target
+        self._clock = clock
+        self._series: Dict[str, Dict[str, SlidingWindowSketch]] = {ROUTE: {}, UPSTREAM: {}}
+
+    def _sketch(self, kind: str, name: str) -> SlidingWindowSketch:
+        series = self._series[kind]
+        sketch = series.get(name)
+        if sketch is None:
+            if len(series) >= self.max_series:
+                name = OTHER_LABEL
+                sketch = series.get(name)
+            if sketch is None:
+                sketch = SlidingWindowSketch(self.window, self.slices, self.relative_accuracy, self.max_bins, self._clock)
+                series[name] = sketch
+        return sketch
+
+    def record(self, kind: str, name: str, seconds: float):
+        self._sketch(kind, name).add(seconds)
+
+    def record_route(self, method: str, endpoint: str, seconds: float):
+        self.record(ROUTE, f"{method} {endpoint}", seconds)
+
+    @contextmanager
+    def timer(self, kind: str, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(kind, name, time.perf_counter() - start)
+
+    def quantile(self, kind: str, name: str, q: float) -> Optional[float]:
+        """Quantil atual da série na janela, ou None se não houver observações"""
+        sketch = self._series[kind].get(name)
+        return sketch.quantile(q) if sketch is not None else None
+
+    def snapshot(self) -> Dict:
+        """Estatísticas de todas as séries com observações na janela, para /internal/stats"""
+        result: Dict = {"window_seconds": self.window, "slo_target_seconds": self.slo_target}
+        for kind, series in self._series.items():
+            result[kind] = {}
+            for name, window_sketch in sorted(series.items()):
+                sketch = window_sketch.merged()
+                if sketch.count == 0:
+                    continue
+                stats = {
+                    "count": sketch.count,
+                    "mean": sketch.sum / sketch.count,
+                    "min": sketch.min,
+                    "max": sketch.max,
+                    "within_slo": sketch.rank(self.slo_target),
+                }
+                stats.update(zip(REPORTED_QUANTILES, sketch.quantiles(list(REPORTED_QUANTILES.values()))))
+                result[kind][name] = stats
+        return result
+
+
+@lru_cache(maxsize=None)
+def get_latency_stats() -> LatencyStats:
+    settings = get_settings()
+    return LatencyStats(
+        window=settings.LATENCY_STATS_WINDOW,
+        slices=settings.LATENCY_STATS_SLICES,
+        relative_accuracy=settings.LATENCY_STATS_RELATIVE_ACCURACY,
+        max_bins=settings.LATENCY_STATS_MAX_BINS,
+        max_series=settings.LATENCY_STATS_MAX_SERIES,
+        slo_target=settings.LATENCY_SLO_TARGET
+    )
@@ -1,20 +1,145 @@
+"""
+Pipeline de logs assíncrono.
+
+Os handlers que escrevem em stdout e em arquivo rodam em uma thread própria
+(QueueListener). No event loop, o log só enfileira o registro em um buffer
+limitado, sem formatar a mensagem nem tocar no disco.
+
+- Política de descarte: com o buffer cheio, registros abaixo de WARNING são
+  descartados; WARNING ou acima removem o registro mais antigo para entrar.
+- Formatação preguiçosa: a mensagem (logger.info("... %s", valor)) só é
+  montada pela thread de escrita.
+- Amostragem por logger: LOG_SAMPLING="api.health=100" mantém 1 a cada 100
+  registros abaixo de WARNING do logger api.health.
+- LOG_JSON=true troca o formato texto por uma linha JSON por registro.
+
+Nada é configurado na importação: create_app chama setup_logging, que abre
+o arquivo de log e inicia a thread de escrita uma única vez por processo.
+"""
+import atexit
+import itertools
+import json
 import logging
+import queue
 import sys
-from logging.handlers import RotatingFileHandler
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Dict, Optional
+from app.core.config import Settings
+from app.core.metrics import LOG_RECORDS_DROPPED
 
 LOG_FILE = "app.log"
+TEXT_FORMAT = "%(asctime)s %(levelname)s %(name)s %(message)s"
+
+
+def parse_sampling_rates(value: str) -> Dict[str, int]:
+    """Converte "api.health=100,api.x=10" em {"api.health": 100, "api.x": 10}"""
+    rates = {}
+    for item in value.split(","):
+        name, _, every = item.partition("=")
+        if name.strip() and every.strip():
+            rates[name.strip()] = max(1, int(every))
+    return rates
+
+
+class SamplingFilter(logging.Filter):
+    """Mantém 1 a cada N registros dos loggers configurados; WARNING ou acima sempre passam"""
+
+    def __init__(self, rates: Dict[str, int]):
+        super().__init__()
+        self.rates = rates
+        self._counters = {name: itertools.count() for name in rates}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        every = self.rates.get(record.name)
+        if every is None or record.levelno >= logging.WARNING:
+            return True
+        if next(self._counters[record.name]) % every == 0:
+            return True
+        LOG_RECORDS_DROPPED.labels(reason="sampled").inc()
+        return False
+
+
+class BoundedQueueHandler(QueueHandler):
+    """
+    QueueHandler que não bloqueia o chamador e não formata a mensagem.
+    A formatação fica com os handlers do QueueListener, na thread de escrita.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # A fila é em memória no mesmo processo: não é preciso serializar o registro
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+            return
+        except queue.Full:
+            pass
+
+        if record.levelno < logging.WARNING:
+            LOG_RECORDS_DROPPED.labels(reason="queue_full").inc()
+            return
+
+        try:
+            self.queue.get_nowait()
+        except queue.Empty:
+            pass
+        LOG_RECORDS_DROPPED.labels(reason="queue_full").inc()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.labels(reason="queue_full").inc()
+
+
+class JsonFormatter(logging.Formatter):
+    """Formata cada registro como uma linha JSON"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "timestamp": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            payload["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False)
+
+
+def configure_logging(settings: Settings) -> QueueListener:
+    """
+    Instala o BoundedQueueHandler no logger raiz e inicia a thread de escrita.
+    Retorna o QueueListener, que deve ser parado no encerramento para esvaziar a fila.
+    """
+    formatter = JsonFormatter() if settings.LOG_JSON else logging.Formatter(TEXT_FORMAT)
+
+    console_handler = logging.StreamHandler(sys.stdout)
+    file_handler = RotatingFileHandler(LOG_FILE, maxBytes=2*1024*1024, backupCount=5)
+    for handler in (console_handler, file_handler):
+        handler.setFormatter(formatter)
+
+    queue_handler = BoundedQueueHandler(queue.Queue(maxsize=settings.LOG_QUEUE_SIZE))
+    queue_handler.addFilter(SamplingFilter(parse_sampling_rates(settings.LOG_SAMPLING)))
+
+    root = logging.getLogger()
+    root.handlers = [queue_handler]
+    root.setLevel(settings.LOG_LEVEL)
+
+    listener = QueueListener(queue_handler.queue, console_handler, file_handler)
+    listener.start()
+    return listener
+
 
-console_handler = logging.StreamHandler(sys.stdout)
-console_handler.setLevel(logging.INFO)
+_listener: Optional[QueueListener] = None
 
-file_handler = RotatingFileHandler(LOG_FILE, maxBytes=2*1024*1024, backupCount=5)
-file_handler.setLevel(logging.INFO)
 
-formatter = logging.Formatter("%(asctime)s %(levelname)s %(name)s %(message)s")
-console_handler.setFormatter(formatter)
-file_handler.setFormatter(formatter)
+def setup_logging(settings: Settings) -> QueueListener:
+    """Configura o pipeline de logs na primeira chamada; as seguintes reaproveitam o mesmo listener"""
+    global _listener
+    if _listener is None:
+        _listener = configure_logging(settings)
+        atexit.register(_listener.stop)
+    return _listener
 
-logging.basicConfig(level=logging.INFO, handlers=[console_handler, file_handler])
 
 logger = logging.getLogger("api")
-logger.setLevel(logging.INFO)
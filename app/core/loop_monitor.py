@@ -0,0 +1,106 @@
+"""
+Monitoramento de bloqueios do event loop.
+
+Logs síncronos, locks e validação de payloads grandes bloqueiam o event loop
+e atrasam todas as requisições do worker. O EventLoopMonitor mede isso com:
+- uma sonda que dorme EVENT_LOOP_MONITOR_INTERVAL e registra o quanto acordou
+  atrasada em dummy_api_event_loop_lag_seconds
+- um watchdog em uma thread própria que, se a sonda não acordar dentro de
+  EVENT_LOOP_SLOW_CALLBACK_THRESHOLD além do esperado, registra em log a
+  tarefa e a pilha que estão bloqueando o event loop naquele momento
+
+Diferente do modo debug do asyncio (slow_callback_duration), não instrumenta
+cada callback: o custo é uma tarefa e uma thread acordando a cada intervalo.
+"""
+import asyncio
+import sys
+import threading
+import time
+import traceback
+from typing import Optional
+
+from app.core.logging import logger
+from app.core.metrics import EVENT_LOOP_LAG, EVENT_LOOP_STALLS
+
+
+class EventLoopMonitor:
+    """
+    Exemplo de uso:
+
+    monitor = EventLoopMonitor(interval=0.25, slow_threshold=0.1)
+    monitor.start()
+    ...
+    await monitor.stop()
+    """
+
+    def __init__(self, interval: float, slow_threshold: float):
+        """
+        Args:
+            interval: Intervalo em segundos entre as medições da sonda
+            slow_threshold: Atraso em segundos a partir do qual o event loop é considerado bloqueado
+        """
+        self.interval = interval
+        self.slow_threshold = slow_threshold
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._expected_wakeup = 0.0
+        self._task: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    def start(self):
+        if self._task is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._expected_wakeup = time.monotonic() + self.interval
+        self._stopped.clear()
+        self._task = asyncio.create_task(self._probe())
+        self._thread = threading.Thread(target=self._watch, name="event-loop-watchdog", daemon=True)
+        self._thread.start()
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self._stopped.set()
+        await asyncio.to_thread(self._thread.join)
+        self._thread = None
+
+    async def _probe(self):
+        while True:
+            self._expected_wakeup = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            EVENT_LOOP_LAG.observe(max(time.monotonic() - self._expected_wakeup, 0.0))
+
+    def _watch(self):
+        reported = None
+        while not self._stopped.wait(self.slow_threshold / 2):
+            expected = self._expected_wakeup
+            if expected == reported or time.monotonic() - expected < self.slow_threshold:
+                continue
+            # Um registro por bloqueio: a sonda ainda não acordou desde o último
+            reported = expected
+            EVENT_LOOP_STALLS.inc()
+            logger.warning(
+                "Event loop bloqueado há mais de %.3fs. Tarefa em execução: %s\n%s",
+                time.monotonic() - expected, self._current_task(), self._loop_stack()
+            )
+
+    def _current_task(self) -> str:
+        task = asyncio.current_task(self._loop)
+        if task is None:
+            return "nenhuma (callback fora de tarefa)"
+        coro = task.get_coro()
+        return f"{task.get_name()} ({getattr(coro, '__qualname__', coro)})"
+
+    def _loop_stack(self) -> str:
+        frame = sys._current_frames().get(self._loop_thread_id)
+        if frame is None:
+            return ""
+        return "".join(traceback.format_stack(frame))
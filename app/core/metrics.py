@@ -1,12 +1,32 @@
 """
 Módulo centralizado para métricas Prometheus.
 Fornece classes e funções para instrumentação padronizada da aplicação.
+
+Com vários workers (gunicorn.conf.py), PROMETHEUS_MULTIPROC_DIR aponta para
+o diretório onde cada processo grava suas métricas, e render_metrics agrega
+os arquivos de todos os workers: contadores e histogramas são somados, e os
+gauges seguem o multiprocess_mode de cada um (ex: o estado do Circuit
+Breaker é o maior entre os workers vivos, as conexões em uso são somadas).
 """
-from typing import Dict, Optional
+from typing import TYPE_CHECKING, Dict, FrozenSet, Optional, Tuple
+import os
 import time
-from prometheus_client import Counter, Histogram, Gauge, Summary
-from fastapi import Request, Response
-from starlette.middleware.base import BaseHTTPMiddleware
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    Summary,
+    generate_latest,
+    multiprocess
+)
+from starlette.routing import Match
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+if TYPE_CHECKING:
+    from app.core.latency_stats import LatencyStats
 
 NAMESPACE = "dummy_api"
 
@@ -26,7 +46,8 @@ HTTP_REQUEST_DURATION = Histogram(
 HTTP_REQUESTS_IN_PROGRESS = Gauge(
     f"{NAMESPACE}_http_requests_in_progress",
     "Número de requisições HTTP em andamento",
-    ["method", "endpoint"]
+    ["method", "endpoint"],
+    multiprocess_mode="livesum"
 )
 
 FINANCE_API_ERROR_COUNTER = Counter(
@@ -48,6 +69,27 @@ FINANCE_API_DURATION = Histogram(
     buckets=[0.1, 0.5, 1, 2.5, 5, 10, 30]
 )
 
+FINANCE_BATCH_API_DURATION = Histogram(
+    f"{NAMESPACE}_finance_batch_api_duration_seconds",
+    "Duração das requisições em lote à API de finanças em segundos",
+    ["endpoint"],
+    buckets=[0.1, 0.5, 1, 2.5, 5, 10, 30]
+)
+
+FINANCE_BATCH_CHUNK_DURATION = Histogram(
+    f"{NAMESPACE}_finance_batch_chunk_duration_seconds",
+    "Duração de cada lote de instrumentos enviado ao serviço externo em segundos",
+    ["endpoint"],
+    buckets=[0.1, 0.5, 1, 2.5, 5, 10, 30]
+)
+
+FINANCE_BATCH_SIZE = Histogram(
+    f"{NAMESPACE}_finance_batch_size",
+    "Número de ativos distintos por requisição em lote",
+    ["endpoint"],
+    buckets=[1, 5, 10, 25, 50, 100]
+)
+
 CACHE_HITS = Counter(
     f"{NAMESPACE}_cache_hits_total",
     "Total de acertos no cache",
@@ -60,6 +102,30 @@ CACHE_MISSES = Counter(
     ["cache_name"]
 )
 
+CACHE_BACKEND_ERRORS = Counter(
+    f"{NAMESPACE}_cache_backend_errors_total",
+    "Total de erros de comunicação com o backend de cache compartilhado",
+    ["cache_name", "operation"]
+)
+
+CACHE_COALESCED_REQUESTS = Counter(
+    f"{NAMESPACE}_cache_coalesced_requests_total",
+    "Total de falhas no cache atendidas por uma busca já em andamento",
+    ["cache_name"]
+)
+
+CACHE_STALE_SERVED = Counter(
+    f"{NAMESPACE}_cache_stale_served_total",
+    "Total de entradas expiradas servidas enquanto são atualizadas em segundo plano",
+    ["cache_name"]
+)
+
+PREFETCH_REFRESHES = Counter(
+    f"{NAMESPACE}_prefetch_refreshes_total",
+    "Total de atualizações antecipadas de instrumentos populares",
+    ["cache_name", "result"]
+)
+
 EXTERNAL_SERVICE_REQUESTS = Counter(
     f"{NAMESPACE}_external_service_requests_total",
     "Total de requisições a serviços externos",
@@ -79,16 +145,181 @@ EXTERNAL_SERVICE_DURATION = Histogram(
     buckets=[0.1, 0.5, 1, 2.5, 5, 10, 30]
 )
 
+EXTERNAL_SERVICE_POOL_IDLE_CONNECTIONS = Gauge(
+    f"{NAMESPACE}_external_service_pool_idle_connections",
+    "Conexões ociosas (keep-alive) no pool do cliente HTTP compartilhado",
+    ["pool_name"],
+    multiprocess_mode="livesum"
+)
+
+EXTERNAL_SERVICE_POOL_IN_USE_CONNECTIONS = Gauge(
+    f"{NAMESPACE}_external_service_pool_in_use_connections",
+    "Conexões em uso no pool do cliente HTTP compartilhado",
+    ["pool_name"],
+    multiprocess_mode="livesum"
+)
+
+EXTERNAL_SERVICE_POOL_WAITING_REQUESTS = Gauge(
+    f"{NAMESPACE}_external_service_pool_waiting_requests",
+    "Requisições aguardando uma conexão livre no pool do cliente HTTP compartilhado",
+    ["pool_name"],
+    multiprocess_mode="livesum"
+)
+
+STREAM_SUBSCRIBERS = Gauge(
+    f"{NAMESPACE}_stream_subscribers",
+    "Número de clientes conectados ao stream de cotações",
+    ["transport"],
+    multiprocess_mode="livesum"
+)
+
+STREAM_ACTIVE_POLLERS = Gauge(
+    f"{NAMESPACE}_stream_active_pollers",
+    "Número de pollers ativos (um por instrumento assinado)",
+    multiprocess_mode="livesum"
+)
+
+STREAM_MESSAGES_SENT = Counter(
+    f"{NAMESPACE}_stream_messages_sent_total",
+    "Total de cotações entregues aos clientes do stream",
+    ["transport"]
+)
+
+STREAM_MESSAGES_DROPPED = Counter(
+    f"{NAMESPACE}_stream_messages_dropped_total",
+    "Total de cotações descartadas por clientes lentos (fila cheia)",
+    ["transport"]
+)
+
+STREAM_POLL_ERRORS = Counter(
+    f"{NAMESPACE}_stream_poll_errors_total",
+    "Total de falhas dos pollers do stream ao buscar cotações"
+)
+
+RETRY_ATTEMPTS = Counter(
+    f"{NAMESPACE}_retry_attempts_total",
+    "Total de retentativas de chamadas a serviços externos",
+    ["service_name"]
+)
+
+HEDGED_REQUESTS = Counter(
+    f"{NAMESPACE}_hedged_requests_total",
+    "Total de chamadas paralelas (hedge) disparadas por latência acima do percentil observado",
+    ["service_name"]
+)
+
+RETRY_BUDGET_REJECTIONS = Counter(
+    f"{NAMESPACE}_retry_budget_rejections_total",
+    "Total de retentativas ou hedges negados por falta de orçamento",
+    ["service_name", "kind"]
+)
+
+CONCURRENCY_LIMIT = Gauge(
+    f"{NAMESPACE}_concurrency_limit",
+    "Limite atual de chamadas simultâneas ao serviço externo (ajustado por AIMD)",
+    ["limiter_name"],
+    multiprocess_mode="livesum"
+)
+
+CONCURRENCY_IN_FLIGHT = Gauge(
+    f"{NAMESPACE}_concurrency_in_flight",
+    "Chamadas ao serviço externo em andamento",
+    ["limiter_name"],
+    multiprocess_mode="livesum"
+)
+
+CONCURRENCY_QUEUE_DEPTH = Gauge(
+    f"{NAMESPACE}_concurrency_queue_depth",
+    "Chamadas aguardando uma vaga no limitador de concorrência",
+    ["limiter_name"],
+    multiprocess_mode="livesum"
+)
+
+CONCURRENCY_SHED_REQUESTS = Counter(
+    f"{NAMESPACE}_concurrency_shed_requests_total",
+    "Total de chamadas descartadas pelo limitador de concorrência",
+    ["limiter_name", "reason"]
+)
+
+PROVIDER_LATENCY = Gauge(
+    f"{NAMESPACE}_provider_latency_seconds",
+    "Média móvel exponencial da latência de cada provedor de cotações, usada no roteamento",
+    ["provider"],
+    multiprocess_mode="livemax"
+)
+
+PROVIDER_FAILOVERS = Counter(
+    f"{NAMESPACE}_provider_failovers_total",
+    "Total de buscas redirecionadas para outro provedor após falha",
+    ["from_provider", "to_provider"]
+)
+
+INSTRUMENT_REJECTIONS = Counter(
+    f"{NAMESPACE}_instrument_rejections_total",
+    "Total de ativos rejeitados por formato inválido, ausência no catálogo ou inexistência no serviço externo",
+    ["reason"]
+)
+
+INSTRUMENT_CATALOG_SIZE = Gauge(
+    f"{NAMESPACE}_instrument_catalog_size",
+    "Número de instrumentos no catálogo carregado do serviço externo",
+    multiprocess_mode="livemax"
+)
+
+MICRO_BATCH_SIZE = Histogram(
+    f"{NAMESPACE}_micro_batch_size",
+    "Número de instrumentos distintos por chamada agrupada pelo micro-batching",
+    buckets=[1, 2, 5, 10, 25, 50, 100]
+)
+
+MICRO_BATCH_FLUSHES = Counter(
+    f"{NAMESPACE}_micro_batch_flushes_total",
+    "Total de lotes enviados pelo micro-batching, por motivo (window: fim da janela, size: lote cheio)",
+    ["reason"]
+)
+
+MICRO_BATCH_WAIT = Histogram(
+    f"{NAMESPACE}_micro_batch_wait_seconds",
+    "Tempo que cada instrumento esperou na janela do micro-batching até o envio do lote",
+    buckets=[0.0005, 0.001, 0.002, 0.005, 0.01, 0.02, 0.05]
+)
+
+CROSS_RATE_RESOLUTIONS = Counter(
+    f"{NAMESPACE}_cross_rate_resolutions_total",
+    "Total de taxas respondidas por origem (direct: cotação em cache, derived: caminho de conversão, upstream: serviço externo)",
+    ["source"]
+)
+
+CROSS_RATE_GRAPH_SIZE = Gauge(
+    f"{NAMESPACE}_cross_rate_graph_currencies",
+    "Número de moedas no grafo de taxas cruzadas montado a partir do cache",
+    multiprocess_mode="livemax"
+)
+
+WARM_START_ENTRIES = Counter(
+    f"{NAMESPACE}_warm_start_entries_total",
+    "Entradas lidas do snapshot de warm start, por tipo (quote, breaker) e resultado (restored, expired)",
+    ["kind", "result"]
+)
+
+WARM_START_TIME_TO_WARM = Gauge(
+    f"{NAMESPACE}_warm_start_time_to_warm_seconds",
+    "Tempo desde a inicialização até todos os instrumentos do snapshot terem cotação válida no cache",
+    multiprocess_mode="livemax"
+)
+
 CIRCUIT_BREAKER_STATE = Gauge(
     f"{NAMESPACE}_circuit_breaker_state",
     "Estado atual do Circuit Breaker (0=fechado, 1=aberto)",
-    ["service_name"]
+    ["service_name"],
+    multiprocess_mode="livemax"
 )
 
 CIRCUIT_BREAKER_FAILURE_COUNT = Gauge(
     f"{NAMESPACE}_circuit_breaker_failure_count",
     "Contador atual de falhas no Circuit Breaker",
-    ["service_name"]
+    ["service_name"],
+    multiprocess_mode="livesum"
 )
 
 CIRCUIT_BREAKER_TRIPPED_TOTAL = Counter(
@@ -97,39 +328,131 @@ CIRCUIT_BREAKER_TRIPPED_TOTAL = Counter(
     ["service_name"]
 )
 
+TRACE_STAGE_DURATION = Histogram(
+    f"{NAMESPACE}_request_stage_duration_seconds",
+    "Duração de cada etapa das requisições rastreadas em segundos",
+    ["stage"],
+    buckets=[0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 2.5, 5]
+)
+
+TRACES_DROPPED = Counter(
+    f"{NAMESPACE}_traces_dropped_total",
+    "Total de traces não exportados por fila cheia ou falha na exportação",
+    ["reason"]
+)
+
+EVENT_LOOP_LAG = Histogram(
+    f"{NAMESPACE}_event_loop_lag_seconds",
+    "Atraso do event loop em segundos: quanto a sonda periódica acordou depois do esperado",
+    buckets=[0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5]
+)
+
+EVENT_LOOP_STALLS = Counter(
+    f"{NAMESPACE}_event_loop_stalls_total",
+    "Total de bloqueios do event loop acima de EVENT_LOOP_SLOW_CALLBACK_THRESHOLD"
+)
+
+LOG_RECORDS_DROPPED = Counter(
+    f"{NAMESPACE}_log_records_dropped_total",
+    "Total de registros de log descartados por amostragem ou buffer cheio",
+    ["reason"]
+)
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """
+    Retorna o corpo e o content type da exposição das métricas: as do
+    processo atual ou, em modo multiprocesso, as agregadas de todos os workers.
+    """
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+OTHER_LABEL = "other"
+
 
-class PrometheusMiddleware(BaseHTTPMiddleware):
+def bounded_label(value: str, allowed: FrozenSet[str]) -> str:
     """
-    Middleware que captura métricas Prometheus para todas as requisições HTTP
+    Limita a cardinalidade de labels controlados pelo usuário: valores fora
+    da allow-list são agrupados em "other".
     """
+    return value if value in allowed else OTHER_LABEL
+
+
+class PrometheusMiddleware:
+    """
+    Middleware ASGI puro que captura métricas Prometheus para todas as requisições HTTP.
+    As séries são rotuladas pelo template da rota (ex: /api/v1/finance/active/{active_name})
+    e não pelo caminho bruto, mantendo a cardinalidade limitada.
+    Com latency_stats, a duração também alimenta os percentis por rota de /internal/stats.
+    """
+
+    def __init__(self, app: ASGIApp, max_cached_paths: int = 1024, latency_stats: Optional["LatencyStats"] = None):
+        self.app = app
+        self.max_cached_paths = max_cached_paths
+        self.latency_stats = latency_stats
+        self._templates: Dict[Tuple[str, str], str] = {}
+
+    def _route_template(self, scope: Scope) -> str:
+        key = (scope["method"], scope["path"])
+        template = self._templates.get(key)
+        if template is not None:
+            return template
+
+        template = OTHER_LABEL
+        for route in scope["app"].router.routes:
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                template = route.path
+                break
+            if match == Match.PARTIAL and template == OTHER_LABEL:
+                template = route.path
+
+        if len(self._templates) >= self.max_cached_paths:
+            self._templates.clear()
+        self._templates[key] = template
+        return template
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        endpoint = self._route_template(scope)
+        status_code = 500
+
+        async def send_wrapper(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        in_progress = HTTP_REQUESTS_IN_PROGRESS.labels(method=method, endpoint=endpoint)
+        in_progress.inc()
+        start_time = time.perf_counter()
 
-    async def dispatch(self, request: Request, call_next):
-        method = request.method
-        path = request.url.path
-        
-        HTTP_REQUESTS_IN_PROGRESS.labels(method=method, endpoint=path).inc()
-        
-        start_time = time.time()
-        
         try:
-            response = await call_next(request)
-            status_code = response.status_code
-            return response
-        except Exception as e:
-            status_code = 500
-            raise e
+            await self.app(scope, receive, send_wrapper)
         finally:
-            duration = time.time() - start_time
-            
+            duration = time.perf_counter() - start_time
+
             HTTP_REQUEST_COUNTER.labels(
-                method=method, endpoint=path, status_code=status_code
+                method=method, endpoint=endpoint, status_code=status_code
             ).inc()
-            
+
             HTTP_REQUEST_DURATION.labels(
-                method=method, endpoint=path, status_code=status_code
+                method=method, endpoint=endpoint, status_code=status_code
             ).observe(duration)
-            
-            HTTP_REQUESTS_IN_PROGRESS.labels(method=method, endpoint=path).dec()
+
+            if self.latency_stats is not None:
+                self.latency_stats.record_route(method, endpoint, duration)
+
+            in_progress.dec()
 
 
 class MetricsTimer:
@@ -149,9 +472,9 @@ class MetricsTimer:
         self.start_time = None
     
     def __enter__(self):
-        self.start_time = time.time()
+        self.start_time = time.perf_counter()
         return self
     
     def __exit__(self, exc_type, exc_val, exc_tb):
-        duration = time.time() - self.start_time
+        duration = time.perf_counter() - self.start_time
         self.histogram.labels(**self.labels).observe(duration)
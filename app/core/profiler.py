@@ -0,0 +1,100 @@
+"""
+Profiler por amostragem para diagnóstico em produção (GET /debug/profile).
+
+Uma thread lê periodicamente a pilha da thread do event loop
+(sys._current_frames) e conta quantas vezes cada pilha foi vista. O
+resultado sai no formato collapsed stack usado por flamegraph.pl, speedscope
+e inferno, uma pilha por linha, da raiz até a folha:
+
+    _run_once (asyncio/base_events.py:1845);_run (asyncio/events.py:78);get_active_by_name (app/services/coin_desk_api_service.py:296) 12
+
+O código da aplicação não é instrumentado: fora de uma coleta o custo é zero,
+e durante ela é o de ler uma pilha a cada DEBUG_PROFILE_SAMPLE_INTERVAL.
+"""
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from types import CodeType, FrameType
+from typing import Dict, List, Optional
+
+
+class SamplingProfiler:
+    """
+    Exemplo de uso:
+
+    profiler = SamplingProfiler(interval=0.005)
+    collapsed = await asyncio.to_thread(profiler.profile, threading.get_ident(), 10)
+    """
+
+    def __init__(self, interval: float):
+        """
+        Args:
+            interval: Intervalo em segundos entre amostras
+        """
+        self.interval = interval
+        self._labels: Dict[CodeType, str] = {}
+        self._running = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._running.locked()
+
+    def profile(self, thread_id: int, seconds: float) -> Optional[str]:
+        """
+        Amostra a pilha de uma thread durante o período; bloqueia quem chama.
+
+        Args:
+            thread_id: Identificador da thread amostrada (ex: a do event loop)
+            seconds: Duração da coleta em segundos
+
+        Returns:
+            As pilhas no formato collapsed stack, ou None se outra coleta estiver em andamento
+        """
+        if not self._running.acquire(blocking=False):
+            return None
+        try:
+            return self._collapse(self._sample(thread_id, seconds))
+        finally:
+            self._running.release()
+
+    def _sample(self, thread_id: int, seconds: float) -> Counter:
+        stacks: Counter = Counter()
+        stop_at = time.monotonic() + seconds
+        while time.monotonic() < stop_at:
+            frame = sys._current_frames().get(thread_id)
+            if frame is None:
+                break
+            stacks[self._stack(frame)] += 1
+            del frame
+            time.sleep(self.interval)
+        return stacks
+
+    def _stack(self, frame: Optional[FrameType]) -> tuple:
+        codes = []
+        while frame is not None:
+            codes.append(frame.f_code)
+            frame = frame.f_back
+        codes.reverse()
+        return tuple(codes)
+
+    def _label(self, code: CodeType) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            filename = code.co_filename
+            for prefix in sorted(sys.path, key=len, reverse=True):
+                if prefix and filename.startswith(prefix + os.sep):
+                    filename = filename[len(prefix) + 1:]
+                    break
+            # ";" separa os frames e o último espaço separa a contagem
+            label = f"{code.co_name} ({filename}:{code.co_firstlineno})".replace(";", ":")
+            self._labels[code] = label
+        return label
+
+    def _collapse(self, stacks: Counter) -> str:
+        lines: List[str] = [
+            f"{';'.join(self._label(code) for code in stack)} {count}"
+            for stack, count in stacks.most_common()
+        ]
+        return "\n".join(lines) + "\n" if lines else ""
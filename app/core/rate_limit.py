@@ -0,0 +1,143 @@
+"""
+Rate limit da aplicação.
+
+Os routers declaram seus limites durante a importação em rate_limits, sem
+ler configurações. create_app cria o Limiter do slowapi com o storage das
+configurações (create_limiter) e aplica a ele os limites declarados
+(rate_limits.bind), usando apenas a API pública do slowapi.
+
+Com RATE_LIMIT_STORAGE_URI apontando para o Redis (ex: redis://redis:6379/0),
+o limite vale para todos os workers e réplicas. A estratégia moving-window
+é executada no Redis por scripts Lua atômicos da biblioteca limits.
+
+O slowapi só suporta o storage síncrono da biblioteca limits: cada
+requisição limitada faz uma chamada bloqueante ao Redis no event loop
+(tipicamente menos de 1ms na mesma rede). O custo é limitado por
+REDIS_SOCKET_TIMEOUT, aplicado à conexão e a cada operação; se o Redis
+falhar, os limites passam a ser aplicados em memória, e o Redis só volta a
+ser consultado em intervalos crescentes, até responder novamente.
+"""
+import functools
+import sys
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from limits import parse_many
+from slowapi import Limiter
+from slowapi.util import get_remote_address
+from starlette.websockets import WebSocket
+from app.core.config import Settings
+from app.core.logging import logger
+from app.core.tracing import span
+
+KEY_PREFIX = "dummy_api"
+
+# Etapa rate_limit aberta pela requisição atual, encerrada quando o endpoint começa a executar
+_pending_check: ContextVar[Optional[Any]] = ContextVar("rate_limit_check", default=None)
+
+
+def _finish_check(exc_info=(None, None, None)):
+    check = _pending_check.get()
+    if check is not None:
+        _pending_check.set(None)
+        check.__exit__(*exc_info)
+
+
+def _start_endpoint(func: Callable) -> Callable:
+    """Encerra a etapa rate_limit ao entrar no endpoint: o slowapi já verificou os limites"""
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        _finish_check()
+        return await func(*args, **kwargs)
+    return wrapper
+
+
+class RateLimits:
+    """
+    Limites declarados pelos routers, aplicados ao Limiter de cada aplicação.
+
+    Exemplo de uso:
+
+    @router.get("/active/{active_name}")
+    @rate_limits.limit("10/minute")
+    async def get_active(active_name: str, request: Request = None): ...
+    """
+
+    def __init__(self):
+        self._limits: Dict[Callable, List[str]] = {}
+
+    def limit(self, limit_value: str) -> Callable[[Callable], Callable]:
+        def decorator(func: Callable) -> Callable:
+            self._limits.setdefault(func, []).append(limit_value)
+
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                request = kwargs["request"]
+                handler = request.app.state.rate_limited_handlers[func]
+                check = span("rate_limit")
+                check.__enter__()
+                token = _pending_check.set(check)
+                try:
+                    return await handler(*args, **kwargs)
+                finally:
+                    # Requisição recusada (429): a etapa termina com o erro
+                    _finish_check(sys.exc_info())
+                    _pending_check.reset(token)
+
+            return wrapper
+        return decorator
+
+    def bind(self, limiter: Limiter) -> Dict[Callable, Callable]:
+        """Aplica os limites declarados ao limiter; retorna o endpoint limitado de cada função"""
+        return {
+            func: limiter.limit(";".join(limit_values))(_start_endpoint(func))
+            for func, limit_values in self._limits.items()
+        }
+
+
+rate_limits = RateLimits()
+
+
+def websocket_allowed(websocket: WebSocket, limit_value: str) -> bool:
+    """
+    Consome o limite de uma conexão WebSocket no limiter da aplicação; o
+    slowapi só limita requisições HTTP. Deve ser chamada antes do handshake.
+
+    Returns:
+        False se o cliente excedeu o limite
+    """
+    limiter: Limiter = websocket.app.state.limiter
+    if not limiter.enabled:
+        return True
+    key = get_remote_address(websocket)
+    try:
+        return all(
+            limiter.limiter.hit(item, KEY_PREFIX, key, websocket.url.path)
+            for item in parse_many(limit_value)
+        )
+    except Exception as e:
+        # Mesmo comportamento das rotas HTTP com o storage fora do ar: a conexão não é recusada
+        logger.warning("Falha ao verificar o rate limit do WebSocket %s: %s", websocket.url.path, e)
+        return True
+
+
+def create_limiter(settings: Settings) -> Limiter:
+    """Cria o limiter com a estratégia e o storage das configurações"""
+    return Limiter(
+        key_func=get_remote_address,
+        strategy=settings.RATE_LIMIT_STRATEGY,
+        storage_uri=settings.RATE_LIMIT_STORAGE_URI,
+        storage_options=_storage_options(settings),
+        in_memory_fallback_enabled=True,
+        key_prefix=KEY_PREFIX,
+        enabled=settings.RATE_LIMIT_ENABLED
+    )
+
+
+def _storage_options(settings: Settings) -> Dict[str, Any]:
+    if not settings.RATE_LIMIT_STORAGE_URI.startswith(("redis://", "rediss://")):
+        return {}
+    return {
+        "socket_timeout": settings.REDIS_SOCKET_TIMEOUT,
+        "socket_connect_timeout": settings.REDIS_SOCKET_TIMEOUT
+    }
@@ -0,0 +1,355 @@
+"""
+Rastreamento leve por requisição, com detalhamento da latência por etapa.
+
+O TracingMiddleware sorteia as requisições rastreadas (TRACING_SAMPLE_RATE).
+A decisão de amostragem de um cabeçalho W3C traceparent recebido só é
+respeitada quando o cliente está em TRACING_TRUSTED_NETWORKS; dos demais,
+o traceparent só dá continuidade ao trace_id das requisições sorteadas,
+para que um cliente qualquer não force o rastreamento de tudo. Nas
+requisições rastreadas, cada span("etapa") mede uma etapa (rate limit,
+Circuit Breaker, fila de concorrência, backoff, chamada ao serviço externo,
+parsing/validação, serialização), alimenta o histograma por etapa e entra
+no cabeçalho Server-Timing da resposta:
+
+    Server-Timing: breaker;dur=0.01, upstream;dur=84.2, parse;dur=0.3, total;dur=86.0
+
+Nas requisições não sorteadas span() devolve um objeto vazio compartilhado,
+ao custo de uma leitura de ContextVar.
+
+Opcionalmente o SpanExporter grava os traces no formato OTLP/JSON, em um
+arquivo JSONL e/ou enviando para um coletor OpenTelemetry
+(ex: http://otel-collector:4318/v1/traces), em uma thread própria.
+"""
+import ipaddress
+import json
+import os
+import queue
+import random
+import re
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, Dict, Iterable, List, Optional
+
+import httpx
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.logging import logger
+from app.core.metrics import TRACE_STAGE_DURATION, TRACES_DROPPED
+
+TRACEPARENT_PATTERN = re.compile(r"^[0-9a-f]{2}-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+STATUS_CODE_ERROR = 2
+
+_current_trace: ContextVar[Optional["Trace"]] = ContextVar("current_trace", default=None)
+_current_span_id: ContextVar[Optional[str]] = ContextVar("current_span_id", default=None)
+
+
+def _new_span_id() -> str:
+    return os.urandom(8).hex()
+
+
+class Span:
+    """Etapa medida dentro de um trace; use via span("etapa")"""
+    __slots__ = ("trace", "name", "span_id", "parent_id", "kind", "attributes", "start", "end", "_token")
+
+    def __init__(self, trace: "Trace", name: str, attributes: Dict[str, Any], kind: int = SPAN_KIND_INTERNAL):
+        self.trace = trace
+        self.name = name
+        self.span_id = _new_span_id()
+        self.parent_id: Optional[str] = None
+        self.kind = kind
+        self.attributes = attributes
+        self.start = 0.0
+        self.end = 0.0
+        self._token = None
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def __enter__(self) -> "Span":
+        self.parent_id = _current_span_id.get() or self.trace.root_span_id
+        self._token = _current_span_id.set(self.span_id)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.end = time.perf_counter()
+        _current_span_id.reset(self._token)
+        if exc_type is not None:
+            self.attributes["error.type"] = exc_type.__name__
+        self.trace.spans.append(self)
+        TRACE_STAGE_DURATION.labels(stage=self.name).observe(self.end - self.start)
+
+
+class _NoopSpan:
+    """Span das requisições não rastreadas: não mede nem registra nada"""
+    __slots__ = ()
+
+    def set_attribute(self, key: str, value: Any):
+        pass
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Trace:
+    """Spans de uma requisição rastreada"""
+    __slots__ = ("trace_id", "root_span_id", "remote_parent_id", "spans", "root", "_start_ns", "_start")
+
+    def __init__(self, trace_id: Optional[str] = None, remote_parent_id: Optional[str] = None):
+        self.trace_id = trace_id or os.urandom(16).hex()
+        self.root_span_id = _new_span_id()
+        self.remote_parent_id = remote_parent_id
+        self.spans: List[Span] = []
+        self.root: Optional[Span] = None
+        self._start_ns = time.time_ns()
+        self._start = time.perf_counter()
+
+    def unix_nano(self, instant: float) -> int:
+        """Converte um instante de time.perf_counter em nanossegundos desde a época"""
+        return self._start_ns + int((instant - self._start) * 1e9)
+
+    def stage_durations(self) -> Dict[str, float]:
+        """Soma em segundos da duração dos spans de cada etapa"""
+        durations: Dict[str, float] = {}
+        for item in self.spans:
+            durations[item.name] = durations.get(item.name, 0.0) + (item.end - item.start)
+        return durations
+
+    def server_timing(self) -> str:
+        metrics = [f"{name};dur={seconds * 1000:.2f}" for name, seconds in self.stage_durations().items()]
+        metrics.append(f"total;dur={(time.perf_counter() - self._start) * 1000:.2f}")
+        return ", ".join(metrics)
+
+
+def span(name: str, **attributes: Any):
+    """
+    Mede uma etapa da requisição atual, se ela estiver sendo rastreada.
+
+    Exemplo de uso:
+
+    with span("upstream", provider="coin_desk_api"):
+        response = await client.get(url)
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        return NOOP_SPAN
+    return Span(trace, name, attributes)
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+class TracingMiddleware:
+    """
+    Middleware ASGI puro que inicia o trace das requisições sorteadas e
+    adiciona o cabeçalho Server-Timing às respostas delas.
+    Os traces concluídos são entregues ao SpanExporter em app.state.span_exporter, se houver.
+    """
+
+    def __init__(self, app: ASGIApp, sample_rate: float = 0.0, trusted_networks: Iterable[str] = ()):
+        """
+        Args:
+            app: Aplicação ASGI
+            sample_rate: Fração das requisições rastreadas
+            trusted_networks: Redes (ex: "10.0.0.0/8") cujos clientes decidem a
+                amostragem pela flag do traceparent
+        """
+        self.app = app
+        self.sample_rate = sample_rate
+        self.trusted_networks = [ipaddress.ip_network(network.strip(), strict=False) for network in trusted_networks if network.strip()]
+
+    def _is_trusted(self, scope: Scope) -> bool:
+        client = scope.get("client")
+        if not self.trusted_networks or not client:
+            return False
+        try:
+            address = ipaddress.ip_address(client[0])
+        except ValueError:
+            return False
+        return any(address in network for network in self.trusted_networks)
+
+    def _start_trace(self, scope: Scope) -> Optional[Trace]:
+        parent = None
+        for key, value in scope["headers"]:
+            if key == b"traceparent":
+                parent = TRACEPARENT_PATTERN.match(value.decode("latin-1").strip().lower())
+                break
+        if parent and self._is_trusted(scope):
+            sampled = bool(int(parent.group(3), 16) & 1)
+        else:
+            sampled = self.sample_rate > 0 and random.random() < self.sample_rate
+        if not sampled:
+            return None
+        if parent:
+            return Trace(trace_id=parent.group(1), remote_parent_id=parent.group(2))
+        return Trace()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        trace = self._start_trace(scope)
+        if trace is None:
+            await self.app(scope, receive, send)
+            return
+
+        root = Span(trace, "request", {"http.method": scope["method"], "http.target": scope["path"]}, SPAN_KIND_SERVER)
+        root.span_id = trace.root_span_id
+        trace.root = root
+
+        async def send_wrapper(message: Message):
+            if message["type"] == "http.response.start":
+                root.attributes["http.status_code"] = message["status"]
+                MutableHeaders(scope=message).append("Server-Timing", trace.server_timing())
+            await send(message)
+
+        token = _current_trace.set(trace)
+        root.start = trace._start
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            root.end = time.perf_counter()
+            _current_trace.reset(token)
+            exporter = getattr(scope["app"].state, "span_exporter", None)
+            if exporter is not None:
+                exporter.export(trace)
+
+
+def _attribute_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_span(trace: Trace, item: Span, parent_id: Optional[str]) -> Dict[str, Any]:
+    payload = {
+        "traceId": trace.trace_id,
+        "spanId": item.span_id,
+        "name": item.name,
+        "kind": item.kind,
+        "startTimeUnixNano": str(trace.unix_nano(item.start)),
+        "endTimeUnixNano": str(trace.unix_nano(item.end)),
+        "attributes": [{"key": key, "value": _attribute_value(value)} for key, value in item.attributes.items()],
+    }
+    if parent_id:
+        payload["parentSpanId"] = parent_id
+    if "error.type" in item.attributes or item.attributes.get("http.status_code", 0) >= 500:
+        payload["status"] = {"code": STATUS_CODE_ERROR}
+    return payload
+
+
+def to_otlp(traces: List[Trace], service_name: str) -> Dict[str, Any]:
+    """Monta um ExportTraceServiceRequest no formato OTLP/JSON"""
+    spans = []
+    for trace in traces:
+        if trace.root is not None:
+            spans.append(_otlp_span(trace, trace.root, trace.remote_parent_id))
+        spans.extend(_otlp_span(trace, item, item.parent_id) for item in trace.spans)
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": service_name}}]},
+            "scopeSpans": [{"scope": {"name": __name__}, "spans": spans}],
+        }]
+    }
+
+
+class SpanExporter:
+    """
+    Exporta traces em lotes, no formato OTLP/JSON, a partir de uma thread própria.
+    Com a fila cheia os traces novos são descartados, sem bloquear o event loop.
+
+    Exemplo de uso:
+
+    exporter = SpanExporter(path="traces.jsonl", endpoint="http://otel-collector:4318/v1/traces")
+    exporter.start()
+    exporter.export(trace)
+    exporter.stop()
+    """
+
+    def __init__(
+        self,
+        path: str = "",
+        endpoint: str = "",
+        service_name: str = "dummy_api",
+        queue_size: int = 1000,
+        batch_size: int = 100,
+        timeout: float = 2.0
+    ):
+        """
+        Args:
+            path: Arquivo JSONL que recebe um ExportTraceServiceRequest por linha (vazio desativa)
+            endpoint: URL OTLP/HTTP do coletor (vazio desativa)
+            service_name: Valor do atributo service.name dos traces
+            queue_size: Máximo de traces aguardando exportação
+            batch_size: Máximo de traces por lote exportado
+            timeout: Timeout em segundos do envio ao coletor
+        """
+        self.path = path
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self._queue: "queue.Queue[Optional[Trace]]" = queue.Queue(maxsize=queue_size)
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Exporta os traces pendentes e encerra a thread"""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def export(self, trace: Trace):
+        try:
+            self._queue.put_nowait(trace)
+        except queue.Full:
+            TRACES_DROPPED.labels(reason="queue_full").inc()
+
+    def _run(self):
+        with httpx.Client(timeout=self.timeout) as client:
+            running = True
+            while running:
+                batch = [self._queue.get()]
+                while len(batch) < self.batch_size:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                if None in batch:
+                    running = False
+                    batch = [trace for trace in batch if trace is not None]
+                if batch:
+                    self._write(client, batch)
+
+    def _write(self, client: httpx.Client, traces: List[Trace]):
+        payload = to_otlp(traces, self.service_name)
+        try:
+            if self.path:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(payload) + "\n")
+            if self.endpoint:
+                client.post(self.endpoint, json=payload).raise_for_status()
+        except (OSError, httpx.HTTPError) as e:
+            TRACES_DROPPED.labels(reason="export_error").inc(len(traces))
+            logger.warning("Falha ao exportar %d traces: %s", len(traces), e)
@@ -1,55 +1,230 @@
-from fastapi import FastAPI
-from pybreaker import CircuitBreakerError
+import asyncio
+import hmac
+import threading
+from fastapi import FastAPI, HTTPException, Query, Request, Response, status
+from fastapi.responses import PlainTextResponse
 from app.core.exceptions import (
+    CircuitBreakerError,
+    DeadlineExceededError,
     ExternalAPIServiceError, 
+    ServiceOverloadedError,
     external_api_service_exception_handler, 
     circuit_breaker_open_exception_handler,
+    deadline_exceeded_exception_handler,
+    service_overloaded_exception_handler,
     rate_limit_exceeded_handler
 )
-from slowapi import Limiter, _rate_limit_exceeded_handler
-from slowapi.util import get_remote_address
-from fastapi import Request
 from app.api.endpoints.v1.finance_router import router as finance_router
-from app.core.metrics import PrometheusMiddleware
-from prometheus_client import make_asgi_app
-from app.core.logging import logger
+from app.core.latency_stats import get_latency_stats
+from app.core.loop_monitor import EventLoopMonitor
+from app.core.metrics import PrometheusMiddleware, render_metrics
+from app.core.profiler import SamplingProfiler
+from app.core.tracing import SpanExporter, TracingMiddleware
+from app.core.logging import logger, setup_logging
+from app.core.config import Settings, get_settings, set_settings
+from app.core.http_client import create_http_client
+from app.core.rate_limit import create_limiter, rate_limits
+from app.services.coin_desk_api_service import (
+    ExternalApiService,
+    get_instrument_catalog,
+    get_provider_registry,
+    get_quote_cache,
+    get_quote_history
+)
+from app.services.instrument_catalog import InstrumentCatalogRefresher
+from app.services.prefetch_scheduler import PrefetchScheduler, instrument_popularity
+from app.services.quote_history import HistorySnapshotter
+from app.services.quote_stream import QuoteStreamHub
+from app.services.warm_start import WarmStartSnapshotter
 from contextlib import asynccontextmanager
+from typing import Optional
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    settings = app.state.settings
+    app.state.event_loop_monitor = None
+    if settings.EVENT_LOOP_MONITOR_ENABLED:
+        app.state.event_loop_monitor = EventLoopMonitor(
+            interval=settings.EVENT_LOOP_MONITOR_INTERVAL,
+            slow_threshold=settings.EVENT_LOOP_SLOW_CALLBACK_THRESHOLD
+        )
+        app.state.event_loop_monitor.start()
+    app.state.http_client = create_http_client(settings)
+    app.state.shared_quote_cache = None
+    if settings.REDIS_URL:
+        from app.services.shared_quote_cache import create_shared_quote_cache
+        app.state.shared_quote_cache = create_shared_quote_cache(settings)
+    app.state.prefetch_scheduler = PrefetchScheduler(
+        service=ExternalApiService(client=app.state.http_client, shared_cache=app.state.shared_quote_cache),
+        cache=get_quote_cache(),
+        registry=get_provider_registry(),
+        popularity=instrument_popularity,
+        top_n=settings.PREFETCH_TOP_N,
+        interval=settings.PREFETCH_INTERVAL,
+        refresh_ahead=settings.PREFETCH_REFRESH_AHEAD,
+        decay=settings.PREFETCH_DECAY
+    )
+    app.state.warm_start_snapshotter = None
+    if settings.WARM_START_SNAPSHOT_PATH:
+        app.state.warm_start_snapshotter = WarmStartSnapshotter(
+            path=settings.WARM_START_SNAPSHOT_PATH,
+            interval=settings.WARM_START_SNAPSHOT_INTERVAL,
+            max_age=settings.WARM_START_MAX_AGE,
+            max_instruments=settings.WARM_START_MAX_INSTRUMENTS,
+            service=ExternalApiService(client=app.state.http_client, shared_cache=app.state.shared_quote_cache),
+            cache=get_quote_cache(),
+            popularity=instrument_popularity,
+            registry=get_provider_registry()
+        )
+        app.state.warm_start_snapshotter.start()
+    if settings.PREFETCH_ENABLED:
+        app.state.prefetch_scheduler.start()
+    app.state.quote_stream_hub = QuoteStreamHub(
+        service=ExternalApiService(client=app.state.http_client, shared_cache=app.state.shared_quote_cache),
+        poll_interval=settings.STREAM_POLL_INTERVAL,
+        queue_size=settings.STREAM_CLIENT_QUEUE_SIZE
+    )
+    app.state.instrument_catalog_refresher = None
+    if settings.INSTRUMENT_CATALOG_ENABLED:
+        app.state.instrument_catalog_refresher = InstrumentCatalogRefresher(
+            catalog=get_instrument_catalog(),
+            loader=lambda: get_provider_registry().fetch_instruments(app.state.http_client),
+            interval=settings.INSTRUMENT_CATALOG_REFRESH_INTERVAL
+        )
+        app.state.instrument_catalog_refresher.start()
+    app.state.history_snapshotter = None
+    if settings.HISTORY_ENABLED and settings.HISTORY_SNAPSHOT_PATH:
+        app.state.history_snapshotter = HistorySnapshotter(
+            history=get_quote_history(),
+            path=settings.HISTORY_SNAPSHOT_PATH,
+            interval=settings.HISTORY_SNAPSHOT_INTERVAL
+        )
+        app.state.history_snapshotter.start()
+    app.state.span_exporter = None
+    if settings.TRACING_EXPORT_PATH or settings.TRACING_OTLP_ENDPOINT:
+        app.state.span_exporter = SpanExporter(
+            path=settings.TRACING_EXPORT_PATH,
+            endpoint=settings.TRACING_OTLP_ENDPOINT,
+            queue_size=settings.TRACING_EXPORT_QUEUE_SIZE
+        )
+        app.state.span_exporter.start()
     logger.info("Aplicação FastAPI iniciada.")
     yield
+    if app.state.warm_start_snapshotter is not None:
+        await app.state.warm_start_snapshotter.stop()
+    if app.state.history_snapshotter is not None:
+        await app.state.history_snapshotter.stop()
+    if app.state.instrument_catalog_refresher is not None:
+        await app.state.instrument_catalog_refresher.stop()
+    await app.state.quote_stream_hub.close()
+    await app.state.prefetch_scheduler.stop()
+    await app.state.http_client.aclose()
+    if app.state.shared_quote_cache is not None:
+        await app.state.shared_quote_cache.redis.aclose()
+    if app.state.span_exporter is not None:
+        await asyncio.to_thread(app.state.span_exporter.stop)
+    if app.state.event_loop_monitor is not None:
+        await app.state.event_loop_monitor.stop()
     logger.info("Aplicação FastAPI finalizada.")
 
-app = FastAPI(
-    title="Serviço de Integração de APIs",
-    description="API para integração e consulta de ativos financeiros em serviços externos.\n\nPrincipais recursos:\n- Consulta de dados de ativos financeiros (ex: BTC-BRL)\n- Circuit Breaker para resiliência\n- Retentativas automáticas\n- Tratamento detalhado de erros\n\nAcesse /docs para a documentação interativa gerada automaticamente pelo Swagger UI.",
-    version="1.0.0",
-    contact={
-        "name": "Pedro Nunes",
-        "email": "skytlepedro@hotmail.com"
-    },
-    license_info={
-        "name": "MIT",
-        "url": "https://opensource.org/licenses/MIT"
-    },
-    lifespan=lifespan
-)
+health_logger = logger.getChild("health")
 
-limiter = Limiter(key_func=get_remote_address)
-app.state.limiter = limiter
+def read_root():
+    health_logger.info("Health check solicitado.")
+    return {"status": "ok"}
 
-app.add_exception_handler(429, rate_limit_exceeded_handler)
-app.add_exception_handler(ExternalAPIServiceError, external_api_service_exception_handler)
-app.add_exception_handler(CircuitBreakerError, circuit_breaker_open_exception_handler)
+def metrics():
+    # Função síncrona: a leitura dos arquivos do modo multiprocesso roda no threadpool
+    content, media_type = render_metrics()
+    return Response(content=content, media_type=media_type)
 
-app.include_router(finance_router, prefix="/api/v1")
-app.add_middleware(PrometheusMiddleware)
+async def internal_stats():
+    # Assíncrona: os sketches são lidos no event loop, onde são atualizados
+    return get_latency_stats().snapshot()
 
-metrics_app = make_asgi_app()
-app.mount("/metrics", metrics_app)
+async def debug_profile(
+    request: Request,
+    seconds: float = Query(10.0, gt=0, title="Duração da coleta em segundos (limitada por DEBUG_PROFILE_MAX_SECONDS)")
+):
+    """Amostra a pilha do event loop e retorna as pilhas no formato collapsed stack (flamegraph)"""
+    settings = request.app.state.settings
+    expected = f"Bearer {settings.DEBUG_PROFILE_TOKEN}".encode()
+    if not hmac.compare_digest(request.headers.get("Authorization", "").encode(), expected):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token de acesso inválido.")
 
-@app.get("/", tags=["Health Check"])
-def read_root():
-    logger.info("Health check solicitado.")
-    return {"status": "ok"}
\ No newline at end of file
+    # Chamado no event loop: a thread do profiler amostra esta thread
+    collapsed = await asyncio.to_thread(
+        request.app.state.profiler.profile,
+        threading.get_ident(),
+        min(seconds, settings.DEBUG_PROFILE_MAX_SECONDS)
+    )
+    if collapsed is None:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Já existe uma coleta de profile em andamento.")
+    return PlainTextResponse(collapsed)
+
+def create_app(settings: Optional[Settings] = None) -> FastAPI:
+    """
+    Cria a aplicação. A importação deste módulo não tem efeitos colaterais:
+    configurações, logs e limiter só são preparados aqui, e os componentes
+    dos serviços (Circuit Breaker, cache, provedores) no primeiro uso.
+
+    Args:
+        settings: Configurações da aplicação; se omitidas, são lidas do ambiente
+    """
+    if settings is None:
+        settings = get_settings()
+    else:
+        set_settings(settings)
+    setup_logging(settings)
+
+    app = FastAPI(
+        title="Serviço de Integração de APIs",
+        description="API para integração e consulta de ativos financeiros em serviços externos.\n\nPrincipais recursos:\n- Consulta de dados de ativos financeiros (ex: BTC-BRL)\n- Circuit Breaker para resiliência\n- Retentativas automáticas\n- Tratamento detalhado de erros\n\nAcesse /docs para a documentação interativa gerada automaticamente pelo Swagger UI.",
+        version="1.0.0",
+        contact={
+            "name": "Pedro Nunes",
+            "email": "skytlepedro@hotmail.com"
+        },
+        license_info={
+            "name": "MIT",
+            "url": "https://opensource.org/licenses/MIT"
+        },
+        lifespan=lifespan
+    )
+
+    app.state.settings = settings
+    app.state.limiter = create_limiter(settings)
+    app.state.rate_limited_handlers = rate_limits.bind(app.state.limiter)
+
+    app.add_exception_handler(429, rate_limit_exceeded_handler)
+    app.add_exception_handler(ExternalAPIServiceError, external_api_service_exception_handler)
+    app.add_exception_handler(CircuitBreakerError, circuit_breaker_open_exception_handler)
+    app.add_exception_handler(DeadlineExceededError, deadline_exceeded_exception_handler)
+    app.add_exception_handler(ServiceOverloadedError, service_overloaded_exception_handler)
+
+    app.include_router(finance_router, prefix="/api/v1")
+    app.add_middleware(PrometheusMiddleware, latency_stats=get_latency_stats())
+    app.add_middleware(
+        TracingMiddleware,
+        sample_rate=settings.TRACING_SAMPLE_RATE,
+        trusted_networks=settings.TRACING_TRUSTED_NETWORKS.split(",")
+    )
+
+    app.add_api_route("/metrics", metrics, methods=["GET"], include_in_schema=False)
+    app.add_api_route("/internal/stats", internal_stats, methods=["GET"], include_in_schema=False)
+    app.add_api_route("/", read_root, methods=["GET"], tags=["Health Check"])
+    if settings.DEBUG_PROFILE_TOKEN:
+        app.state.profiler = SamplingProfiler(interval=settings.DEBUG_PROFILE_SAMPLE_INTERVAL)
+        app.add_api_route("/debug/profile", debug_profile, methods=["GET"], include_in_schema=False)
+    return app
+
+_app: Optional[FastAPI] = None
+
+def __getattr__(name: str):
+    # "uvicorn app.main:app" e "from app.main import app" criam a aplicação no primeiro acesso
+    global _app
+    if name == "app":
+        if _app is None:
+            _app = create_app()
+        return _app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
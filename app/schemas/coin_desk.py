@@ -1,4 +1,5 @@
-from pydantic import BaseModel, Field
+from typing import Dict, List, Optional
+from pydantic import BaseModel, Field, PrivateAttr
 
 class BTCData(BaseModel):
     type: str = Field(..., alias="TYPE")
@@ -26,9 +27,68 @@ class BTCData(BaseModel):
     current_hour_change: float = Field(..., alias="CURRENT_HOUR_CHANGE")
     current_hour_change_percentage: float = Field(..., alias="CURRENT_HOUR_CHANGE_PERCENTAGE")
 
+    _response_json: Optional[bytes] = PrivateAttr(default=None)
+
+    def to_response_json(self) -> bytes:
+        """
+        Retorna o corpo JSON de BTCDataResponse já serializado.
+        O resultado é memorizado na instância, então cotações servidas do
+        cache não são serializadas novamente.
+        """
+        if self._response_json is None:
+            body = self.__pydantic_serializer__.to_json(self, by_alias=True)
+            self._response_json = b'{"BTC-DATA":' + body + b'}'
+        return self._response_json
+
+    @property
+    def etag(self) -> str:
+        """ETag forte da cotação: o CCSEQ só muda quando o serviço externo publica um novo tick"""
+        return f'"{self.instrument}-{self.ccseq}"'
+
 class BTCDataResponse(BaseModel):
     btc_data: BTCData = Field(..., alias="BTC-DATA")
 
+class TickEnvelope(BaseModel):
+    """Envelope da resposta de /index/cc/v1/latest/tick, validado direto dos bytes"""
+    data: Dict[str, BTCData] = Field(default_factory=dict, alias="Data")
+    err: dict = Field(default_factory=dict, alias="Err")
+
+class BatchActivesResponse(BaseModel):
+    data: Dict[str, BTCData] = Field(default_factory=dict, alias="Data")
+    err: Dict[str, str] = Field(default_factory=dict, alias="Err")
+
+class OHLCCandle(BaseModel):
+    start: int
+    open: float
+    high: float
+    low: float
+    close: float
+    vwap: Optional[float] = None
+    volume: float
+    ticks: int
+
+class HistoryResponse(BaseModel):
+    instrument: str
+    interval: int
+    window: int
+    candles: List[OHLCCandle]
+
+class InstrumentSearchResponse(BaseModel):
+    query: str
+    catalog_loaded: bool
+    instruments: List[str]
+
+class CrossRate(BaseModel):
+    pair: str
+    value: float
+    derived: bool = Field(..., description="True se o valor foi calculado a partir de outras cotações")
+    staleness: float = Field(..., description="Idade em segundos da cotação mais antiga usada no cálculo")
+    path: List[str] = Field(..., description="Instrumentos usados no cálculo, na ordem da conversão")
+
+class BatchCrossRatesResponse(BaseModel):
+    data: Dict[str, CrossRate] = Field(default_factory=dict, alias="Data")
+    err: Dict[str, str] = Field(default_factory=dict, alias="Err")
+
 class APIResponse(BaseModel):
     data: BTCDataResponse
     err: dict = Field(default_factory=dict, alias="Err")
\ No newline at end of file
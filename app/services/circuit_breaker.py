@@ -1,93 +1,242 @@
-import pybreaker
-from functools import wraps
 import asyncio
+import time
+from collections import deque
+from typing import Callable, Iterable, List, Optional, Tuple, Type
+from app.core.exceptions import CircuitBreakerError
 from app.core.logging import logger
+from app.core.tracing import span
 from app.core.metrics import (
     CIRCUIT_BREAKER_STATE,
     CIRCUIT_BREAKER_FAILURE_COUNT,
     CIRCUIT_BREAKER_TRIPPED_TOTAL
 )
 
-class StateListener(pybreaker.CircuitBreakerListener):
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half-open"
+
+class CircuitBreakerListener:
+    """Interface para observar eventos do Circuit Breaker"""
+
+    def state_change(self, cb: "AsyncCircuitBreaker", old_state: str, new_state: str):
+        pass
+
+    def failure(self, cb: "AsyncCircuitBreaker", exc: Optional[BaseException]):
+        pass
+
+class StateListener(CircuitBreakerListener):
     def __init__(self, state_name):
         self.state_name = state_name
-    
+
     def state_change(self, cb, old_state, new_state):
-        if new_state.name == 'open':
+        if new_state == STATE_OPEN:
             CIRCUIT_BREAKER_STATE.labels(service_name=self.state_name).set(1)
             CIRCUIT_BREAKER_TRIPPED_TOTAL.labels(service_name=self.state_name).inc()
-            logger.warning(f"Circuit Breaker {self.state_name} foi aberto")
-        elif new_state.name == 'closed':
+            logger.warning("Circuit Breaker %s foi aberto", self.state_name)
+        elif new_state == STATE_CLOSED:
             CIRCUIT_BREAKER_STATE.labels(service_name=self.state_name).set(0)
             CIRCUIT_BREAKER_FAILURE_COUNT.labels(service_name=self.state_name).set(0)
-            logger.info(f"Circuit Breaker {self.state_name} foi fechado")
-        elif new_state.name == 'half-open':
-            logger.info(f"Circuit Breaker {self.state_name} está em modo de teste (half-open)")
+            logger.info("Circuit Breaker %s foi fechado", self.state_name)
+        elif new_state == STATE_HALF_OPEN:
+            logger.info("Circuit Breaker %s está em modo de teste (half-open)", self.state_name)
 
-class FailureListener(pybreaker.CircuitBreakerListener):
+class FailureListener(CircuitBreakerListener):
     def __init__(self, state_name):
         self.state_name = state_name
-    
+
     def failure(self, cb, exc):
         count = cb.fail_counter
         CIRCUIT_BREAKER_FAILURE_COUNT.labels(service_name=self.state_name).set(count)
-        logger.info(f"Circuit Breaker {self.state_name}: {count}/{cb.fail_max} falhas")
+        logger.info("Circuit Breaker %s: %d/%d falhas na janela", self.state_name, count, len(cb.window))
 
 class AsyncCircuitBreaker:
     """
-    Implementação assíncrona de Circuit Breaker usando a biblioteca pybreaker.
-    Esta implementação é thread-safe e não requer Redis ou outra infraestrutura externa.
-    
+    Implementação nativa em asyncio do padrão Circuit Breaker.
+    Não usa locks nem infraestrutura externa: todo o estado vive no event loop.
+
     O Circuit Breaker possui três estados:
     - closed: o circuito está fechado e as requisições são permitidas
     - open: o circuito está aberto e as requisições são rejeitadas
-    - half-open: o circuito está em modo de teste após o timeout de reset
-    
-    Quando o número de falhas consecutivas atinge fail_max, o circuito é aberto.
-    O circuito permanece aberto por reset_timeout segundos e depois é fechado novamente.
+    - half-open: após o reset_timeout, apenas half_open_max_calls requisições
+      de teste são admitidas; se todas tiverem sucesso o circuito fecha,
+      se alguma falhar ele abre novamente
+
+    As últimas window_size chamadas são mantidas em uma janela deslizante.
+    Quando a janela possui ao menos fail_max chamadas e a taxa de falhas
+    atinge failure_rate_threshold, o circuito é aberto. Chamadas que
+    demoram mais que slow_call_duration contam como falhas.
     """
-    def __init__(self, fail_max, reset_timeout, state_name, **kwargs):
+    def __init__(
+        self,
+        fail_max: int,
+        reset_timeout: float,
+        state_name: str,
+        window_size: int = 20,
+        failure_rate_threshold: float = 0.5,
+        slow_call_duration: Optional[float] = None,
+        half_open_max_calls: int = 1,
+        exclude: Iterable[Type[BaseException]] = (KeyError,),
+        clock: Callable[[], float] = time.monotonic
+    ):
         """
         Inicializa o Circuit Breaker.
-        
+
         Args:
-            fail_max: Número máximo de falhas consecutivas antes de abrir o circuito
-            reset_timeout: Tempo em segundos para resetar o circuito após estar aberto
+            fail_max: Número mínimo de chamadas na janela antes de avaliar a taxa de falhas
+            reset_timeout: Tempo em segundos que o circuito permanece aberto antes do half-open
             state_name: Nome do serviço/estado para identificação nas métricas
+            window_size: Quantidade de chamadas recentes consideradas na taxa de falhas
+            failure_rate_threshold: Taxa de falhas (0 a 1) que abre o circuito
+            slow_call_duration: Duração em segundos a partir da qual uma chamada conta como falha
+            half_open_max_calls: Número de requisições de teste admitidas no half-open
+            exclude: Exceções que não contam como falha do serviço externo
+            clock: Relógio monotônico usado para o reset_timeout
         """
         self.state_name = state_name
         self.fail_max = fail_max
         self.reset_timeout = reset_timeout
-        
+        self.failure_rate_threshold = failure_rate_threshold
+        self.slow_call_duration = slow_call_duration
+        self.half_open_max_calls = half_open_max_calls
+        self.exclude = tuple(exclude)
+        self._clock = clock
+
+        self.window: deque = deque(maxlen=window_size)
+        self.fail_counter = 0
+        self._state = STATE_CLOSED
+        self._opened_at = 0.0
+        self._half_open_permits = 0
+        self._half_open_successes = 0
+
         CIRCUIT_BREAKER_STATE.labels(service_name=self.state_name).set(0)
         CIRCUIT_BREAKER_FAILURE_COUNT.labels(service_name=self.state_name).set(0)
-        
-        listeners = [
+
+        self.listeners: List[CircuitBreakerListener] = [
             StateListener(state_name),
             FailureListener(state_name)
         ]
-        
-        self.breaker = pybreaker.CircuitBreaker(
-            fail_max=fail_max,
-            reset_timeout=reset_timeout,
-            exclude=[KeyError],
-            listeners=listeners,
-            name=state_name
+
+        logger.info(
+            "Circuit Breaker inicializado para %s com fail_max=%s, reset_timeout=%ss, "
+            "window_size=%s, failure_rate_threshold=%s",
+            state_name, fail_max, reset_timeout, window_size, failure_rate_threshold
         )
-        
-        logger.info(f"Circuit Breaker inicializado para {state_name} com fail_max={fail_max}, reset_timeout={reset_timeout}s")
+
+    @property
+    def current_state(self) -> str:
+        if self._state == STATE_OPEN and self._clock() - self._opened_at >= self.reset_timeout:
+            self._transition(STATE_HALF_OPEN)
+        return self._state
+
+    @property
+    def failure_rate(self) -> float:
+        if not self.window:
+            return 0.0
+        return self.fail_counter / len(self.window)
+
+    def _transition(self, new_state: str):
+        old_state = self._state
+        if old_state == new_state:
+            return
+        self._state = new_state
+
+        if new_state == STATE_OPEN:
+            self._opened_at = self._clock()
+        elif new_state == STATE_HALF_OPEN:
+            self._half_open_permits = 0
+            self._half_open_successes = 0
+        elif new_state == STATE_CLOSED:
+            self.window.clear()
+            self.fail_counter = 0
+
+        for listener in self.listeners:
+            listener.state_change(self, old_state, new_state)
+
+    def _acquire(self) -> bool:
+        """Reserva o direito de executar uma chamada no estado atual"""
+        state = self.current_state
+        if state == STATE_CLOSED:
+            return True
+        if state == STATE_HALF_OPEN and self._half_open_permits < self.half_open_max_calls:
+            self._half_open_permits += 1
+            return True
+        return False
+
+    def _record(self, failed: bool, exc: Optional[BaseException] = None):
+        if self._state == STATE_HALF_OPEN:
+            if failed:
+                self._transition(STATE_OPEN)
+            else:
+                self._half_open_successes += 1
+                if self._half_open_successes >= self.half_open_max_calls:
+                    self._transition(STATE_CLOSED)
+            return
+
+        if len(self.window) == self.window.maxlen and self.window[0]:
+            self.fail_counter -= 1
+        self.window.append(failed)
+
+        if not failed:
+            return
+
+        self.fail_counter += 1
+        for listener in self.listeners:
+            listener.failure(self, exc)
+
+        if (
+            self._state == STATE_CLOSED
+            and len(self.window) >= self.fail_max
+            and self.failure_rate >= self.failure_rate_threshold
+        ):
+            self._transition(STATE_OPEN)
+
+    def _is_slow(self, duration: float) -> bool:
+        return self.slow_call_duration is not None and duration >= self.slow_call_duration
+
+    def export_state(self) -> Tuple[str, float, List[bool]]:
+        """Retorna o estado, há quantos segundos o circuito foi aberto e a janela de chamadas"""
+        state = self.current_state
+        open_age = self._clock() - self._opened_at if state != STATE_CLOSED else 0.0
+        return state, open_age, list(self.window)
+
+    def restore_state(self, state: str, open_age: float, window: Iterable[bool]):
+        """
+        Restaura um estado de export_state (ex: após um reinício). Um circuito
+        aberto ou em half-open volta aberto apenas pelo que restava do
+        reset_timeout; um circuito fechado recupera a janela de chamadas.
+        """
+        if state == STATE_CLOSED:
+            self.window.clear()
+            self.window.extend(bool(failed) for failed in window)
+            self.fail_counter = sum(self.window)
+            CIRCUIT_BREAKER_FAILURE_COUNT.labels(service_name=self.state_name).set(self.fail_counter)
+            return
+
+        self._state = STATE_OPEN
+        self._opened_at = self._clock() - min(open_age, self.reset_timeout)
+        CIRCUIT_BREAKER_STATE.labels(service_name=self.state_name).set(1)
+        logger.warning("Circuit Breaker %s restaurado aberto (aberto há %.1fs)", self.state_name, open_age)
+
+    def reset(self):
+        """Fecha o circuito e descarta o histórico de chamadas da janela"""
+        self._transition(STATE_CLOSED)
+        self.window.clear()
+        self.fail_counter = 0
 
     async def can_execute(self):
-        """Verifica se o circuito está fechado e permite a execução"""
-        return self.breaker.current_state != 'open'
-    
-    async def success(self):
-        """Registra um sucesso no circuito""" 
-        pass
-    
-    async def fail(self):
+        """Verifica se o circuito permite a execução de uma nova chamada"""
+        state = self.current_state
+        if state == STATE_HALF_OPEN:
+            return self._half_open_permits < self.half_open_max_calls
+        return state == STATE_CLOSED
+
+    async def success(self, duration: float = 0.0):
+        """Registra um sucesso no circuito (chamadas lentas contam como falha)"""
+        self._record(self._is_slow(duration))
+
+    async def fail(self, exc: Optional[BaseException] = None):
         """Registra uma falha no circuito"""
-        pass
+        self._record(True, exc)
 
     async def execute(self, func, *args, **kwargs):
         """
@@ -96,16 +245,32 @@ class AsyncCircuitBreaker:
         Args:
             func: Função assíncrona a ser executada
             *args, **kwargs: Argumentos para a função
-            
+
         Returns:
             O resultado da função se bem-sucedida
-            
+
         Raises:
             CircuitBreakerError: Se o circuito estiver aberto
             Exception: Qualquer exceção levantada pela função
         """
-        @self.breaker
-        async def wrapped_func():
-            return await func(*args, **kwargs)
-        
-        return await wrapped_func()
+        with span("breaker"):
+            acquired = self._acquire()
+        if not acquired:
+            raise CircuitBreakerError(f"Circuit Breaker {self.state_name} está aberto")
+
+        start = self._clock()
+        try:
+            result = await func(*args, **kwargs)
+        except asyncio.CancelledError:
+            if self._state == STATE_HALF_OPEN:
+                self._half_open_permits -= 1
+            raise
+        except self.exclude:
+            self._record(self._is_slow(self._clock() - start))
+            raise
+        except Exception as exc:
+            self._record(True, exc)
+            raise
+
+        self._record(self._is_slow(self._clock() - start))
+        return result
@@ -1,61 +1,133 @@
+import asyncio
+import json
+from functools import lru_cache
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Tuple
 import httpx
-import pybreaker
-from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
-from app.core.config import settings
-from app.core.exceptions import ExternalAPIServiceError
-from app.schemas.coin_desk import BTCData
+from pydantic import ValidationError
+from app.core.config import get_settings
+from app.core.exceptions import (
+    CircuitBreakerError,
+    DeadlineExceededError,
+    ExternalAPIServiceError,
+    InstrumentNotFoundError,
+    ServiceOverloadedError
+)
+from app.schemas.coin_desk import BTCData, CrossRate, TickEnvelope
 from app.services.circuit_breaker import AsyncCircuitBreaker
+from app.services.concurrency_limiter import AdaptiveConcurrencyLimiter, PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE
+from app.services.cross_rates import CrossRateEngine
+from app.services.instrument_catalog import InstrumentCatalog
+from app.services.micro_batcher import MicroBatcher
+from app.services.quote_cache import AsyncTTLCache
+from app.services.quote_history import QuoteHistory
+from app.services.quote_providers import ProviderRegistry, QuoteProvider
+from app.services.retry_policy import Deadline, RetryBudget, RetryPolicy
+from app.core.latency_stats import UPSTREAM, get_latency_stats
 from app.core.logging import logger
+from app.core.tracing import span
 
 from app.core.metrics import (
+    CROSS_RATE_RESOLUTIONS,
     EXTERNAL_SERVICE_REQUESTS,
     EXTERNAL_SERVICE_ERRORS,
     EXTERNAL_SERVICE_DURATION,
+    FINANCE_BATCH_CHUNK_DURATION,
     MetricsTimer
 )
 
-RETRY_STRATEGY = retry(
-    retry=retry_if_exception_type((httpx.TimeoutException, httpx.HTTPStatusError)),
-    stop=stop_after_attempt(3),
-    wait=wait_exponential(multiplier=1, min=2, max=10)
-)
+if TYPE_CHECKING:
+    # O cliente do Redis só é importado quando REDIS_URL está configurado
+    from app.services.shared_quote_cache import RedisQuoteCache
 
-breaker = AsyncCircuitBreaker(
-    fail_max=settings.CIRCUIT_BREAKER_FAIL_MAX,
-    reset_timeout=settings.CIRCUIT_BREAKER_RESET_TIMEOUT,
-    state_name="coin_desk_api"  
-)
+SERVICE_NAME = "coin_desk_api"
+TICK_ENDPOINT = "/index/cc/v1/latest/tick"
+INSTRUMENTS_ENDPOINT = "/index/cc/v1/markets/instruments"
+NOT_FOUND_DETAIL = "Ativo {} não encontrado no serviço externo."
+# Respostas que rejeitam um lote por causa do pedido: só nelas os ativos são buscados separadamente
+REQUEST_REJECTION_STATUS_CODES = frozenset({400, 404})
+
+
+class CoinDeskProvider(QuoteProvider):
+    """Provedor do endpoint de ticks da CoinDesk (ou de um espelho com a mesma API)"""
+
+    def __init__(self, name: str, base_url: str, **kwargs):
+        super().__init__(name, **kwargs)
+        self.base_url = base_url
+
+    async def fetch_instruments(self, client: httpx.AsyncClient) -> Optional[List[str]]:
+        response = await client.get(
+            f"{self.base_url}{INSTRUMENTS_ENDPOINT}",
+            params={"market": "cadli", "instrument_status": "ACTIVE"}
+        )
+        response.raise_for_status()
+        return _parse_instruments(response.json())
+
+    async def _fetch_ticks(
+        self,
+        client: httpx.AsyncClient,
+        actives: List[str],
+        deadline: Optional[Deadline],
+        priority: int
+    ) -> Tuple[Dict[str, BTCData], Dict[str, str]]:
+        instruments = ",".join(actives)
+        request_url = f"{self.base_url}{TICK_ENDPOINT}"
+        # Os valores são codificados pelo httpx: um nome de ativo nunca acrescenta parâmetros à consulta
+        params = {"market": "cadli", "instruments": instruments, "apply_mapping": "true"}
+        endpoint = TICK_ENDPOINT
+        service_name = self.name
 
-class ExternalApiService:
-    def __init__(self, client: httpx.AsyncClient):
-        self.client = client
-        self.base_url = settings.EXTERNAL_API_BASE_URL
-        
-    @RETRY_STRATEGY
-    async def get_active_by_name(self, active: str) -> BTCData:
-        request_url = f"{self.base_url}/index/cc/v1/latest/tick?market=cadli&instruments={active}&apply_mapping=true"
-        endpoint = "/index/cc/v1/latest/tick"
-        service_name = "coin_desk_api"
-        
-        EXTERNAL_SERVICE_REQUESTS.labels(
-            service_name=service_name,
-            endpoint=endpoint,
-            method="GET"
-        ).inc()
-        
-        logger.info(f"Fetching data from external API..., url: {request_url}")
-        
         async def fetch_data():
-            with MetricsTimer(EXTERNAL_SERVICE_DURATION, {"service_name": service_name, "endpoint": endpoint}):
-                response = await self.client.get(request_url)
-                response.raise_for_status()
-                data = response.json()
-                btc_data_dict = data["Data"][active]
-                return BTCData(**btc_data_dict)
-        
+            EXTERNAL_SERVICE_REQUESTS.labels(
+                service_name=service_name,
+                endpoint=endpoint,
+                method="GET"
+            ).inc()
+
+            logger.debug("Fetching data from external API..., url: %s, instruments: %s", request_url, instruments)
+
+            with MetricsTimer(EXTERNAL_SERVICE_DURATION, {"service_name": service_name, "endpoint": endpoint}), \
+                    get_latency_stats().timer(UPSTREAM, f"{service_name} {endpoint}"):
+                with span("upstream", provider=service_name, instruments=len(actives)):
+                    response = await client.get(request_url, params=params)
+                    if response.status_code == 404:
+                        # Erro do pedido, não do serviço: não é repetido nem conta como falha no Circuit Breaker
+                        raise InstrumentNotFoundError(NOT_FOUND_DETAIL.format(instruments))
+                    response.raise_for_status()
+                with span("parse"):
+                    quotes, errors = _parse_ticks(response.content, actives)
+                _record_history(quotes.values())
+                _record_not_found(active for active, detail in errors.items() if detail == NOT_FOUND_DETAIL.format(active))
+                return quotes, errors
+
         try:
-            return await breaker.execute(fetch_data)
-        except pybreaker.CircuitBreakerError:
+            return await self.retry_policy.execute(
+                lambda: self.concurrency_limiter.execute(lambda: self.breaker.execute(fetch_data), priority),
+                deadline
+            )
+        except InstrumentNotFoundError:
+            EXTERNAL_SERVICE_ERRORS.labels(
+                service_name=service_name,
+                endpoint=endpoint,
+                error_type="InstrumentNotFound"
+            ).inc()
+            if len(actives) == 1:
+                _record_not_found(actives)
+            raise
+        except ServiceOverloadedError:
+            EXTERNAL_SERVICE_ERRORS.labels(
+                service_name=service_name,
+                endpoint=endpoint,
+                error_type="ServiceOverloaded"
+            ).inc()
+            raise
+        except DeadlineExceededError:
+            EXTERNAL_SERVICE_ERRORS.labels(
+                service_name=service_name,
+                endpoint=endpoint,
+                error_type="DeadlineExceeded"
+            ).inc()
+            raise
+        except CircuitBreakerError:
             EXTERNAL_SERVICE_ERRORS.labels(
                 service_name=service_name,
                 endpoint=endpoint,
@@ -63,18 +135,15 @@ class ExternalApiService:
             ).inc()
             raise ExternalAPIServiceError("Circuit Breaker está aberto. Tente novamente mais tarde.")
         except httpx.HTTPStatusError as e:
-            logger.error(f"HTTP error: {e}")
+            logger.error("HTTP error: %s", e)
             EXTERNAL_SERVICE_ERRORS.labels(
                 service_name=service_name,
                 endpoint=endpoint,
                 error_type=f"HTTPStatusError_{e.response.status_code}"
             ).inc()
-            
-            if e.response.status_code == 404:
-                raise ExternalAPIServiceError(f"Ativo {active} não encontrado no serviço externo.")
             raise
         except Exception as e:
-            logger.error(f"Erro inesperado na comunicação com a API externa: {e}")
+            logger.error("Erro inesperado na comunicação com a API externa: %s", e)
             
             EXTERNAL_SERVICE_ERRORS.labels(
                 service_name=service_name,
@@ -83,3 +152,505 @@ class ExternalApiService:
             ).inc()
             
             raise ExternalAPIServiceError(f"Erro inesperado na comunicação com a API externa: {e}")
+
+
+def create_coin_desk_provider(name: str, base_url: str) -> CoinDeskProvider:
+    """Cria um provedor CoinDesk com breaker, retentativas e limitador próprios, a partir de settings"""
+    settings = get_settings()
+
+    def observed_tick_latency() -> Optional[float]:
+        # Percentil da janela recente, com erro relativo limitado (os buckets do histograma são grossos demais)
+        return get_latency_stats().quantile(UPSTREAM, f"{name} {TICK_ENDPOINT}", settings.HEDGE_QUANTILE)
+
+    return CoinDeskProvider(
+        name=name,
+        base_url=base_url,
+        retry_policy=RetryPolicy(
+            service_name=name,
+            max_attempts=settings.RETRY_MAX_ATTEMPTS,
+            backoff_base=settings.RETRY_BACKOFF_BASE,
+            backoff_max=settings.RETRY_BACKOFF_MAX,
+            budget=RetryBudget(
+                ratio=settings.RETRY_BUDGET_RATIO,
+                window=settings.RETRY_BUDGET_WINDOW,
+                min_per_second=settings.RETRY_BUDGET_MIN_PER_SECOND
+            ),
+            hedge_enabled=settings.HEDGE_ENABLED,
+            hedge_min_delay=settings.HEDGE_MIN_DELAY,
+            hedge_delay_source=observed_tick_latency
+        ),
+        breaker=AsyncCircuitBreaker(
+            fail_max=settings.CIRCUIT_BREAKER_FAIL_MAX,
+            reset_timeout=settings.CIRCUIT_BREAKER_RESET_TIMEOUT,
+            state_name=name,
+            window_size=settings.CIRCUIT_BREAKER_WINDOW_SIZE,
+            failure_rate_threshold=settings.CIRCUIT_BREAKER_FAILURE_RATE_THRESHOLD,
+            slow_call_duration=settings.CIRCUIT_BREAKER_SLOW_CALL_DURATION,
+            half_open_max_calls=settings.CIRCUIT_BREAKER_HALF_OPEN_MAX_CALLS,
+            exclude=(KeyError, InstrumentNotFoundError)
+        ),
+        concurrency_limiter=AdaptiveConcurrencyLimiter(
+            name=name,
+            initial_limit=settings.CONCURRENCY_INITIAL_LIMIT,
+            min_limit=settings.CONCURRENCY_MIN_LIMIT,
+            max_limit=settings.CONCURRENCY_MAX_LIMIT,
+            latency_threshold=settings.CONCURRENCY_LATENCY_THRESHOLD,
+            backoff_ratio=settings.CONCURRENCY_BACKOFF_RATIO,
+            queue_size=settings.CONCURRENCY_QUEUE_SIZE,
+            max_queue_wait=settings.CONCURRENCY_MAX_QUEUE_WAIT,
+            retry_after=settings.CONCURRENCY_RETRY_AFTER
+        ),
+        failure_penalty=settings.FINANCE_REQUEST_DEADLINE
+    )
+
+
+@lru_cache(maxsize=None)
+def get_provider_registry() -> ProviderRegistry:
+    """Registro com o provedor principal e os espelhos de COIN_DESK_MIRROR_APIS, criado no primeiro uso"""
+    settings = get_settings()
+    registry = ProviderRegistry([create_coin_desk_provider(SERVICE_NAME, settings.COIN_DESK_API)])
+    for index, mirror_url in enumerate(url.strip() for url in settings.COIN_DESK_MIRROR_APIS.split(",") if url.strip()):
+        registry.register(create_coin_desk_provider(f"{SERVICE_NAME}_mirror_{index + 1}", mirror_url))
+    return registry
+
+
+@lru_cache(maxsize=None)
+def get_quote_cache() -> AsyncTTLCache:
+    settings = get_settings()
+    return AsyncTTLCache(
+        name="coin_desk_quotes",
+        ttl=settings.QUOTE_CACHE_TTL,
+        max_size=settings.QUOTE_CACHE_MAX_SIZE,
+        max_staleness=settings.QUOTE_CACHE_MAX_STALENESS
+    )
+
+
+@lru_cache(maxsize=None)
+def get_quote_history() -> QuoteHistory:
+    settings = get_settings()
+    return QuoteHistory(
+        max_points=settings.HISTORY_MAX_POINTS,
+        max_instruments=settings.HISTORY_MAX_INSTRUMENTS
+    )
+
+
+@lru_cache(maxsize=None)
+def get_instrument_catalog() -> InstrumentCatalog:
+    settings = get_settings()
+    return InstrumentCatalog(
+        negative_ttl=settings.INSTRUMENT_NEGATIVE_CACHE_TTL,
+        max_negative=settings.INSTRUMENT_NEGATIVE_CACHE_MAX_SIZE
+    )
+
+
+@lru_cache(maxsize=None)
+def get_micro_batcher() -> MicroBatcher:
+    settings = get_settings()
+    return MicroBatcher(
+        window=settings.MICRO_BATCH_WINDOW,
+        max_batch_size=min(settings.MICRO_BATCH_MAX_SIZE, settings.COIN_DESK_MAX_INSTRUMENTS_PER_REQUEST)
+    )
+
+
+@lru_cache(maxsize=None)
+def get_cross_rate_engine() -> CrossRateEngine:
+    settings = get_settings()
+    return CrossRateEngine(
+        cache=get_quote_cache(),
+        max_age=settings.CROSS_RATE_MAX_AGE,
+        max_hops=settings.CROSS_RATE_MAX_HOPS
+    )
+
+
+def _upstream_rate(pair: str, quote: BTCData) -> CrossRate:
+    """Taxa de um par buscado no serviço externo, com a idade da cotação no cache"""
+    CROSS_RATE_RESOLUTIONS.labels(source="upstream").inc()
+    time_to_expiry = get_quote_cache().time_to_expiry(pair)
+    staleness = 0.0 if time_to_expiry is None else max(get_quote_cache().ttl - time_to_expiry, 0.0)
+    return CrossRate(pair=pair, value=quote.value, derived=False, staleness=staleness, path=[quote.instrument])
+
+
+# Componentes do processo, criados no primeiro acesso (ex: from ... import quote_cache)
+# para que a importação do módulo não leia configurações
+_LAZY_COMPONENTS = {
+    "provider_registry": get_provider_registry,
+    "coin_desk_provider": lambda: get_provider_registry().get(SERVICE_NAME),
+    "breaker": lambda: get_provider_registry().get(SERVICE_NAME).breaker,
+    "retry_policy": lambda: get_provider_registry().get(SERVICE_NAME).retry_policy,
+    "concurrency_limiter": lambda: get_provider_registry().get(SERVICE_NAME).concurrency_limiter,
+    "quote_cache": get_quote_cache,
+    "quote_history": get_quote_history,
+    "instrument_catalog": get_instrument_catalog,
+    "micro_batcher": get_micro_batcher,
+    "cross_rate_engine": get_cross_rate_engine,
+}
+
+
+def __getattr__(name: str):
+    factory = _LAZY_COMPONENTS.get(name)
+    if factory is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return factory()
+
+
+class ExternalApiService:
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        shared_cache: Optional["RedisQuoteCache"] = None,
+        registry: Optional[ProviderRegistry] = None,
+        catalog: Optional[InstrumentCatalog] = None
+    ):
+        self.client = client
+        self.shared_cache = shared_cache
+        self.registry = registry if registry is not None else get_provider_registry()
+        self.catalog = catalog if catalog is not None else get_instrument_catalog()
+
+    async def get_active_by_name(self, active: str, deadline: Optional[Deadline] = None) -> BTCData:
+        """
+        Busca a cotação de um ativo, servindo do cache quando possível.
+        Requisições simultâneas para o mesmo ativo compartilham a mesma busca.
+
+        Args:
+            active: Nome do ativo (ex: "BTC-BRL")
+            deadline: Prazo da requisição de origem, respeitado pelas retentativas
+
+        Raises:
+            InstrumentNotFoundError: Se o ativo for inválido ou inexistente, sem chamar o serviço externo
+        """
+        self.catalog.validate(active)
+        return await get_quote_cache().get_or_load(active, lambda: self._load_active(active, deadline))
+
+    async def get_cross_rate(self, pair: str, deadline: Optional[Deadline] = None) -> CrossRate:
+        """
+        Responde um par pela cotação em cache ou por um caminho de conversão entre
+        cotações recentes (ex: BTC-EUR a partir de BTC-USD e EUR-USD). Só quando
+        não há caminho dentro de CROSS_RATE_MAX_AGE o par é buscado no serviço externo.
+
+        Args:
+            pair: Par de moedas (ex: "BTC-EUR")
+            deadline: Prazo da requisição de origem, usado na busca no serviço externo
+
+        Raises:
+            InstrumentNotFoundError: Se o par for inválido ou, sem caminho local, inexistente no serviço externo
+        """
+        self.catalog.validate_format(pair)
+        rate = get_cross_rate_engine().derive(pair)
+        if rate is not None:
+            CROSS_RATE_RESOLUTIONS.labels(source="derived" if rate.derived else "direct").inc()
+            return rate
+
+        quote = await self.get_active_by_name(pair, deadline)
+        return _upstream_rate(pair, quote)
+
+    async def get_cross_rates(
+        self,
+        pairs: List[str],
+        deadline: Optional[Deadline] = None
+    ) -> Tuple[Dict[str, CrossRate], Dict[str, str]]:
+        """
+        Versão em lote de get_cross_rate: os pares com caminho local são calculados
+        juntos, com uma única travessia do grafo por moeda base, e os demais são
+        buscados no serviço externo agrupados (get_actives_by_names).
+
+        Args:
+            pairs: Pares de moedas (ex: ["BTC-EUR", "ETH-BRL"])
+            deadline: Prazo da requisição de origem, usado na busca no serviço externo
+
+        Returns:
+            Uma tupla (taxa por par, mensagem de erro por par)
+        """
+        errors: Dict[str, str] = {}
+        valid = []
+        for pair in dict.fromkeys(pairs):
+            try:
+                self.catalog.validate_format(pair)
+                valid.append(pair)
+            except InstrumentNotFoundError as e:
+                errors[pair] = e.detail
+
+        rates = get_cross_rate_engine().derive_many(valid)
+        for rate in rates.values():
+            CROSS_RATE_RESOLUTIONS.labels(source="derived" if rate.derived else "direct").inc()
+
+        missing = [pair for pair in valid if pair not in rates]
+        if missing:
+            quotes, fetch_errors = await self.get_actives_by_names(missing, deadline)
+            errors.update(fetch_errors)
+            for pair, quote in quotes.items():
+                rates[pair] = _upstream_rate(pair, quote)
+        return rates, errors
+
+    def refresh_active(self, active: str) -> asyncio.Task:
+        """
+        Agenda a atualização da cotação de um ativo no cache em segundo plano.
+        A atualização sempre consulta o serviço externo, sem ler o cache compartilhado,
+        e tem prioridade menor que as requisições de usuários no limitador de concorrência.
+        """
+        return get_quote_cache().refresh(
+            active,
+            lambda: self._load_active(active, read_shared=False, priority=PRIORITY_BACKGROUND)
+        )
+
+    async def _load_active(
+        self,
+        active: str,
+        deadline: Optional[Deadline] = None,
+        read_shared: bool = True,
+        priority: int = PRIORITY_INTERACTIVE
+    ) -> BTCData:
+        """
+        Carrega uma cotação do cache compartilhado ou, na falta dele, do serviço externo.
+        Valida o ativo em todos os caminhos (requisição, prefetch, streams) antes de qualquer chamada.
+
+        Raises:
+            InstrumentNotFoundError: Se o ativo for inválido ou inexistente
+        """
+        self.catalog.validate(active)
+        if self.shared_cache is None:
+            return await self._fetch_active_by_name(active, deadline, priority)
+
+        if read_shared:
+            found = await self.shared_cache.get_many([active])
+            if active in found:
+                return found[active]
+
+        quote = await self._fetch_active_by_name(active, deadline, priority)
+        await self.shared_cache.set_many({active: quote})
+        return quote
+
+    async def get_actives_by_names(
+        self,
+        actives: List[str],
+        deadline: Optional[Deadline] = None
+    ) -> Tuple[Dict[str, BTCData], Dict[str, str]]:
+        """
+        Busca a cotação de vários ativos usando o menor número possível de chamadas
+        ao serviço externo. Os lotes são enviados em paralelo e a falha de um ativo
+        não invalida os demais.
+
+        Args:
+            actives: Nomes dos ativos (ex: ["BTC-BRL", "ETH-USD"])
+            deadline: Prazo da requisição de origem, respeitado pelas retentativas
+
+        Returns:
+            Uma tupla (cotações por ativo, mensagem de erro por ativo)
+        """
+        errors: Dict[str, str] = {}
+        valid = []
+        for active in dict.fromkeys(actives):
+            try:
+                self.catalog.validate(active)
+                valid.append(active)
+            except InstrumentNotFoundError as e:
+                errors[active] = e.detail
+        results, missing = get_quote_cache().get_many(valid)
+
+        if missing and self.shared_cache is not None:
+            shared_quotes = await self.shared_cache.get_many(missing)
+            for active, quote in shared_quotes.items():
+                get_quote_cache().set(active, quote)
+            results.update(shared_quotes)
+            missing = [active for active in missing if active not in shared_quotes]
+
+        chunks = _split_in_chunks(missing, get_settings().COIN_DESK_MAX_INSTRUMENTS_PER_REQUEST)
+        chunk_results = await asyncio.gather(
+            *[self._fetch_chunk_or_split(chunk, deadline) for chunk in chunks]
+        )
+
+        fetched: Dict[str, BTCData] = {}
+        for chunk_quotes, chunk_errors in chunk_results:
+            fetched.update(chunk_quotes)
+            errors.update(chunk_errors)
+
+        for active, quote in fetched.items():
+            get_quote_cache().set(active, quote)
+        if self.shared_cache is not None:
+            await self.shared_cache.set_many(fetched)
+        results.update(fetched)
+
+        return results, errors
+
+    async def _fetch_chunk_or_split(
+        self,
+        chunk: List[str],
+        deadline: Optional[Deadline]
+    ) -> Tuple[Dict[str, BTCData], Dict[str, str]]:
+        """
+        Busca um lote de ativos. Se o serviço externo rejeitar o lote por causa
+        do pedido (400, 404), cada ativo é buscado individualmente para isolar o
+        símbolo inválido; em falhas do serviço, o erro vale para todo o lote.
+        """
+        try:
+            with MetricsTimer(FINANCE_BATCH_CHUNK_DURATION, {"endpoint": "/finance/actives"}):
+                return await self._fetch_actives_chunk(chunk, deadline)
+        except (ExternalAPIServiceError, httpx.HTTPStatusError) as e:
+            if len(chunk) == 1 or not _is_request_rejection(e):
+                return {}, {active: _error_detail(e) for active in chunk}
+
+        logger.warning("Lote com %d ativos rejeitado, buscando individualmente", len(chunk))
+        outcomes = await asyncio.gather(
+            *[self.get_active_by_name(active, deadline) for active in chunk],
+            return_exceptions=True
+        )
+        quotes = {}
+        errors = {}
+        for active, outcome in zip(chunk, outcomes):
+            if isinstance(outcome, BaseException):
+                errors[active] = _error_detail(outcome)
+            else:
+                quotes[active] = outcome
+        return quotes, errors
+
+    async def _fetch_active_by_name(
+        self,
+        active: str,
+        deadline: Optional[Deadline] = None,
+        priority: int = PRIORITY_INTERACTIVE
+    ) -> BTCData:
+        """
+        Busca um ativo no serviço externo. Com MICRO_BATCH_ENABLED, buscas
+        concorrentes de ativos diferentes são agrupadas em uma única chamada.
+        """
+        if get_settings().MICRO_BATCH_ENABLED:
+            return await get_micro_batcher().load(
+                (id(self.registry), id(self.client), priority),
+                active,
+                deadline,
+                lambda actives, batch_deadline: self._fetch_batch(actives, batch_deadline, priority)
+            )
+        quotes, failures = await self._fetch_batch([active], deadline, priority)
+        if active in quotes:
+            return quotes[active]
+        raise failures[active]
+
+    async def _fetch_batch(
+        self,
+        actives: List[str],
+        deadline: Optional[Deadline],
+        priority: int
+    ) -> Tuple[Dict[str, BTCData], Dict[str, BaseException]]:
+        """
+        Busca um lote do micro-batching e retorna (cotações, erro por ativo).
+        Se o serviço externo rejeitar o lote por causa do pedido (400, 404),
+        cada ativo é buscado individualmente para que um símbolo inválido não
+        derrube os demais. Falhas do serviço (5xx, nenhum provedor disponível)
+        são repassadas a todo o lote: dividi-lo multiplicaria a carga sobre um
+        serviço já degradado.
+        """
+        try:
+            quotes, errors = await self.registry.fetch_ticks(self.client, actives, deadline, priority)
+        except (ExternalAPIServiceError, httpx.HTTPStatusError) as e:
+            if len(actives) == 1 or not _is_request_rejection(e):
+                raise
+            logger.warning("Lote com %d ativos rejeitado, buscando individualmente", len(actives))
+            outcomes = await asyncio.gather(
+                *[self._fetch_batch([active], deadline, priority) for active in actives],
+                return_exceptions=True
+            )
+            quotes, failures = {}, {}
+            for active, outcome in zip(actives, outcomes):
+                if isinstance(outcome, BaseException):
+                    failures[active] = outcome
+                else:
+                    quotes.update(outcome[0])
+                    failures.update(outcome[1])
+            return quotes, failures
+
+        failures = {
+            active: _missing_quote_error(active, errors.get(active))
+            for active in actives if active not in quotes
+        }
+        return quotes, failures
+
+    async def _fetch_actives_chunk(
+        self,
+        actives: List[str],
+        deadline: Optional[Deadline] = None
+    ) -> Tuple[Dict[str, BTCData], Dict[str, str]]:
+        return await self.registry.fetch_ticks(self.client, actives, deadline)
+
+
+def _parse_ticks(content: bytes, actives: List[str]) -> Tuple[Dict[str, BTCData], Dict[str, str]]:
+    """
+    Valida a resposta do serviço externo direto dos bytes, em uma única passada.
+    Se algum instrumento vier inválido, recorre à validação individual para
+    que os demais instrumentos do lote sejam aproveitados.
+    """
+    try:
+        payload = TickEnvelope.model_validate_json(content).data
+    except ValidationError:
+        return _parse_ticks_per_instrument(json.loads(content), actives)
+
+    quotes = {}
+    errors = {}
+    for active in actives:
+        quote = payload.get(active)
+        if quote is None:
+            errors[active] = NOT_FOUND_DETAIL.format(active)
+        else:
+            quotes[active] = quote
+    return quotes, errors
+
+
+def _parse_ticks_per_instrument(data: dict, actives: List[str]) -> Tuple[Dict[str, BTCData], Dict[str, str]]:
+    quotes = {}
+    errors = {}
+    payload = data.get("Data") or {}
+    for active in actives:
+        if active not in payload:
+            errors[active] = NOT_FOUND_DETAIL.format(active)
+            continue
+        try:
+            quotes[active] = BTCData(**payload[active])
+        except ValidationError as e:
+            errors[active] = f"Resposta inválida do serviço externo: {e.error_count()} campo(s) inválido(s)"
+    return quotes, errors
+
+
+def _parse_instruments(data: dict) -> List[str]:
+    """Extrai os nomes da lista de instrumentos ({"Data": {mercado: {"instruments": {nome: ...}}}})"""
+    instruments = []
+    for market in (data.get("Data") or {}).values():
+        if isinstance(market, dict):
+            instruments.extend(market.get("instruments") or {})
+    return instruments
+
+
+def _record_not_found(actives: Iterable[str]):
+    catalog = get_instrument_catalog()
+    for active in actives:
+        catalog.mark_not_found(active)
+
+
+def _record_history(quotes: Iterable[BTCData]):
+    if get_settings().HISTORY_ENABLED:
+        get_quote_history().record_many(quotes)
+
+
+def _split_in_chunks(actives: List[str], max_size: int) -> List[List[str]]:
+    """Divide os ativos no menor número de lotes, com tamanhos equilibrados"""
+    if not actives:
+        return []
+    chunk_count = -(-len(actives) // max_size)
+    chunk_size = -(-len(actives) // chunk_count)
+    return [actives[i:i + chunk_size] for i in range(0, len(actives), chunk_size)]
+
+
+def _missing_quote_error(active: str, detail: Optional[str]) -> ExternalAPIServiceError:
+    """Erro de um ativo ausente da resposta do serviço externo"""
+    detail = detail or NOT_FOUND_DETAIL.format(active)
+    if detail == NOT_FOUND_DETAIL.format(active):
+        return InstrumentNotFoundError(detail)
+    return ExternalAPIServiceError(detail)
+
+
+def _is_request_rejection(exc: BaseException) -> bool:
+    """Indica se o lote foi rejeitado por causa do pedido (ex: um símbolo inválido), e não por falha do serviço"""
+    if isinstance(exc, InstrumentNotFoundError):
+        return True
+    return isinstance(exc, httpx.HTTPStatusError) and exc.response.status_code in REQUEST_REJECTION_STATUS_CODES
+
+
+def _error_detail(exc: BaseException) -> str:
+    return getattr(exc, "detail", None) or str(exc) or exc.__class__.__name__
@@ -0,0 +1,203 @@
+"""
+Limitador adaptativo de concorrência para chamadas a serviços externos.
+
+O limite de chamadas simultâneas segue o algoritmo AIMD:
+- cada chamada concluída abaixo de latency_threshold aumenta o limite em
+  1/limite (cerca de +1 a cada "janela" completa de chamadas)
+- uma chamada lenta ou um sinal de sobrecarga (timeout, falha de
+  transporte, 429, 5xx) multiplica o limite por backoff_ratio
+
+Chamadas acima do limite aguardam em uma fila de prioridade limitada.
+Requisições de usuários têm prioridade sobre atualizações em segundo plano
+(prefetch e streaming). Com a fila cheia ou após max_queue_wait, a chamada
+é descartada com ServiceOverloadedError (503 com Retry-After).
+"""
+import asyncio
+import heapq
+import itertools
+import time
+from typing import Awaitable, Callable, List, TypeVar
+
+from app.core.exceptions import ServiceOverloadedError
+from app.core.tracing import span
+from app.core.metrics import (
+    CONCURRENCY_LIMIT,
+    CONCURRENCY_IN_FLIGHT,
+    CONCURRENCY_QUEUE_DEPTH,
+    CONCURRENCY_SHED_REQUESTS
+)
+from app.services.retry_policy import is_retryable
+
+T = TypeVar("T")
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 1
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    Exemplo de uso:
+
+    limiter = AdaptiveConcurrencyLimiter("coin_desk_api", initial_limit=20, ...)
+    data = await limiter.execute(lambda: client.get(url), priority=PRIORITY_INTERACTIVE)
+    """
+
+    def __init__(
+        self,
+        name: str,
+        initial_limit: int = 20,
+        min_limit: int = 1,
+        max_limit: int = 100,
+        latency_threshold: float = 1.0,
+        backoff_ratio: float = 0.9,
+        queue_size: int = 100,
+        max_queue_wait: float = 1.0,
+        retry_after: int = 1,
+        is_overload: Callable[[BaseException], bool] = is_retryable,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        """
+        Inicializa o limitador.
+
+        Args:
+            name: Nome do limitador para identificação nas métricas
+            initial_limit: Limite inicial de chamadas simultâneas
+            min_limit: Limite mínimo, mesmo sob sobrecarga contínua
+            max_limit: Limite máximo (ex: vagas por host do pool de conexões)
+            latency_threshold: Latência em segundos acima da qual o limite é reduzido
+            backoff_ratio: Fator multiplicativo aplicado ao limite quando há sobrecarga
+            queue_size: Número máximo de chamadas aguardando vaga
+            max_queue_wait: Tempo máximo em segundos aguardando vaga antes do descarte
+            retry_after: Valor em segundos sugerido ao cliente no Retry-After
+            is_overload: Função que decide se uma exceção indica sobrecarga do serviço externo
+            clock: Relógio monotônico usado para medir a latência
+        """
+        self.name = name
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_threshold = latency_threshold
+        self.backoff_ratio = backoff_ratio
+        self.queue_size = queue_size
+        self.max_queue_wait = max_queue_wait
+        self.retry_after = retry_after
+        self.is_overload = is_overload
+        self._clock = clock
+
+        self._limit = float(max(min_limit, min(initial_limit, max_limit)))
+        self.in_flight = 0
+        self._queue: List[list] = []  # heap de [prioridade, sequência, future]
+        self._sequence = itertools.count()
+
+        self._in_flight_gauge = CONCURRENCY_IN_FLIGHT.labels(limiter_name=name)
+        self._queue_depth_gauge = CONCURRENCY_QUEUE_DEPTH.labels(limiter_name=name)
+        CONCURRENCY_LIMIT.labels(limiter_name=name).set(self.limit)
+        self._update_gauges()
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._queue)
+
+    def _set_limit(self, value: float):
+        self._limit = max(float(self.min_limit), min(float(self.max_limit), value))
+        CONCURRENCY_LIMIT.labels(limiter_name=self.name).set(self.limit)
+
+    def _update_gauges(self):
+        # No modo multiprocesso do Prometheus só valores atribuídos com set() são exportados
+        self._in_flight_gauge.set(self.in_flight)
+        self._queue_depth_gauge.set(len(self._queue))
+
+    def _shed(self, reason: str) -> ServiceOverloadedError:
+        CONCURRENCY_SHED_REQUESTS.labels(limiter_name=self.name, reason=reason).inc()
+        return ServiceOverloadedError(
+            f"Limite de chamadas simultâneas ao serviço externo atingido ({self.limit}).",
+            retry_after=self.retry_after
+        )
+
+    def _wake(self):
+        """Concede vagas livres às chamadas da fila, na ordem de prioridade"""
+        while self._queue and self.in_flight < self.limit:
+            _, _, future = heapq.heappop(self._queue)
+            if future.done():
+                continue
+            self.in_flight += 1
+            future.set_result(None)
+        self._update_gauges()
+
+    def _remove(self, entry: list):
+        try:
+            self._queue.remove(entry)
+        except ValueError:
+            return
+        heapq.heapify(self._queue)
+        self._update_gauges()
+
+    async def _acquire(self, priority: int):
+        if self.in_flight < self.limit and not self._queue:
+            self.in_flight += 1
+            self._update_gauges()
+            return
+
+        if len(self._queue) >= self.queue_size:
+            worst = max(self._queue)
+            if worst[0] <= priority:
+                raise self._shed("queue_full")
+            # A chamada nova tem prioridade maior: descarta a de menor prioridade mais recente
+            self._remove(worst)
+            worst[2].set_exception(self._shed("evicted"))
+
+        future = asyncio.get_running_loop().create_future()
+        entry = [priority, next(self._sequence), future]
+        heapq.heappush(self._queue, entry)
+        self._update_gauges()
+        try:
+            await asyncio.wait_for(future, self.max_queue_wait)
+        except asyncio.TimeoutError:
+            self._remove(entry)
+            raise self._shed("queue_timeout")
+        except BaseException:
+            if future.done() and not future.cancelled() and future.exception() is None:
+                # A vaga foi concedida, mas o chamador desistiu (ex: deadline esgotado)
+                self._release()
+            else:
+                self._remove(entry)
+            raise
+
+    def _release(self):
+        self.in_flight -= 1
+        self._wake()
+
+    def _on_success(self, latency: float):
+        if latency > self.latency_threshold:
+            self._set_limit(self._limit * self.backoff_ratio)
+        else:
+            self._set_limit(self._limit + 1 / self._limit)
+
+    async def execute(self, func: Callable[[], Awaitable[T]], priority: int = PRIORITY_INTERACTIVE) -> T:
+        """
+        Executa a chamada quando houver vaga, ajustando o limite pelo resultado.
+
+        Raises:
+            ServiceOverloadedError: Se a chamada for descartada por falta de vaga
+            Exception: Qualquer exceção levantada pela função
+        """
+        with span("concurrency_queue"):
+            await self._acquire(priority)
+        start = self._clock()
+        try:
+            result = await func()
+        except Exception as exc:
+            if self.is_overload(exc):
+                self._set_limit(self._limit * self.backoff_ratio)
+            self._release()
+            raise
+        except BaseException:
+            self._release()
+            raise
+
+        self._on_success(self._clock() - start)
+        self._release()
+        return result
@@ -0,0 +1,134 @@
+"""
+Derivação local de taxas cruzadas a partir das cotações em cache.
+
+Cada cotação BASE-COTAÇÃO do cache é uma aresta do grafo de moedas
+(BASE -> COTAÇÃO com o valor da cotação, e COTAÇÃO -> BASE com o inverso).
+Um par pedido, como BTC-EUR, é respondido pelo caminho com menos conversões
+(até CROSS_RATE_MAX_HOPS) e, entre esses, pelo mais recente, usando apenas
+cotações armazenadas há no máximo CROSS_RATE_MAX_AGE segundos. Sem caminho,
+o chamador busca o par no serviço externo.
+
+O grafo é reconstruído só quando o cache muda. Uma busca em largura a
+partir de cada moeda base calcula de uma vez as taxas para todas as moedas
+alcançáveis, então vários pares com a mesma base custam uma única
+travessia (derive_many, usado por /finance/rates).
+"""
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from app.core.metrics import CROSS_RATE_GRAPH_SIZE
+from app.schemas.coin_desk import BTCData, CrossRate
+from app.services.quote_cache import AsyncTTLCache
+
+# (moeda de destino, taxa, instante em que a cotação foi armazenada, instrumento)
+Edge = Tuple[str, float, float, str]
+# (taxa acumulada, instante da cotação mais antiga do caminho, instrumentos do caminho)
+Path = Tuple[float, float, List[str]]
+
+
+def split_pair(pair: str) -> Tuple[str, str]:
+    base, _, quote = pair.partition("-")
+    return base.upper(), quote.upper()
+
+
+class CrossRateEngine:
+    """
+    Exemplo de uso:
+
+    engine = CrossRateEngine(cache=quote_cache, max_age=5, max_hops=3)
+    rate = engine.derive("BTC-EUR")  # None se não houver caminho recente o bastante
+    """
+
+    def __init__(
+        self,
+        cache: AsyncTTLCache,
+        max_age: float,
+        max_hops: int,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        """
+        Args:
+            cache: Cache de cotações usado como fonte das arestas
+            max_age: Idade máxima em segundos de cada cotação usada no cálculo
+            max_hops: Número máximo de conversões em um caminho
+            clock: Relógio monotônico do cache
+        """
+        self.cache = cache
+        self.max_age = max_age
+        self.max_hops = max_hops
+        self._clock = clock
+        self._graph: Dict[str, List[Edge]] = {}
+        self._version: Optional[int] = None
+
+    def _current_graph(self) -> Dict[str, List[Edge]]:
+        if self._version != self.cache.version:
+            self._graph = build_graph(
+                (quote, stored_at) for _, quote, stored_at in self.cache.entries() if isinstance(quote, BTCData)
+            )
+            self._version = self.cache.version
+            CROSS_RATE_GRAPH_SIZE.set(len(self._graph))
+        return self._graph
+
+    def _paths_from(self, graph: Dict[str, List[Edge]], base: str, oldest_allowed: float) -> Dict[str, Path]:
+        """Melhor caminho da moeda base para cada moeda alcançável: menos conversões e, no empate, o mais recente"""
+        best: Dict[str, Path] = {base: (1.0, float("inf"), [])}
+        frontier = [base]
+        for _ in range(self.max_hops):
+            reached: Dict[str, Path] = {}
+            for currency in frontier:
+                rate, oldest, path = best[currency]
+                for target, edge_rate, stored_at, instrument in graph.get(currency, ()):
+                    if target in best or stored_at < oldest_allowed:
+                        continue
+                    candidate = (rate * edge_rate, min(oldest, stored_at), path + [instrument])
+                    current = reached.get(target)
+                    if current is None or candidate[1] > current[1]:
+                        reached[target] = candidate
+            if not reached:
+                break
+            best.update(reached)
+            frontier = list(reached)
+        return best
+
+    def derive_many(self, pairs: Iterable[str]) -> Dict[str, CrossRate]:
+        """Calcula os pares com caminho recente o bastante; os demais ficam de fora do resultado"""
+        graph = self._current_graph()
+        now = self._clock()
+        by_base: Dict[str, List[Tuple[str, str]]] = {}
+        for pair in pairs:
+            base, quote = split_pair(pair)
+            by_base.setdefault(base, []).append((pair, quote))
+
+        rates = {}
+        for base, targets in by_base.items():
+            if base not in graph:
+                continue
+            paths = self._paths_from(graph, base, now - self.max_age)
+            for pair, quote in targets:
+                found = paths.get(quote)
+                if found is None or not found[2]:
+                    continue
+                rate, oldest, path = found
+                rates[pair] = CrossRate(
+                    pair=pair,
+                    value=rate,
+                    derived=len(path) > 1 or split_pair(path[0]) != (base, quote),
+                    staleness=max(now - oldest, 0.0),
+                    path=path
+                )
+        return rates
+
+    def derive(self, pair: str) -> Optional[CrossRate]:
+        return self.derive_many([pair]).get(pair)
+
+
+def build_graph(quotes: Iterable[Tuple[BTCData, float]]) -> Dict[str, List[Edge]]:
+    """Monta a lista de adjacência com a cotação direta e a inversa de cada instrumento"""
+    graph: Dict[str, List[Edge]] = {}
+    for quote, stored_at in quotes:
+        base, counter = split_pair(quote.instrument)
+        if not base or not counter or quote.value <= 0:
+            continue
+        graph.setdefault(base, []).append((counter, quote.value, stored_at, quote.instrument))
+        graph.setdefault(counter, []).append((base, 1 / quote.value, stored_at, quote.instrument))
+    return graph
@@ -0,0 +1,181 @@
+"""
+Validação de nomes de ativos antes de qualquer chamada ao serviço externo.
+
+Um nome de ativo é rejeitado localmente, sem tocar no serviço externo, quando:
+- não tem o formato BASE-COTAÇÃO (ex: BTC-BRL)
+- o catálogo de instrumentos já foi carregado e não contém o ativo
+- o serviço externo informou há pouco que o ativo não existe (cache
+  negativo com TTL curto)
+
+O catálogo é atualizado periodicamente a partir da lista de instrumentos
+do serviço externo e mantém um índice ordenado para busca por prefixo.
+Enquanto não houver catálogo carregado, apenas o formato e o cache
+negativo são verificados.
+"""
+import asyncio
+import re
+import time
+from bisect import bisect_left
+from collections import OrderedDict
+from typing import Awaitable, Callable, Iterable, List, Optional
+
+from app.core.exceptions import InstrumentNotFoundError
+from app.core.logging import logger
+from app.core.metrics import INSTRUMENT_CATALOG_SIZE, INSTRUMENT_REJECTIONS
+
+INSTRUMENT_PATTERN = re.compile(r"^[A-Za-z0-9._]{1,32}-[A-Za-z0-9._]{1,32}$")
+
+
+class InstrumentCatalog:
+    """
+    Exemplo de uso:
+
+    catalog = InstrumentCatalog(negative_ttl=30, max_negative=4096)
+    catalog.replace(["BTC-BRL", "BTC-USD"])
+    catalog.validate("BTC-BRL")
+    catalog.search("BTC")
+    """
+
+    def __init__(self, negative_ttl: float, max_negative: int, clock: Callable[[], float] = time.monotonic):
+        """
+        Inicializa o catálogo vazio (ainda não carregado).
+
+        Args:
+            negative_ttl: Tempo em segundos que um ativo inexistente é rejeitado sem nova consulta
+            max_negative: Número máximo de ativos no cache negativo antes do descarte LRU
+            clock: Relógio monotônico usado para expiração do cache negativo
+        """
+        self.negative_ttl = negative_ttl
+        self.max_negative = max_negative
+        self._clock = clock
+        self._instruments: frozenset = frozenset()
+        self._index: List[str] = []
+        self._loaded = False
+        self._not_found: "OrderedDict[str, float]" = OrderedDict()
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    def __len__(self) -> int:
+        return len(self._instruments)
+
+    def __contains__(self, instrument: str) -> bool:
+        return instrument in self._instruments
+
+    def replace(self, instruments: Iterable[str]):
+        """Substitui o catálogo pela lista atual do serviço externo"""
+        self._instruments = frozenset(instruments)
+        self._index = sorted(instrument.upper() for instrument in self._instruments)
+        self._loaded = True
+        INSTRUMENT_CATALOG_SIZE.set(len(self._instruments))
+
+    def clear(self):
+        self._instruments = frozenset()
+        self._index = []
+        self._loaded = False
+        self._not_found.clear()
+        INSTRUMENT_CATALOG_SIZE.set(0)
+
+    def search(self, prefix: str, limit: int = 20) -> List[str]:
+        """Instrumentos que começam com o prefixo (sem diferenciar maiúsculas), em ordem alfabética"""
+        prefix = prefix.upper()
+        start = bisect_left(self._index, prefix)
+        matches = []
+        for instrument in self._index[start:start + limit]:
+            if not instrument.startswith(prefix):
+                break
+            matches.append(instrument)
+        return matches
+
+    def mark_not_found(self, instrument: str):
+        """Registra que o serviço externo não conhece o ativo"""
+        INSTRUMENT_REJECTIONS.labels(reason="upstream_not_found").inc()
+        self._not_found[instrument] = self._clock() + self.negative_ttl
+        self._not_found.move_to_end(instrument)
+        if len(self._not_found) > self.max_negative:
+            self._not_found.popitem(last=False)
+
+    def _recently_not_found(self, instrument: str) -> bool:
+        expires_at = self._not_found.get(instrument)
+        if expires_at is None:
+            return False
+        if self._clock() >= expires_at:
+            del self._not_found[instrument]
+            return False
+        return True
+
+    def _reject(self, reason: str, detail: str) -> InstrumentNotFoundError:
+        INSTRUMENT_REJECTIONS.labels(reason=reason).inc()
+        return InstrumentNotFoundError(detail)
+
+    def validate_format(self, instrument: str):
+        """
+        Verifica apenas o formato BASE-COTAÇÃO, sem consultar o catálogo.
+
+        Raises:
+            InstrumentNotFoundError: Se o nome não tiver o formato esperado
+        """
+        if not INSTRUMENT_PATTERN.match(instrument):
+            raise self._reject("invalid_format", f"Nome de ativo inválido: {instrument!r}. Use o formato BASE-COTAÇÃO (ex: BTC-BRL).")
+
+    def validate(self, instrument: str):
+        """
+        Verifica localmente se o ativo pode ser buscado no serviço externo.
+
+        Raises:
+            InstrumentNotFoundError: Se o ativo for rejeitado
+        """
+        self.validate_format(instrument)
+        if self._loaded and instrument not in self._instruments:
+            raise self._reject("unknown_instrument", f"Ativo {instrument} não encontrado no catálogo de instrumentos.")
+        if self._recently_not_found(instrument):
+            raise self._reject("negative_cache", f"Ativo {instrument} não encontrado no serviço externo.")
+
+
+class InstrumentCatalogRefresher:
+    """Atualiza o catálogo periodicamente a partir do serviço externo"""
+
+    def __init__(self, catalog: InstrumentCatalog, loader: Callable[[], Awaitable[List[str]]], interval: float):
+        """
+        Args:
+            catalog: Catálogo a ser atualizado
+            loader: Função assíncrona que retorna a lista atual de instrumentos
+            interval: Intervalo em segundos entre atualizações
+        """
+        self.catalog = catalog
+        self.loader = loader
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def refresh(self) -> bool:
+        """Carrega a lista de instrumentos; em caso de falha o catálogo anterior é mantido"""
+        try:
+            instruments = await self.loader()
+        except Exception as e:
+            logger.warning("Falha ao atualizar o catálogo de instrumentos: %s", e)
+            return False
+        if not instruments:
+            logger.warning("Catálogo de instrumentos vazio ignorado")
+            return False
+        self.catalog.replace(instruments)
+        logger.info("Catálogo de instrumentos atualizado: %d instrumentos", len(self.catalog))
+        return True
+
+    async def _run(self):
+        while True:
+            await self.refresh()
+            await asyncio.sleep(self.interval)
@@ -0,0 +1,141 @@
+"""
+Micro-batching das buscas de um único instrumento.
+
+Requisições concorrentes de /finance/active/{active_name} para instrumentos
+diferentes gerariam uma chamada ao serviço externo cada. O MicroBatcher
+junta os instrumentos pedidos dentro de uma janela curta (MICRO_BATCH_WINDOW)
+ou até atingir MICRO_BATCH_MAX_SIZE, faz uma única chamada com todos eles
+(instruments=A,B,C) e entrega a cada chamador a sua cotação ou o seu erro.
+
+Cada chamador continua limitado pelo próprio prazo: se ele se esgotar antes
+do lote responder, o chamador recebe DeadlineExceededError e o lote segue
+para os demais.
+"""
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Set, Tuple
+
+from app.core.exceptions import DeadlineExceededError
+from app.core.metrics import MICRO_BATCH_FLUSHES, MICRO_BATCH_SIZE, MICRO_BATCH_WAIT
+from app.services.retry_policy import Deadline
+
+# Recebe os instrumentos do lote e o prazo do lote; retorna (valor por instrumento, erro por instrumento)
+BatchFetch = Callable[[List[str], Optional[Deadline]], Awaitable[Tuple[Dict[str, Any], Dict[str, BaseException]]]]
+
+
+def _consume_exception(future: asyncio.Future):
+    # Chamadores que desistiram por prazo não leem o erro do lote
+    if not future.cancelled():
+        future.exception()
+
+
+class _PendingBatch:
+    __slots__ = ("fetch", "futures", "enqueued_at", "deadline", "timer")
+
+    def __init__(self, fetch: BatchFetch):
+        self.fetch = fetch
+        self.futures: Dict[str, asyncio.Future] = {}
+        self.enqueued_at: Dict[str, float] = {}
+        self.deadline: Optional[Deadline] = None
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+    def extend_deadline(self, deadline: Optional[Deadline], first: bool):
+        """O lote usa o prazo mais longo entre os chamadores (nenhum, se algum não tiver prazo)"""
+        if first:
+            self.deadline = deadline
+        elif self.deadline is not None and (deadline is None or deadline.expires_at > self.deadline.expires_at):
+            self.deadline = deadline
+
+
+class MicroBatcher:
+    """
+    Exemplo de uso:
+
+    batcher = MicroBatcher(window=0.005, max_batch_size=25)
+    quote = await batcher.load(key, "BTC-BRL", deadline, lambda actives, deadline: fetch(actives, deadline))
+    """
+
+    def __init__(self, window: float, max_batch_size: int):
+        """
+        Args:
+            window: Tempo em segundos que o primeiro instrumento de um lote espera por outros
+            max_batch_size: Número de instrumentos distintos que dispara o envio imediato do lote
+        """
+        self.window = window
+        self.max_batch_size = max_batch_size
+        self._pending: Dict[Hashable, _PendingBatch] = {}
+        self._dispatching: Set[asyncio.Task] = set()
+
+    async def load(self, key: Hashable, active: str, deadline: Optional[Deadline], fetch: BatchFetch) -> Any:
+        """
+        Busca um instrumento junto com os demais pedidos na mesma janela.
+
+        Args:
+            key: Identifica as buscas que podem dividir uma chamada (ex: mesmo cliente e prioridade);
+                o fetch do primeiro chamador é usado para o lote inteiro
+            active: Nome do instrumento
+            deadline: Prazo do chamador
+            fetch: Função que busca o lote
+
+        Raises:
+            DeadlineExceededError: Se o prazo do chamador se esgotar antes da resposta do lote
+            Exception: O erro do instrumento ou do lote inteiro
+        """
+        batch = self._pending.get(key)
+        first = batch is None
+        if first:
+            batch = _PendingBatch(fetch)
+            self._pending[key] = batch
+            batch.timer = asyncio.get_running_loop().call_later(self.window, self._flush, key, batch, "window")
+        batch.extend_deadline(deadline, first)
+
+        future = batch.futures.get(active)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            future.add_done_callback(_consume_exception)
+            batch.futures[active] = future
+            batch.enqueued_at[active] = time.perf_counter()
+            if len(batch.futures) >= self.max_batch_size:
+                self._flush(key, batch, "size")
+
+        if deadline is None:
+            return await asyncio.shield(future)
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), max(deadline.remaining(), 0))
+        except asyncio.TimeoutError:
+            raise DeadlineExceededError("Prazo da requisição esgotado aguardando o serviço externo.")
+
+    def _flush(self, key: Hashable, batch: _PendingBatch, reason: str):
+        if self._pending.get(key) is not batch:
+            return
+        del self._pending[key]
+        batch.timer.cancel()
+
+        now = time.perf_counter()
+        MICRO_BATCH_FLUSHES.labels(reason=reason).inc()
+        MICRO_BATCH_SIZE.observe(len(batch.futures))
+        for enqueued_at in batch.enqueued_at.values():
+            MICRO_BATCH_WAIT.observe(now - enqueued_at)
+        task = asyncio.create_task(self._dispatch(batch))
+        self._dispatching.add(task)
+        task.add_done_callback(self._dispatching.discard)
+
+    async def _dispatch(self, batch: _PendingBatch):
+        try:
+            values, failures = await batch.fetch(list(batch.futures), batch.deadline)
+            for active, future in batch.futures.items():
+                if future.done():
+                    continue
+                if active in values:
+                    future.set_result(values[active])
+                else:
+                    future.set_exception(failures[active])
+        except Exception as e:
+            for future in batch.futures.values():
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            # Lote cancelado (ex: encerramento da aplicação): nenhum chamador fica esperando
+            for future in batch.futures.values():
+                if not future.done():
+                    future.cancel()
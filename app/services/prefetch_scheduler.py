@@ -0,0 +1,157 @@
+"""
+Atualização antecipada (prefetch) dos instrumentos mais requisitados.
+O router registra a popularidade de cada instrumento e o scheduler, executado
+no lifespan da aplicação, atualiza os top-N instrumentos pouco antes de suas
+entradas expirarem no cache, para que os chamadores nunca esperem pelo
+serviço externo.
+"""
+import asyncio
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from app.core.logging import logger
+from app.core.metrics import PREFETCH_REFRESHES
+from app.services.quote_providers import ProviderRegistry
+from app.services.quote_cache import AsyncTTLCache
+
+
+class InstrumentPopularity:
+    """
+    Contador de requisições por instrumento com decaimento exponencial,
+    de modo que instrumentos que deixam de ser consultados saem do top-N.
+    """
+
+    def __init__(self, max_tracked: int = 10000, min_score: float = 0.01):
+        self.max_tracked = max_tracked
+        self.min_score = min_score
+        self._scores: Dict[str, float] = {}
+
+    def record(self, instrument: str):
+        self._scores[instrument] = self._scores.get(instrument, 0.0) + 1.0
+        if len(self._scores) > self.max_tracked:
+            self._prune(self.max_tracked // 2)
+
+    def decay(self, factor: float):
+        """Multiplica todas as pontuações pelo fator e descarta as irrelevantes"""
+        self._scores = {
+            instrument: score * factor
+            for instrument, score in self._scores.items()
+            if score * factor >= self.min_score
+        }
+
+    def top(self, n: int) -> List[str]:
+        return sorted(self._scores, key=self._scores.get, reverse=True)[:n]
+
+    def top_scores(self, n: int) -> List[Tuple[str, float]]:
+        return [(instrument, self._scores[instrument]) for instrument in self.top(n)]
+
+    def restore(self, scores: Iterable[Tuple[str, float]]):
+        """Soma pontuações salvas anteriormente (ex: snapshot de warm start) às atuais"""
+        for instrument, score in scores:
+            self._scores[instrument] = self._scores.get(instrument, 0.0) + score
+
+    def _prune(self, keep: int):
+        self._scores = {instrument: self._scores[instrument] for instrument in self.top(keep)}
+
+
+instrument_popularity = InstrumentPopularity()
+
+
+class PrefetchScheduler:
+    """
+    Scheduler assíncrono que mantém quentes as cotações mais requisitadas.
+
+    As atualizações passam pelo mesmo caminho das requisições normais
+    (retentativas e Circuit Breaker); enquanto nenhum provedor aceitar
+    chamadas, o prefetch fica pausado.
+    """
+
+    def __init__(
+        self,
+        service,
+        cache: AsyncTTLCache,
+        registry: ProviderRegistry,
+        popularity: InstrumentPopularity,
+        top_n: int,
+        interval: float,
+        refresh_ahead: float,
+        decay: float
+    ):
+        """
+        Inicializa o scheduler.
+
+        Args:
+            service: Serviço com o método refresh_active(instrumento)
+            cache: Cache de cotações consultado para saber o tempo até a expiração
+            registry: Registro de provedores; o ciclo é pulado se nenhum provedor aceitar chamadas
+            popularity: Contador de popularidade alimentado pelo router
+            top_n: Quantidade de instrumentos mais populares a manter atualizados
+            interval: Intervalo em segundos entre as verificações
+            refresh_ahead: Antecedência em segundos, antes da expiração, para atualizar
+            decay: Fator de decaimento aplicado à popularidade a cada verificação
+        """
+        self.service = service
+        self.cache = cache
+        self.registry = registry
+        self.popularity = popularity
+        self.top_n = top_n
+        self.interval = interval
+        self.refresh_ahead = refresh_ahead
+        self.decay = decay
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+            logger.info("Prefetch iniciado para os top %d instrumentos a cada %ss", self.top_n, self.interval)
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error("Erro no ciclo de prefetch: %s", e)
+
+    async def run_once(self) -> List[str]:
+        """
+        Executa uma verificação e agenda a atualização dos instrumentos
+        populares próximos da expiração.
+
+        Returns:
+            Os instrumentos cuja atualização foi agendada
+        """
+        hot_instruments = self.popularity.top(self.top_n)
+        self.popularity.decay(self.decay)
+
+        if not await self.registry.can_execute():
+            PREFETCH_REFRESHES.labels(cache_name=self.cache.name, result="breaker_open").inc()
+            return []
+
+        scheduled = []
+        for instrument in hot_instruments:
+            remaining = self.cache.time_to_expiry(instrument)
+            if remaining is None or remaining > self.refresh_ahead:
+                continue
+            self.service.refresh_active(instrument).add_done_callback(
+                lambda task, instrument=instrument: self._record_result(instrument, task)
+            )
+            scheduled.append(instrument)
+        return scheduled
+
+    def _record_result(self, instrument: str, task: asyncio.Task):
+        failed = task.cancelled() or task.exception() is not None
+        PREFETCH_REFRESHES.labels(
+            cache_name=self.cache.name,
+            result="failure" if failed else "success"
+        ).inc()
+        if failed and not task.cancelled():
+            logger.warning("Falha no prefetch de %s: %s", instrument, task.exception())
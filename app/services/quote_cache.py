@@ -0,0 +1,215 @@
+"""
+Cache assíncrono em memória para cotações de serviços externos.
+Combina expiração por TTL, descarte LRU ao atingir o tamanho máximo e
+coalescência de requisições (single-flight): várias falhas de cache
+simultâneas para a mesma chave resultam em uma única chamada ao loader.
+Entradas expiradas podem continuar sendo servidas por até max_staleness
+segundos enquanto são atualizadas em segundo plano (stale-while-revalidate).
+"""
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+
+from app.core.logging import logger
+from app.core.metrics import CACHE_HITS, CACHE_MISSES, CACHE_COALESCED_REQUESTS, CACHE_STALE_SERVED
+
+
+class CacheEntry:
+    __slots__ = ("value", "stored_at", "expires_at")
+
+    def __init__(self, value: Any, stored_at: float, expires_at: float):
+        self.value = value
+        self.stored_at = stored_at
+        self.expires_at = expires_at
+
+
+def _consume_exception(task: asyncio.Task):
+    # Evita o aviso "Task exception was never retrieved" quando todos os
+    # chamadores foram cancelados antes do loader terminar.
+    if not task.cancelled():
+        task.exception()
+
+
+class AsyncTTLCache:
+    """
+    Cache LRU com TTL e coalescência de carregamentos concorrentes.
+
+    Exemplo de uso:
+
+    cache = AsyncTTLCache("quotes", ttl=5, max_size=1024)
+    value = await cache.get_or_load("BTC-BRL", lambda: service.fetch("BTC-BRL"))
+    """
+
+    def __init__(
+        self,
+        name: str,
+        ttl: float,
+        max_size: int,
+        max_staleness: float = 0,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        """
+        Inicializa o cache.
+
+        Args:
+            name: Nome do cache para identificação nas métricas
+            ttl: Tempo em segundos que uma entrada permanece válida
+            max_size: Número máximo de entradas antes do descarte LRU
+            max_staleness: Tempo em segundos, após o TTL, em que a entrada ainda
+                pode ser servida enquanto é atualizada em segundo plano
+            clock: Relógio monotônico usado para expiração
+        """
+        self.name = name
+        self.ttl = ttl
+        self.max_size = max_size
+        self.max_staleness = max_staleness
+        self._clock = clock
+        self._entries: "OrderedDict[Hashable, CacheEntry]" = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        # Incrementado a cada alteração das entradas, para quem deriva dados do cache saber quando recalcular
+        self.version = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key) is not None
+
+    def _entry(self, key: Hashable) -> Optional[CacheEntry]:
+        """Retorna a entrada se ainda estiver dentro do TTL ou da janela de staleness"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at + self.max_staleness <= self._clock():
+            del self._entries[key]
+            self.version += 1
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Retorna o valor se presente e dentro do TTL, sem contabilizar métricas"""
+        entry = self._entry(key)
+        if entry is None or entry.expires_at <= self._clock():
+            return None
+        return entry.value
+
+    def time_to_expiry(self, key: Hashable) -> Optional[float]:
+        """
+        Retorna quantos segundos faltam para a entrada expirar (negativo se já
+        estiver sendo servida como stale) ou None se a chave não estiver no cache.
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        return entry.expires_at - self._clock()
+
+    def get_many(self, keys: Iterable[Hashable]) -> Tuple[Dict[Hashable, Any], List[Hashable]]:
+        """
+        Consulta várias chaves de uma vez, contabilizando acertos e falhas.
+
+        Returns:
+            Uma tupla (valores encontrados por chave, chaves ausentes)
+        """
+        found = {}
+        missing = []
+        for key in keys:
+            value = self.get(key)
+            if value is None:
+                missing.append(key)
+            else:
+                found[key] = value
+
+        if found:
+            CACHE_HITS.labels(cache_name=self.name).inc(len(found))
+        if missing:
+            CACHE_MISSES.labels(cache_name=self.name).inc(len(missing))
+        return found, missing
+
+    def set(self, key: Hashable, value: Any, age: float = 0.0):
+        """
+        Armazena um valor, descartando a entrada menos usada se necessário.
+        Com age, o valor é tratado como armazenado há age segundos (ex: restaurado de um snapshot).
+        """
+        stored_at = self._clock() - age
+        self._entries[key] = CacheEntry(value, stored_at, stored_at + self.ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+        self.version += 1
+
+    def invalidate(self, key: Hashable):
+        self._entries.pop(key, None)
+        self.version += 1
+
+    def clear(self):
+        self._entries.clear()
+        self.version += 1
+
+    def entries(self) -> List[Tuple[Hashable, Any, float]]:
+        """
+        Retorna (chave, valor, instante em que foi armazenado) de todas as entradas,
+        inclusive as expiradas ainda na janela de staleness, sem alterar a ordem LRU
+        nem as métricas.
+        """
+        return [(key, entry.value, entry.stored_at) for key, entry in self._entries.items()]
+
+    async def _load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        try:
+            value = await loader()
+            self.set(key, value)
+            return value
+        finally:
+            self._inflight.pop(key, None)
+
+    def _start_load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> asyncio.Task:
+        task = self._inflight.get(key)
+        if task is None:
+            # O carregamento roda em uma task própria para que o cancelamento
+            # de um chamador não cancele a busca dos demais.
+            task = asyncio.ensure_future(self._load(key, loader))
+            task.add_done_callback(_consume_exception)
+            self._inflight[key] = task
+        return task
+
+    def refresh(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> asyncio.Task:
+        """
+        Agenda a atualização da chave em segundo plano, reaproveitando uma
+        busca já em andamento. A falha fica na tarefa retornada: quem agendou
+        a atualização decide como registrá-la.
+        """
+        return self._start_load(key, loader)
+
+    def _log_refresh_failure(self, key: Hashable, task: asyncio.Task):
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning("Falha ao atualizar a entrada %s do cache %s: %s", key, self.name, task.exception())
+
+    async def get_or_load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Retorna o valor em cache ou executa o loader uma única vez por chave.
+
+        Args:
+            key: Chave da entrada (ex: nome do instrumento)
+            loader: Função assíncrona sem argumentos que busca o valor na origem
+
+        Returns:
+            O valor em cache ou o resultado do loader
+
+        Raises:
+            Exception: Qualquer exceção levantada pelo loader (não é armazenada em cache)
+        """
+        entry = self._entry(key)
+        if entry is not None:
+            CACHE_HITS.labels(cache_name=self.name).inc()
+            if entry.expires_at <= self._clock():
+                CACHE_STALE_SERVED.labels(cache_name=self.name).inc()
+                self.refresh(key, loader).add_done_callback(lambda task: self._log_refresh_failure(key, task))
+            return entry.value
+
+        CACHE_MISSES.labels(cache_name=self.name).inc()
+
+        if key in self._inflight:
+            CACHE_COALESCED_REQUESTS.labels(cache_name=self.name).inc()
+
+        return await asyncio.shield(self._start_load(key, loader))
@@ -0,0 +1,298 @@
+"""
+Histórico de cotações em memória, em buffers circulares por instrumento.
+
+Cada tick buscado no serviço externo é gravado em colunas array.array
+(timestamp, preço, quantidade, CCSEQ) em vez de objetos pydantic, com
+capacidade fixa por instrumento e descarte LRU dos instrumentos menos
+usados. As agregações OHLC/VWAP operam sobre fatias das colunas, uma por candle.
+
+Opcionalmente o histórico é salvo em um snapshot binário, escrito e lido
+via mmap, para sobreviver a reinícios.
+"""
+import asyncio
+import mmap
+import os
+import struct
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+from operator import mul
+from typing import Dict, Iterable, List, Optional
+
+from app.core.logging import logger
+from app.schemas.coin_desk import BTCData
+
+SNAPSHOT_MAGIC = b"QHIS"
+SNAPSHOT_VERSION = 1
+_HEADER = struct.Struct("<4sHI")       # magic, versão, quantidade de instrumentos
+_INSTRUMENT_HEADER = struct.Struct("<HI")  # tamanho do nome, quantidade de pontos
+
+
+class InstrumentHistory:
+    """Buffer circular de ticks de um instrumento, em colunas array"""
+    __slots__ = ("capacity", "timestamps", "values", "quantities", "sequences", "_start", "_size")
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.timestamps = array("q", bytes(8 * capacity))
+        self.values = array("d", bytes(8 * capacity))
+        self.quantities = array("d", bytes(8 * capacity))
+        self.sequences = array("q", bytes(8 * capacity))
+        self._start = 0
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _last_index(self) -> int:
+        return (self._start + self._size - 1) % self.capacity
+
+    @property
+    def last_timestamp(self) -> Optional[int]:
+        return self.timestamps[self._last_index()] if self._size else None
+
+    def append(self, timestamp: int, value: float, quantity: float, sequence: int) -> bool:
+        """Grava um tick; ticks repetidos (mesmo CCSEQ) ou fora de ordem são ignorados"""
+        if self._size:
+            last = self._last_index()
+            if sequence == self.sequences[last] or timestamp < self.timestamps[last]:
+                return False
+
+        if self._size < self.capacity:
+            index = (self._start + self._size) % self.capacity
+            self._size += 1
+        else:
+            index = self._start
+            self._start = (self._start + 1) % self.capacity
+
+        self.timestamps[index] = timestamp
+        self.values[index] = value
+        self.quantities[index] = quantity
+        self.sequences[index] = sequence
+        return True
+
+    def _ordered(self, column: array) -> array:
+        end = self._start + self._size
+        if end <= self.capacity:
+            return column[self._start:end]
+        return column[self._start:] + column[:end - self.capacity]
+
+    def columns(self):
+        """Retorna cópias das colunas em ordem cronológica"""
+        return (
+            self._ordered(self.timestamps),
+            self._ordered(self.values),
+            self._ordered(self.quantities),
+            self._ordered(self.sequences),
+        )
+
+    def aggregate(self, interval: int, since: int) -> List[Dict]:
+        """
+        Agrega os ticks a partir de since em candles de interval segundos.
+
+        Returns:
+            Lista de candles com start, open, high, low, close, vwap, volume e ticks
+        """
+        timestamps, values, quantities, _ = self.columns()
+        end = len(timestamps)
+        start_index = bisect_left(timestamps, since)
+
+        # Os timestamps são crescentes: cada candle é uma fatia contígua das colunas,
+        # delimitada por bisect, e as agregações rodam sobre a fatia (min, max, sum em C)
+        candles: List[Dict] = []
+        while start_index < end:
+            timestamp = timestamps[start_index]
+            bucket_start = timestamp - timestamp % interval
+            stop_index = bisect_left(timestamps, bucket_start + interval, start_index, end)
+            bucket_values = values[start_index:stop_index]
+            bucket_quantities = quantities[start_index:stop_index]
+            volume = sum(bucket_quantities)
+            candles.append({
+                "start": bucket_start,
+                "open": bucket_values[0],
+                "high": max(bucket_values),
+                "low": min(bucket_values),
+                "close": bucket_values[-1],
+                "vwap": sum(map(mul, bucket_values, bucket_quantities)) / volume if volume else None,
+                "volume": volume,
+                "ticks": stop_index - start_index,
+            })
+            start_index = stop_index
+        return candles
+
+
+class QuoteHistory:
+    """
+    Histórico de todos os instrumentos, com memória limitada a
+    max_instruments * max_points ticks.
+
+    Exemplo de uso:
+
+    history = QuoteHistory(max_points=3600, max_instruments=256)
+    history.record(quote)
+    candles = history.aggregate("BTC-BRL", interval=60, window=3600)
+    """
+
+    def __init__(self, max_points: int, max_instruments: int):
+        self.max_points = max_points
+        self.max_instruments = max_instruments
+        self._instruments: "OrderedDict[str, InstrumentHistory]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._instruments)
+
+    def get(self, instrument: str) -> Optional[InstrumentHistory]:
+        return self._instruments.get(instrument)
+
+    def _history_for(self, instrument: str) -> InstrumentHistory:
+        history = self._instruments.get(instrument)
+        if history is None:
+            history = InstrumentHistory(self.max_points)
+            self._instruments[instrument] = history
+            if len(self._instruments) > self.max_instruments:
+                self._instruments.popitem(last=False)
+        else:
+            self._instruments.move_to_end(instrument)
+        return history
+
+    def record(self, quote: BTCData) -> bool:
+        return self._history_for(quote.instrument).append(
+            quote.value_last_update_ts,
+            quote.value,
+            quote.last_update_quantity,
+            quote.ccseq
+        )
+
+    def record_many(self, quotes: Iterable[BTCData]):
+        for quote in quotes:
+            self.record(quote)
+
+    def aggregate(self, instrument: str, interval: int, window: int, now: Optional[int] = None) -> List[Dict]:
+        """
+        Calcula os candles OHLC/VWAP da janela [fim - window, fim], onde fim é
+        now ou, se omitido, o timestamp do último tick do instrumento.
+        """
+        history = self._instruments.get(instrument)
+        if history is None or not len(history):
+            return []
+        end = now if now is not None else history.last_timestamp
+        return history.aggregate(interval, end - window)
+
+    def clear(self):
+        self._instruments.clear()
+
+    def snapshot_records(self) -> List[tuple]:
+        """Copia as colunas de todos os instrumentos; deve rodar no event loop, junto das escritas"""
+        return [
+            (instrument.encode(), len(history), history.columns())
+            for instrument, history in self._instruments.items()
+        ]
+
+    def save_snapshot(self, path: str):
+        write_snapshot(path, self.snapshot_records())
+
+    def load_snapshot(self, path: str) -> int:
+        """
+        Carrega um snapshot gravado por save_snapshot.
+
+        Returns:
+            A quantidade de instrumentos carregados (0 se o arquivo não existir ou for inválido)
+        """
+        try:
+            with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                magic, version, instruments = _HEADER.unpack_from(buffer, 0)
+                if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+                    logger.warning("Snapshot de histórico %s ignorado: formato desconhecido", path)
+                    return 0
+
+                offset = _HEADER.size
+                for _ in range(instruments):
+                    name_size, count = _INSTRUMENT_HEADER.unpack_from(buffer, offset)
+                    offset += _INSTRUMENT_HEADER.size
+                    instrument = bytes(buffer[offset:offset + name_size]).decode()
+                    offset += name_size
+
+                    columns = []
+                    for typecode in ("q", "d", "d", "q"):
+                        column = array(typecode)
+                        column.frombytes(buffer[offset:offset + count * column.itemsize])
+                        offset += count * column.itemsize
+                        columns.append(column)
+
+                    history = self._history_for(instrument)
+                    for timestamp, value, quantity, sequence in zip(*columns):
+                        history.append(timestamp, value, quantity, sequence)
+        except FileNotFoundError:
+            return 0
+        except (OSError, ValueError, struct.error) as e:
+            logger.warning("Falha ao carregar o snapshot de histórico %s: %s", path, e)
+            return 0
+        return instruments
+
+
+def write_snapshot(path: str, records: List[tuple]):
+    """Grava os registros de snapshot_records em um arquivo binário via mmap, substituindo o anterior atomicamente"""
+    size = _HEADER.size
+    for name, _, columns in records:
+        size += _INSTRUMENT_HEADER.size + len(name) + sum(len(column) * column.itemsize for column in columns)
+
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "w+b") as f:
+        f.truncate(size)
+        with mmap.mmap(f.fileno(), size) as buffer:
+            _HEADER.pack_into(buffer, 0, SNAPSHOT_MAGIC, SNAPSHOT_VERSION, len(records))
+            offset = _HEADER.size
+            for name, count, columns in records:
+                _INSTRUMENT_HEADER.pack_into(buffer, offset, len(name), count)
+                offset += _INSTRUMENT_HEADER.size
+                buffer[offset:offset + len(name)] = name
+                offset += len(name)
+                for column in columns:
+                    data = column.tobytes()
+                    buffer[offset:offset + len(data)] = data
+                    offset += len(data)
+            buffer.flush()
+    os.replace(temp_path, path)
+
+
+class HistorySnapshotter:
+    """Grava snapshots do histórico periodicamente e no encerramento"""
+
+    def __init__(self, history: QuoteHistory, path: str, interval: float):
+        """
+        Args:
+            history: Histórico a ser persistido
+            path: Caminho do arquivo de snapshot
+            interval: Intervalo em segundos entre snapshots
+        """
+        self.history = history
+        self.path = path
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        loaded = self.history.load_snapshot(self.path)
+        logger.info("Histórico de cotações carregado de %s: %d instrumentos", self.path, loaded)
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.save()
+
+    async def save(self):
+        try:
+            await asyncio.to_thread(write_snapshot, self.path, self.history.snapshot_records())
+        except OSError as e:
+            logger.error("Falha ao gravar o snapshot de histórico %s: %s", self.path, e)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.save()
@@ -0,0 +1,216 @@
+"""
+Abstração de provedores de cotações e registro com roteamento por latência.
+
+Cada provedor tem Circuit Breaker, política de retentativas, limitador de
+concorrência e labels de métricas próprios (service_name = nome do provedor).
+O ProviderRegistry escolhe, para cada busca, o provedor disponível com a
+menor latência recente (média móvel exponencial), com os provedores ainda
+não medidos na ordem de registro, e passa automaticamente para o próximo
+quando um provedor falha ou está com o circuito aberto.
+
+Para adicionar uma nova fonte de preços basta implementar _fetch_ticks em
+uma subclasse de QuoteProvider e registrá-la; os endpoints não mudam.
+"""
+import time
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+import httpx
+
+from app.core.exceptions import (
+    DeadlineExceededError,
+    ExternalAPIServiceError,
+    InstrumentNotFoundError,
+    ServiceOverloadedError
+)
+from app.core.logging import logger
+from app.core.metrics import PROVIDER_LATENCY, PROVIDER_FAILOVERS
+from app.schemas.coin_desk import BTCData
+from app.services.circuit_breaker import AsyncCircuitBreaker
+from app.services.concurrency_limiter import AdaptiveConcurrencyLimiter, PRIORITY_INTERACTIVE
+from app.services.retry_policy import Deadline, RetryPolicy
+
+# Falhas que indicam problema do provedor e justificam tentar o próximo
+FAILOVER_ERRORS = (ExternalAPIServiceError, ServiceOverloadedError, httpx.HTTPStatusError)
+
+
+class QuoteProvider:
+    """Fonte de cotações com proteções e métricas próprias"""
+
+    def __init__(
+        self,
+        name: str,
+        breaker: AsyncCircuitBreaker,
+        retry_policy: RetryPolicy,
+        concurrency_limiter: AdaptiveConcurrencyLimiter,
+        instruments: Optional[Iterable[str]] = None,
+        latency_alpha: float = 0.2,
+        failure_penalty: float = 5.0
+    ):
+        """
+        Inicializa o provedor.
+
+        Args:
+            name: Nome do provedor, usado como service_name nas métricas
+            breaker: Circuit Breaker exclusivo do provedor
+            retry_policy: Política de retentativas exclusiva do provedor
+            concurrency_limiter: Limitador de concorrência exclusivo do provedor
+            instruments: Instrumentos atendidos pelo provedor (None atende todos)
+            latency_alpha: Peso da última chamada na média móvel de latência
+            failure_penalty: Latência em segundos contabilizada para uma chamada com falha
+        """
+        self.name = name
+        self.breaker = breaker
+        self.retry_policy = retry_policy
+        self.concurrency_limiter = concurrency_limiter
+        self.instruments: Optional[FrozenSet[str]] = frozenset(instruments) if instruments is not None else None
+        self.latency_alpha = latency_alpha
+        self.failure_penalty = failure_penalty
+        self.latency: Optional[float] = None
+
+    def supports(self, actives: Iterable[str]) -> bool:
+        return self.instruments is None or all(active in self.instruments for active in actives)
+
+    async def available(self) -> bool:
+        return await self.breaker.can_execute()
+
+    def _observe(self, seconds: float):
+        if self.latency is None:
+            self.latency = seconds
+        else:
+            self.latency += self.latency_alpha * (seconds - self.latency)
+        PROVIDER_LATENCY.labels(provider=self.name).set(self.latency)
+
+    async def fetch_ticks(
+        self,
+        client: httpx.AsyncClient,
+        actives: List[str],
+        deadline: Optional[Deadline] = None,
+        priority: int = PRIORITY_INTERACTIVE
+    ) -> Tuple[Dict[str, BTCData], Dict[str, str]]:
+        """
+        Busca os ticks dos ativos, registrando a latência observada. Só falhas
+        do provedor (FAILOVER_ERRORS) contam como failure_penalty; ativo
+        inexistente e prazo esgotado são falhas da requisição e não alteram a média.
+
+        Returns:
+            Uma tupla (cotações por ativo, mensagem de erro por ativo)
+        """
+        start = time.perf_counter()
+        try:
+            result = await self._fetch_ticks(client, actives, deadline, priority)
+        except (DeadlineExceededError, InstrumentNotFoundError):
+            raise
+        except FAILOVER_ERRORS:
+            self._observe(self.failure_penalty)
+            raise
+        self._observe(time.perf_counter() - start)
+        return result
+
+    async def _fetch_ticks(
+        self,
+        client: httpx.AsyncClient,
+        actives: List[str],
+        deadline: Optional[Deadline],
+        priority: int
+    ) -> Tuple[Dict[str, BTCData], Dict[str, str]]:
+        raise NotImplementedError
+
+    async def fetch_instruments(self, client: httpx.AsyncClient) -> Optional[List[str]]:
+        """Lista de instrumentos atendidos, para o catálogo; None se o provedor não a publica"""
+        return None
+
+
+class ProviderRegistry:
+    """
+    Exemplo de uso:
+
+    registry = ProviderRegistry([coin_desk_provider, mirror_provider])
+    quotes, errors = await registry.fetch_ticks(client, ["BTC-BRL"], deadline)
+    """
+
+    def __init__(self, providers: Iterable[QuoteProvider] = ()):
+        self._providers: Dict[str, QuoteProvider] = {}
+        for provider in providers:
+            self.register(provider)
+
+    def register(self, provider: QuoteProvider):
+        self._providers[provider.name] = provider
+
+    def get(self, name: str) -> QuoteProvider:
+        return self._providers[name]
+
+    @property
+    def providers(self) -> List[QuoteProvider]:
+        return list(self._providers.values())
+
+    async def can_execute(self) -> bool:
+        """Indica se ao menos um provedor aceita chamadas (usado pelo prefetch)"""
+        for provider in self._providers.values():
+            if await provider.available():
+                return True
+        return False
+
+    async def candidates(self, actives: Iterable[str]) -> List[QuoteProvider]:
+        """
+        Provedores que atendem os ativos: disponíveis primeiro, depois pela menor
+        latência recente. Provedores ainda sem latência observada ficam depois
+        dos já medidos, na ordem de registro (o principal antes dos espelhos).
+        """
+        actives = list(actives)
+        ranked = []
+        for priority, provider in enumerate(self._providers.values()):
+            if provider.supports(actives):
+                available = await provider.available()
+                unobserved = provider.latency is None
+                ranked.append(((not available, unobserved, provider.latency or 0.0, priority), provider))
+        ranked.sort(key=lambda item: item[0])
+        return [provider for _, provider in ranked]
+
+    async def fetch_ticks(
+        self,
+        client: httpx.AsyncClient,
+        actives: List[str],
+        deadline: Optional[Deadline] = None,
+        priority: int = PRIORITY_INTERACTIVE
+    ) -> Tuple[Dict[str, BTCData], Dict[str, str]]:
+        """
+        Busca os ticks no melhor provedor, com failover para os demais.
+
+        Raises:
+            DeadlineExceededError: Se o prazo da requisição se esgotar
+            ExternalAPIServiceError: Se nenhum provedor atender os ativos
+            Exception: A falha do último provedor tentado
+        """
+        candidates = await self.candidates(actives)
+        if not candidates:
+            raise ExternalAPIServiceError(f"Nenhum provedor de cotações atende {', '.join(actives)}.")
+
+        for index, provider in enumerate(candidates):
+            try:
+                return await provider.fetch_ticks(client, actives, deadline, priority)
+            except (DeadlineExceededError, InstrumentNotFoundError):
+                # Falhas da própria requisição: outro provedor não mudaria o resultado
+                raise
+            except FAILOVER_ERRORS as e:
+                if index + 1 == len(candidates):
+                    raise
+                next_provider = candidates[index + 1]
+                PROVIDER_FAILOVERS.labels(from_provider=provider.name, to_provider=next_provider.name).inc()
+                logger.warning("Provedor %s falhou (%s), tentando %s", provider.name, e, next_provider.name)
+
+    async def fetch_instruments(self, client: httpx.AsyncClient) -> List[str]:
+        """
+        Lista de instrumentos do primeiro provedor disponível que a publica.
+
+        Raises:
+            ExternalAPIServiceError: Se nenhum provedor retornar a lista
+        """
+        for provider in await self.candidates(()):
+            try:
+                instruments = await provider.fetch_instruments(client)
+            except (httpx.HTTPError, ValueError) as e:
+                logger.warning("Provedor %s não retornou a lista de instrumentos: %s", provider.name, e)
+                continue
+            if instruments:
+                return instruments
+        raise ExternalAPIServiceError("Nenhum provedor retornou a lista de instrumentos.")
@@ -0,0 +1,158 @@
+"""
+Distribuição de cotações em tempo real (WebSocket/SSE).
+Cada instrumento assinado possui um único poller interno que busca a cotação
+no serviço externo e repassa cada atualização a todos os assinantes por meio
+de filas limitadas. Consumidores lentos perdem as mensagens mais antigas em
+vez de acumular memória ou atrasar os demais.
+
+Quando um instrumento deixa de existir no serviço externo, cada assinante
+recebe um StreamEnded como última mensagem desse instrumento; a assinatura
+termina quando não resta nenhum instrumento.
+"""
+import asyncio
+import json
+from typing import Dict, Iterable, Optional, Set, Union
+
+from app.core.exceptions import InstrumentNotFoundError
+from app.core.logging import logger
+from app.core.metrics import (
+    STREAM_SUBSCRIBERS,
+    STREAM_ACTIVE_POLLERS,
+    STREAM_MESSAGES_SENT,
+    STREAM_MESSAGES_DROPPED,
+    STREAM_POLL_ERRORS
+)
+from app.schemas.coin_desk import BTCData
+
+
+class StreamEnded:
+    """Mensagem final de um instrumento que deixou de ser transmitido"""
+    __slots__ = ("instrument", "detail")
+
+    def __init__(self, instrument: str, detail: str):
+        self.instrument = instrument
+        self.detail = detail
+
+    def to_json(self) -> str:
+        return json.dumps({"instrument": self.instrument, "detail": self.detail}, ensure_ascii=False)
+
+
+class Subscription:
+    """Assinatura de um cliente, com fila limitada e descarte da mensagem mais antiga"""
+
+    def __init__(self, instruments: Iterable[str], transport: str, queue_size: int):
+        self.instruments = frozenset(instruments)
+        self.transport = transport
+        self.queue: "asyncio.Queue[Union[BTCData, StreamEnded]]" = asyncio.Queue(maxsize=queue_size)
+
+    @property
+    def finished(self) -> bool:
+        """Todos os instrumentos foram encerrados e as mensagens pendentes, entregues"""
+        return not self.instruments and self.queue.empty()
+
+    def publish(self, message: Union[BTCData, StreamEnded]):
+        if self.queue.full():
+            self.queue.get_nowait()
+            STREAM_MESSAGES_DROPPED.labels(transport=self.transport).inc()
+        self.queue.put_nowait(message)
+
+    def end(self, instrument: str, detail: str):
+        """Remove o instrumento da assinatura e avisa o cliente"""
+        self.instruments = self.instruments - {instrument}
+        self.publish(StreamEnded(instrument, detail))
+
+    async def get(self) -> Union[BTCData, StreamEnded]:
+        message = await self.queue.get()
+        STREAM_MESSAGES_SENT.labels(transport=self.transport).inc()
+        return message
+
+
+class QuoteStreamHub:
+    """
+    Gerencia as assinaturas e os pollers por instrumento.
+    O poller é criado com a primeira assinatura do instrumento e encerrado
+    quando o último assinante sai.
+    """
+
+    def __init__(self, service, poll_interval: float, queue_size: int):
+        """
+        Inicializa o hub.
+
+        Args:
+            service: Serviço com o método refresh_active(instrumento)
+            poll_interval: Intervalo em segundos entre as buscas de cada instrumento
+            queue_size: Tamanho máximo da fila de cada assinante
+        """
+        self.service = service
+        self.poll_interval = poll_interval
+        self.queue_size = queue_size
+        self._subscribers: Dict[str, Set[Subscription]] = {}
+        self._pollers: Dict[str, asyncio.Task] = {}
+        self._last_quotes: Dict[str, BTCData] = {}
+
+    def subscribe(self, instruments: Iterable[str], transport: str) -> Subscription:
+        subscription = Subscription(instruments, transport, self.queue_size)
+        STREAM_SUBSCRIBERS.labels(transport=transport).inc()
+
+        for instrument in subscription.instruments:
+            self._subscribers.setdefault(instrument, set()).add(subscription)
+            last_quote = self._last_quotes.get(instrument)
+            if last_quote is not None:
+                subscription.publish(last_quote)
+            if instrument not in self._pollers:
+                self._pollers[instrument] = asyncio.create_task(self._poll(instrument))
+                STREAM_ACTIVE_POLLERS.inc()
+
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        STREAM_SUBSCRIBERS.labels(transport=subscription.transport).dec()
+
+        for instrument in subscription.instruments:
+            subscribers = self._subscribers.get(instrument)
+            if subscribers is None:
+                continue
+            subscribers.discard(subscription)
+            if not subscribers:
+                self._stop_poller(instrument)
+
+    def _stop_poller(self, instrument: str):
+        self._subscribers.pop(instrument, None)
+        self._last_quotes.pop(instrument, None)
+        poller = self._pollers.pop(instrument, None)
+        if poller is not None:
+            poller.cancel()
+            STREAM_ACTIVE_POLLERS.dec()
+
+    async def _poll(self, instrument: str):
+        last_ccseq: Optional[int] = None
+        while True:
+            try:
+                # shield: cancelar o poller não deve cancelar uma busca compartilhada
+                quote = await asyncio.shield(self.service.refresh_active(instrument))
+                if quote.ccseq != last_ccseq:
+                    last_ccseq = quote.ccseq
+                    self._last_quotes[instrument] = quote
+                    for subscription in self._subscribers.get(instrument, ()):
+                        subscription.publish(quote)
+            except asyncio.CancelledError:
+                raise
+            except InstrumentNotFoundError as e:
+                # O ativo já está no cache negativo do catálogo: não adianta continuar consultando
+                STREAM_POLL_ERRORS.inc()
+                logger.info("Stream de %s encerrado: %s", instrument, e.detail)
+                self._pollers.pop(instrument, None)
+                self._last_quotes.pop(instrument, None)
+                STREAM_ACTIVE_POLLERS.dec()
+                for subscription in self._subscribers.pop(instrument, ()):
+                    subscription.end(instrument, e.detail)
+                return
+            except Exception as e:
+                STREAM_POLL_ERRORS.inc()
+                logger.debug("Falha ao buscar %s para o stream: %s", instrument, e)
+
+            await asyncio.sleep(self.poll_interval)
+
+    async def close(self):
+        for instrument in list(self._pollers):
+            self._stop_poller(instrument)
@@ -0,0 +1,218 @@
+"""
+Política de retentativas sensível à latência para chamadas a serviços externos.
+
+- Deadline: cada requisição carrega um prazo propagado desde o endpoint;
+  nenhuma tentativa ou espera ultrapassa esse prazo.
+- Orçamento de retentativas: retentativas (e hedges) só são permitidas
+  enquanto representarem no máximo uma fração do tráfego recente, evitando
+  multiplicar a carga sobre um serviço externo degradado.
+- Hedged requests: opcionalmente, se a primeira tentativa passar do
+  percentil observado (ex: p95), uma segunda chamada é disparada e a
+  primeira resposta vence.
+"""
+import asyncio
+import random
+import time
+from collections import deque
+from typing import Awaitable, Callable, Optional, TypeVar
+
+import httpx
+
+from app.core.exceptions import DeadlineExceededError
+from app.core.tracing import span
+from app.core.metrics import (
+    RETRY_ATTEMPTS,
+    HEDGED_REQUESTS,
+    RETRY_BUDGET_REJECTIONS
+)
+
+T = TypeVar("T")
+
+
+class Deadline:
+    """Prazo absoluto (relógio monotônico) para concluir uma requisição"""
+    __slots__ = ("expires_at",)
+
+    def __init__(self, expires_at: float):
+        self.expires_at = expires_at
+
+    @classmethod
+    def after(cls, seconds: float) -> "Deadline":
+        return cls(time.monotonic() + seconds)
+
+    def remaining(self) -> float:
+        return self.expires_at - time.monotonic()
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+
+class RetryBudget:
+    """
+    Orçamento de retentativas em janela deslizante por segundo.
+    Permite retentativas enquanto retries <= ratio * requisições + min_per_second * janela.
+    """
+
+    def __init__(
+        self,
+        ratio: float,
+        window: int,
+        min_per_second: float,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.ratio = ratio
+        self.window = window
+        self.min_per_second = min_per_second
+        self._clock = clock
+        self._buckets: deque = deque()  # [segundo, requisições, retentativas]
+
+    def _current_bucket(self) -> list:
+        second = int(self._clock())
+        while self._buckets and self._buckets[0][0] <= second - self.window:
+            self._buckets.popleft()
+        if not self._buckets or self._buckets[-1][0] != second:
+            self._buckets.append([second, 0, 0])
+        return self._buckets[-1]
+
+    def record_request(self):
+        self._current_bucket()[1] += 1
+
+    def try_acquire(self) -> bool:
+        """Consome uma retentativa do orçamento, se disponível"""
+        bucket = self._current_bucket()
+        requests = sum(b[1] for b in self._buckets)
+        retries = sum(b[2] for b in self._buckets)
+        if retries + 1 > self.ratio * requests + self.min_per_second * self.window:
+            return False
+        bucket[2] += 1
+        return True
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """Timeouts, falhas de transporte, 429 e 5xx podem ser repetidos; demais 4xx nunca"""
+    if isinstance(exc, httpx.HTTPStatusError):
+        status_code = exc.response.status_code
+        return status_code == 429 or status_code >= 500
+    return isinstance(exc, (httpx.TimeoutException, httpx.TransportError))
+
+
+class RetryPolicy:
+    """
+    Executa uma chamada com retentativas limitadas por deadline e orçamento,
+    e opcionalmente com hedged requests.
+
+    Exemplo de uso:
+
+    policy = RetryPolicy("coin_desk_api", max_attempts=3, backoff_base=0.1, ...)
+    data = await policy.execute(lambda: client.get(url), Deadline.after(5))
+    """
+
+    def __init__(
+        self,
+        service_name: str,
+        max_attempts: int,
+        backoff_base: float,
+        backoff_max: float,
+        budget: RetryBudget,
+        hedge_enabled: bool = False,
+        hedge_min_delay: float = 0.05,
+        hedge_delay_source: Optional[Callable[[], Optional[float]]] = None,
+        retryable: Callable[[BaseException], bool] = is_retryable
+    ):
+        """
+        Inicializa a política.
+
+        Args:
+            service_name: Nome do serviço externo para identificação nas métricas
+            max_attempts: Número máximo de tentativas (incluindo a primeira)
+            backoff_base: Espera base em segundos, dobrada a cada tentativa (com jitter)
+            backoff_max: Espera máxima em segundos entre tentativas
+            budget: Orçamento de retentativas compartilhado pelas chamadas ao serviço
+            hedge_enabled: Se True, dispara uma segunda chamada quando a primeira demora
+            hedge_min_delay: Espera mínima em segundos antes de disparar o hedge
+            hedge_delay_source: Função que retorna a latência observada (ex: p95) usada como espera do hedge
+            retryable: Função que decide se uma exceção pode ser repetida
+        """
+        self.service_name = service_name
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.budget = budget
+        self.hedge_enabled = hedge_enabled
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_delay_source = hedge_delay_source
+        self.retryable = retryable
+
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1)))
+
+    def _hedge_delay(self) -> float:
+        observed = self.hedge_delay_source() if self.hedge_delay_source else None
+        return max(self.hedge_min_delay, observed or 0.0)
+
+    async def execute(self, func: Callable[[], Awaitable[T]], deadline: Optional[Deadline] = None) -> T:
+        """
+        Executa a chamada respeitando deadline, orçamento e hedging.
+
+        Raises:
+            DeadlineExceededError: Se o prazo da requisição se esgotar
+            Exception: A última exceção da chamada, quando não puder ser repetida
+        """
+        self.budget.record_request()
+        attempt = 1
+        while True:
+            try:
+                return await self._attempt(func, deadline)
+            except Exception as exc:
+                if not self.retryable(exc) or attempt >= self.max_attempts:
+                    raise
+
+                backoff = self._backoff(attempt)
+                if deadline is not None and deadline.remaining() <= backoff:
+                    raise
+                if not self.budget.try_acquire():
+                    RETRY_BUDGET_REJECTIONS.labels(service_name=self.service_name, kind="retry").inc()
+                    raise
+
+                RETRY_ATTEMPTS.labels(service_name=self.service_name).inc()
+                with span("retry_backoff", attempt=attempt):
+                    await asyncio.sleep(backoff)
+                attempt += 1
+
+    async def _attempt(self, func: Callable[[], Awaitable[T]], deadline: Optional[Deadline]) -> T:
+        timeout = deadline.remaining() if deadline is not None else None
+        if timeout is not None and timeout <= 0:
+            raise DeadlineExceededError("Prazo da requisição esgotado antes da chamada ao serviço externo.")
+
+        try:
+            if not self.hedge_enabled:
+                return await asyncio.wait_for(func(), timeout)
+            return await asyncio.wait_for(self._hedged(func), timeout)
+        except asyncio.TimeoutError:
+            raise DeadlineExceededError("Prazo da requisição esgotado aguardando o serviço externo.")
+
+    async def _hedged(self, func: Callable[[], Awaitable[T]]) -> T:
+        primary = asyncio.ensure_future(func())
+        tasks = {primary}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self._hedge_delay())
+            if not done:
+                if self.budget.try_acquire():
+                    HEDGED_REQUESTS.labels(service_name=self.service_name).inc()
+                    tasks.add(asyncio.ensure_future(func()))
+                else:
+                    RETRY_BUDGET_REJECTIONS.labels(service_name=self.service_name, kind="hedge").inc()
+
+            pending = set(tasks)
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = error or task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
@@ -0,0 +1,129 @@
+"""
+Cache de cotações compartilhado entre processos e réplicas (L2) sobre Redis.
+
+O AsyncTTLCache continua sendo o L1 de cada processo; este cache é
+consultado apenas nas falhas do L1, antes de chamar o serviço externo.
+Lotes usam um único MGET para leitura e um pipeline de SET PX para escrita.
+
+Se o Redis ficar indisponível, os erros não chegam à requisição: o cache
+se comporta como vazio por retry_after segundos e a aplicação segue com o
+estado local do processo.
+"""
+import asyncio
+import time
+from typing import Callable, Dict, Iterable
+
+from pydantic import ValidationError
+from redis import asyncio as aioredis
+from redis.exceptions import RedisError
+
+from app.core.config import Settings
+from app.core.logging import logger
+from app.core.tracing import span
+from app.core.metrics import CACHE_HITS, CACHE_MISSES, CACHE_BACKEND_ERRORS
+from app.schemas.coin_desk import BTCData
+
+
+class RedisQuoteCache:
+    """
+    Exemplo de uso:
+
+    cache = RedisQuoteCache(aioredis.from_url("redis://localhost:6379/0"), ttl=5)
+    found = await cache.get_many(["BTC-BRL", "ETH-USD"])
+    await cache.set_many({"SOL-USD": quote})
+    """
+
+    def __init__(
+        self,
+        redis: aioredis.Redis,
+        ttl: float,
+        name: str = "coin_desk_quotes_shared",
+        key_prefix: str = "dummy_api:quote:",
+        retry_after: float = 5.0,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        """
+        Inicializa o cache.
+
+        Args:
+            redis: Cliente assíncrono do Redis
+            ttl: Tempo em segundos que uma cotação permanece no Redis
+            name: Nome do cache para identificação nas métricas
+            key_prefix: Prefixo das chaves no Redis
+            retry_after: Tempo em segundos sem consultar o Redis após uma falha
+            clock: Relógio monotônico usado para o retry_after
+        """
+        self.redis = redis
+        self.ttl = ttl
+        self.name = name
+        self.key_prefix = key_prefix
+        self.retry_after = retry_after
+        self._clock = clock
+        self._unavailable_until = 0.0
+
+    @property
+    def available(self) -> bool:
+        return self._clock() >= self._unavailable_until
+
+    def _key(self, active: str) -> str:
+        return f"{self.key_prefix}{active}"
+
+    def _on_error(self, operation: str, exc: Exception):
+        CACHE_BACKEND_ERRORS.labels(cache_name=self.name, operation=operation).inc()
+        if self.available:
+            logger.warning(
+                "Redis indisponível (%s: %s). Usando apenas o cache local por %ss",
+                operation, exc, self.retry_after
+            )
+        self._unavailable_until = self._clock() + self.retry_after
+
+    async def get_many(self, actives: Iterable[str]) -> Dict[str, BTCData]:
+        """Busca várias cotações com um único MGET; ausentes não aparecem no resultado"""
+        actives = list(actives)
+        if not actives or not self.available:
+            return {}
+
+        try:
+            with span("shared_cache", operation="mget"):
+                values = await self.redis.mget([self._key(active) for active in actives])
+        except (RedisError, OSError, asyncio.TimeoutError) as e:
+            self._on_error("mget", e)
+            return {}
+
+        found = {}
+        for active, value in zip(actives, values):
+            if value is None:
+                continue
+            try:
+                found[active] = BTCData.model_validate_json(value)
+            except ValidationError:
+                continue
+
+        CACHE_HITS.labels(cache_name=self.name).inc(len(found))
+        CACHE_MISSES.labels(cache_name=self.name).inc(len(actives) - len(found))
+        return found
+
+    async def set_many(self, quotes: Dict[str, BTCData]):
+        """Grava várias cotações em um único pipeline, cada uma com o TTL do cache"""
+        if not quotes or not self.available:
+            return
+
+        ttl_ms = max(1, int(self.ttl * 1000))
+        try:
+            with span("shared_cache", operation="set"):
+                async with self.redis.pipeline(transaction=False) as pipe:
+                    for active, quote in quotes.items():
+                        pipe.set(self._key(active), quote.__pydantic_serializer__.to_json(quote, by_alias=True), px=ttl_ms)
+                    await pipe.execute()
+        except (RedisError, OSError, asyncio.TimeoutError) as e:
+            self._on_error("set", e)
+
+
+def create_shared_quote_cache(settings: Settings) -> RedisQuoteCache:
+    """Cria o cache compartilhado a partir de settings.REDIS_URL"""
+    redis = aioredis.from_url(
+        settings.REDIS_URL,
+        socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+        socket_connect_timeout=settings.REDIS_SOCKET_TIMEOUT
+    )
+    return RedisQuoteCache(redis, ttl=settings.QUOTE_CACHE_TTL, retry_after=settings.REDIS_RETRY_AFTER)
@@ -0,0 +1,299 @@
+"""
+Snapshot de warm start: cotações dos instrumentos mais populares e estado
+dos Circuit Breakers, para que um reinício ou deploy não comece do zero.
+
+O snapshot é gravado periodicamente e no encerramento, em um arquivo
+binário compacto (cotações empacotadas com struct, sem JSON), e lido via
+mmap na inicialização:
+- cotações mais antigas que WARM_START_MAX_AGE são descartadas; as demais
+  entram no cache com a idade que já tinham
+- a popularidade dos instrumentos é restaurada, mantendo o prefetch ativo
+- um Circuit Breaker aberto continua aberto pelo que restava do reset_timeout,
+  sem voltar a sobrecarregar um serviço externo que estava falhando
+
+Os instrumentos do snapshot sem cotação válida são buscados em segundo plano
+em uma única chamada em lote. O tempo até todos eles terem cotação no cache
+é exportado em dummy_api_warm_start_time_to_warm_seconds.
+"""
+import asyncio
+import mmap
+import os
+import struct
+import time
+import zlib
+from typing import Dict, List, Optional, Set, Tuple
+
+from app.core.logging import logger
+from app.core.metrics import WARM_START_ENTRIES, WARM_START_TIME_TO_WARM
+from app.schemas.coin_desk import BTCData
+from app.services.circuit_breaker import STATE_CLOSED, STATE_HALF_OPEN, STATE_OPEN
+from app.services.prefetch_scheduler import InstrumentPopularity
+from app.services.quote_cache import AsyncTTLCache
+from app.services.quote_providers import ProviderRegistry
+
+SNAPSHOT_MAGIC = b"QWRM"
+SNAPSHOT_VERSION = 1
+WARM_CHECK_INTERVAL = 0.1  # in seconds
+_HEADER = struct.Struct("<4sHIdII")     # magic, versão, assinatura dos campos, gravado em (epoch), breakers, instrumentos
+_BREAKER_HEADER = struct.Struct("<HBdH")  # tamanho do nome, estado, segundos desde a abertura, tamanho da janela
+_INSTRUMENT_HEADER = struct.Struct("<HdB")  # tamanho do nome, popularidade, tem cotação
+_STRING_SIZE = struct.Struct("<H")
+_STATE_CODES = {STATE_CLOSED: 0, STATE_OPEN: 1, STATE_HALF_OPEN: 2}
+_STATES = {code: state for state, code in _STATE_CODES.items()}
+
+# Campos de BTCData na ordem do modelo: números em um único struct, textos com tamanho prefixado
+_NUMERIC_FIELDS = [(name, field) for name, field in BTCData.model_fields.items() if field.annotation in (int, float)]
+_TEXT_FIELDS = [(name, field) for name, field in BTCData.model_fields.items() if field.annotation is str]
+_QUOTE = struct.Struct("<d" + "".join("q" if field.annotation is int else "d" for _, field in _NUMERIC_FIELDS))  # armazenada em (epoch) + campos
+# Muda quando os campos de BTCData mudam, invalidando snapshots antigos
+FIELDS_SIGNATURE = zlib.crc32(
+    ";".join(f"{field.alias}:{field.annotation.__name__}" for field in BTCData.model_fields.values()).encode()
+)
+
+
+def _pack_string(value: str) -> bytes:
+    data = value.encode()
+    return _STRING_SIZE.pack(len(data)) + data
+
+
+def _pack_quote(quote: BTCData, stored_at: float) -> bytes:
+    numbers = _QUOTE.pack(stored_at, *(getattr(quote, name) for name, _ in _NUMERIC_FIELDS))
+    return numbers + b"".join(_pack_string(getattr(quote, name)) for name, _ in _TEXT_FIELDS)
+
+
+def encode_snapshot(
+    created_at: float,
+    breakers: List[Tuple[str, str, float, List[bool]]],
+    instruments: List[Tuple[str, float, Optional[Tuple[BTCData, float]]]]
+) -> bytes:
+    """
+    Monta o snapshot binário.
+
+    Args:
+        created_at: Instante da gravação (epoch)
+        breakers: (nome, estado, segundos desde a abertura, janela de chamadas) de cada Circuit Breaker
+        instruments: (nome, popularidade, (cotação, armazenada em epoch) ou None) de cada instrumento
+    """
+    parts = [_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, FIELDS_SIGNATURE, created_at, len(breakers), len(instruments))]
+    for name, state, open_age, window in breakers:
+        encoded = name.encode()
+        parts.append(_BREAKER_HEADER.pack(len(encoded), _STATE_CODES[state], open_age, len(window)))
+        parts.append(encoded)
+        parts.append(bytes(bytearray(int(failed) for failed in window)))
+    for name, score, stored in instruments:
+        encoded = name.encode()
+        parts.append(_INSTRUMENT_HEADER.pack(len(encoded), score, stored is not None))
+        parts.append(encoded)
+        if stored is not None:
+            parts.append(_pack_quote(*stored))
+    return b"".join(parts)
+
+
+def _read_string(buffer, offset: int) -> Tuple[str, int]:
+    (size,) = _STRING_SIZE.unpack_from(buffer, offset)
+    offset += _STRING_SIZE.size
+    return bytes(buffer[offset:offset + size]).decode(), offset + size
+
+
+def decode_snapshot(buffer) -> Optional[Tuple[float, list, list]]:
+    """Lê um snapshot de encode_snapshot; None se o formato ou os campos de BTCData forem outros"""
+    magic, version, signature, created_at, breaker_count, instrument_count = _HEADER.unpack_from(buffer, 0)
+    if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION or signature != FIELDS_SIGNATURE:
+        return None
+
+    offset = _HEADER.size
+    breakers = []
+    for _ in range(breaker_count):
+        name_size, state_code, open_age, window_size = _BREAKER_HEADER.unpack_from(buffer, offset)
+        offset += _BREAKER_HEADER.size
+        name = bytes(buffer[offset:offset + name_size]).decode()
+        offset += name_size
+        window = [bool(failed) for failed in buffer[offset:offset + window_size]]
+        offset += window_size
+        breakers.append((name, _STATES[state_code], open_age, window))
+
+    instruments = []
+    for _ in range(instrument_count):
+        name_size, score, has_quote = _INSTRUMENT_HEADER.unpack_from(buffer, offset)
+        offset += _INSTRUMENT_HEADER.size
+        name = bytes(buffer[offset:offset + name_size]).decode()
+        offset += name_size
+        stored = None
+        if has_quote:
+            values = _QUOTE.unpack_from(buffer, offset)
+            offset += _QUOTE.size
+            fields = {field.alias: value for (_, field), value in zip(_NUMERIC_FIELDS, values[1:])}
+            for _, field in _TEXT_FIELDS:
+                fields[field.alias], offset = _read_string(buffer, offset)
+            stored = (fields, values[0])
+        instruments.append((name, score, stored))
+    return created_at, breakers, instruments
+
+
+class WarmStartSnapshotter:
+    """Grava e restaura o snapshot de warm start; usado no lifespan da aplicação"""
+
+    def __init__(
+        self,
+        path: str,
+        interval: float,
+        max_age: float,
+        max_instruments: int,
+        service,
+        cache: AsyncTTLCache,
+        popularity: InstrumentPopularity,
+        registry: ProviderRegistry
+    ):
+        """
+        Args:
+            path: Caminho do arquivo de snapshot
+            interval: Intervalo em segundos entre snapshots
+            max_age: Idade máxima em segundos de uma cotação restaurada
+            max_instruments: Quantidade de instrumentos mais populares incluídos no snapshot
+            service: Serviço com o método get_actives_by_names, usado para aquecer o cache
+            cache: Cache de cotações
+            popularity: Popularidade dos instrumentos, alimentada pelo router
+            registry: Registro de provedores, com os Circuit Breakers
+        """
+        self.path = path
+        self.interval = interval
+        self.max_age = max_age
+        self.max_instruments = max_instruments
+        self.service = service
+        self.cache = cache
+        self.popularity = popularity
+        self.registry = registry
+        self._tasks: List[asyncio.Task] = []
+
+    def start(self):
+        started = time.monotonic()
+        instruments = self.load()
+        self._tasks.append(asyncio.create_task(self._run()))
+        if instruments:
+            self._tasks.append(asyncio.create_task(self._warm_up(instruments, started)))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+        await self.save()
+
+    def records(self) -> bytes:
+        """Monta o snapshot com o estado atual; deve rodar no event loop, junto das escritas"""
+        now_epoch = time.time()
+        now = time.monotonic()
+        breakers = [
+            (provider.name, *provider.breaker.export_state())
+            for provider in self.registry.providers
+        ]
+        stored = {key: (value, stored_at) for key, value, stored_at in self.cache.entries()}
+        instruments = []
+        for name, score in self.popularity.top_scores(self.max_instruments):
+            value, stored_at = stored.get(name, (None, 0.0))
+            quote = (value, now_epoch - (now - stored_at)) if isinstance(value, BTCData) else None
+            instruments.append((name, score, quote))
+        return encode_snapshot(now_epoch, breakers, instruments)
+
+    async def save(self):
+        try:
+            await asyncio.to_thread(_write_atomically, self.path, self.records())
+        except OSError as e:
+            logger.error("Falha ao gravar o snapshot de warm start %s: %s", self.path, e)
+
+    def load(self) -> List[str]:
+        """
+        Restaura o snapshot, se existir.
+
+        Returns:
+            Os instrumentos do snapshot, em ordem de popularidade
+        """
+        try:
+            with open(self.path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                decoded = decode_snapshot(buffer)
+        except FileNotFoundError:
+            return []
+        except (OSError, ValueError, KeyError, struct.error) as e:
+            logger.warning("Falha ao carregar o snapshot de warm start %s: %s", self.path, e)
+            return []
+        if decoded is None:
+            logger.warning("Snapshot de warm start %s ignorado: formato desconhecido", self.path)
+            return []
+
+        created_at, breakers, instruments = decoded
+        now = time.time()
+        elapsed = max(now - created_at, 0.0)
+        self._restore_breakers(breakers, elapsed)
+
+        restored = 0
+        for name, score, stored in instruments:
+            if stored is None:
+                continue
+            fields, stored_at = stored
+            age = max(now - stored_at, 0.0)
+            if age > self.max_age:
+                WARM_START_ENTRIES.labels(kind="quote", result="expired").inc()
+                continue
+            self.cache.set(name, BTCData.model_validate(fields), age=age)
+            WARM_START_ENTRIES.labels(kind="quote", result="restored").inc()
+            restored += 1
+        self.popularity.restore((name, score) for name, score, _ in instruments)
+
+        logger.info(
+            "Snapshot de warm start %s carregado: %d/%d cotações, gravado há %.1fs",
+            self.path, restored, len(instruments), elapsed
+        )
+        return [name for name, _, _ in instruments]
+
+    def _restore_breakers(self, breakers: List[tuple], elapsed: float):
+        providers: Dict[str, object] = {provider.name: provider for provider in self.registry.providers}
+        for name, state, open_age, window in breakers:
+            provider = providers.get(name)
+            if provider is None:
+                continue
+            if elapsed > self.max_age and state == STATE_CLOSED:
+                # A janela de chamadas de um snapshot antigo não diz nada sobre o serviço agora
+                WARM_START_ENTRIES.labels(kind="breaker", result="expired").inc()
+                continue
+            provider.breaker.restore_state(state, open_age + elapsed, window)
+            WARM_START_ENTRIES.labels(kind="breaker", result="restored").inc()
+
+    async def _warm_up(self, instruments: List[str], started: float):
+        """Busca em lote os instrumentos do snapshot sem cotação válida e mede o tempo até o cache estar quente"""
+        missing = [name for name in instruments if self.cache.get(name) is None]
+        if missing and await self.registry.can_execute():
+            try:
+                await self.service.get_actives_by_names(missing)
+            except Exception as e:
+                logger.warning("Falha ao aquecer o cache com %d instrumentos do snapshot: %s", len(missing), e)
+
+        # Desiste no primeiro snapshot periódico: instrumentos que não voltaram até lá não vão contar
+        pending: Set[str] = set(instruments)
+        give_up_at = started + self.interval
+        while True:
+            pending = {name for name in pending if self.cache.get(name) is None}
+            if not pending:
+                break
+            if time.monotonic() >= give_up_at:
+                logger.warning("Cache não aquecido após %.1fs: %d instrumentos do snapshot sem cotação", self.interval, len(pending))
+                return
+            await asyncio.sleep(WARM_CHECK_INTERVAL)
+        time_to_warm = time.monotonic() - started
+        WARM_START_TIME_TO_WARM.set(time_to_warm)
+        logger.info("Cache aquecido em %.2fs com %d instrumentos do snapshot", time_to_warm, len(instruments))
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.save()
+
+
+def _write_atomically(path: str, data: bytes):
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "wb") as f:
+        f.write(data)
+    os.replace(temp_path, path)
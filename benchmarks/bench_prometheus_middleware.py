@@ -0,0 +1,146 @@
+"""
+Benchmark do overhead por requisição do middleware de métricas.
+
+Compara a mesma aplicação FastAPI mínima:
+- sem middleware (linha de base)
+- com o middleware anterior, baseado em BaseHTTPMiddleware e rotulado pelo caminho bruto
+- com o PrometheusMiddleware ASGI puro, rotulado pelo template da rota
+
+As requisições são enviadas diretamente pela interface ASGI, sem servidor
+nem cliente HTTP, para isolar o custo do middleware.
+
+Uso:
+    python -m benchmarks.bench_prometheus_middleware --requests 20000
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from fastapi import FastAPI, Request
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from app.core.metrics import (
+    HTTP_REQUEST_COUNTER,
+    HTTP_REQUEST_DURATION,
+    HTTP_REQUESTS_IN_PROGRESS,
+    PrometheusMiddleware
+)
+
+
+class LegacyPrometheusMiddleware(BaseHTTPMiddleware):
+    """Cópia da implementação anterior, mantida aqui apenas para comparação"""
+
+    async def dispatch(self, request: Request, call_next):
+        method = request.method
+        path = request.url.path
+        HTTP_REQUESTS_IN_PROGRESS.labels(method=method, endpoint=path).inc()
+        start_time = time.time()
+        status_code = 500
+        try:
+            response = await call_next(request)
+            status_code = response.status_code
+            return response
+        finally:
+            duration = time.time() - start_time
+            HTTP_REQUEST_COUNTER.labels(method=method, endpoint=path, status_code=status_code).inc()
+            HTTP_REQUEST_DURATION.labels(method=method, endpoint=path, status_code=status_code).observe(duration)
+            HTTP_REQUESTS_IN_PROGRESS.labels(method=method, endpoint=path).dec()
+
+
+def build_app(middleware=None) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/api/v1/finance/active/{active_name}")
+    async def active(active_name: str):
+        return {"active": active_name}
+
+    if middleware is not None:
+        app.add_middleware(middleware)
+    return app
+
+
+async def call(app, path: str):
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": b"",
+        "headers": [(b"host", b"bench")],
+        "client": ("127.0.0.1", 12345),
+        "server": ("bench", 80),
+    }
+
+    request_sent = False
+    disconnected = asyncio.Event()
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await disconnected.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        pass
+
+    await app(scope, receive, send)
+
+
+async def measure(app, requests: int, distinct_paths: int) -> float:
+    paths = [f"/api/v1/finance/active/SYM{i}-USD" for i in range(distinct_paths)]
+    for path in paths[:100]:
+        await call(app, path)
+
+    start = time.perf_counter()
+    for i in range(requests):
+        await call(app, paths[i % distinct_paths])
+    return (time.perf_counter() - start) / requests * 1e6
+
+
+def count_series() -> int:
+    return sum(1 for sample in HTTP_REQUEST_COUNTER.collect()[0].samples if sample.name.endswith("_total"))
+
+
+async def main(requests: int, distinct_paths: int, output: str = None):
+    variants = {
+        "no_middleware": build_app(),
+        "legacy_base_http_middleware": build_app(LegacyPrometheusMiddleware),
+        "asgi_prometheus_middleware": build_app(PrometheusMiddleware),
+    }
+
+    results = {}
+    new_series = {}
+    for name, app in variants.items():
+        series_before = count_series()
+        results[name] = await measure(app, requests, distinct_paths)
+        new_series[name] = count_series() - series_before
+    baseline = results["no_middleware"]
+
+    print(f"{'variante':<32}{'us/req':>10}{'overhead us':>14}{'novas séries':>14}")
+    for name, micros in results.items():
+        print(f"{name:<32}{micros:>10.1f}{micros - baseline:>14.1f}{new_series[name]:>14}")
+
+    if output:
+        with open(output, "w") as f:
+            json.dump({
+                "requests": requests,
+                "distinct_paths": distinct_paths,
+                "us_per_request": results,
+                "new_series": new_series
+            }, f, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--distinct-paths", type=int, default=1000)
+    parser.add_argument("--output", help="Arquivo JSON para salvar os resultados")
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.distinct_paths, args.output))
@@ -0,0 +1,112 @@
+"""
+Benchmark da serialização da resposta de /finance/active/{active_name}.
+
+Compara, para a mesma resposta do serviço externo:
+- caminho anterior: json.loads, BTCData(**dict), BTCDataResponse(**dict) e
+  serialização do response_model pelo FastAPI (nova validação + jsonable_encoder)
+- caminho novo sem cache: TickEnvelope validado direto dos bytes e JSON
+  gerado pelo serializador em Rust do pydantic
+- caminho novo com cache: bytes já memorizados na cotação
+
+Uso:
+    python -m benchmarks.bench_response_serialization --iterations 20000
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from app.schemas.coin_desk import BTCData, BTCDataResponse, TickEnvelope
+
+INSTRUMENT = "BTC-BRL"
+
+
+def make_payload() -> bytes:
+    tick = {
+        "TYPE": "1",
+        "MARKET": "cadli",
+        "INSTRUMENT": INSTRUMENT,
+        "CCSEQ": 123456,
+        "VALUE": 350000.12,
+        "VALUE_FLAG": "UP",
+        "VALUE_LAST_UPDATE_TS": 1700000000,
+        "VALUE_LAST_UPDATE_TS_NS": 0,
+        "LAST_UPDATE_QUANTITY": 0.01,
+        "LAST_UPDATE_QUOTE_QUANTITY": 3500.0,
+        "LAST_UPDATE_VOLUME_TOP_TIER": 0.01,
+        "LAST_UPDATE_QUOTE_VOLUME_TOP_TIER": 3500.0,
+        "LAST_UPDATE_VOLUME_DIRECT": 0.01,
+        "LAST_UPDATE_QUOTE_VOLUME_DIRECT": 3500.0,
+        "LAST_UPDATE_VOLUME_TOP_TIER_DIRECT": 0.01,
+        "LAST_UPDATE_QUOTE_VOLUME_TOP_TIER_DIRECT": 3500.0,
+        "LAST_UPDATE_CCSEQ": 123456,
+        "CURRENT_HOUR_VOLUME": 12.5,
+        "CURRENT_HOUR_QUOTE_VOLUME": 4375000.0,
+        "CURRENT_HOUR_OPEN": 349000.0,
+        "CURRENT_HOUR_HIGH": 351000.0,
+        "CURRENT_HOUR_LOW": 348500.0,
+        "CURRENT_HOUR_CHANGE": 1000.12,
+        "CURRENT_HOUR_CHANGE_PERCENTAGE": 0.29,
+    }
+    return json.dumps({"Data": {INSTRUMENT: tick}, "Err": {}}).encode()
+
+
+RESPONSE_FIELD = create_response_field(name="Response_get_integrated_active", type_=BTCDataResponse, mode="serialization")
+
+
+async def legacy_path(content: bytes) -> bytes:
+    data = json.loads(content)
+    quote = BTCData(**data["Data"][INSTRUMENT])
+    response = BTCDataResponse(**{"BTC-DATA": quote})
+    body = await serialize_response(field=RESPONSE_FIELD, response_content=response, by_alias=True)
+    return json.dumps(body, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode()
+
+
+async def fast_path(content: bytes) -> bytes:
+    quote = TickEnvelope.model_validate_json(content).data[INSTRUMENT]
+    return quote.to_response_json()
+
+
+async def measure(func, iterations: int) -> float:
+    for _ in range(100):
+        await func()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        await func()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+async def main(iterations: int, output: str = None):
+    content = make_payload()
+    cached_quote = TickEnvelope.model_validate_json(content).data[INSTRUMENT]
+
+    assert json.loads(await legacy_path(content)) == json.loads(await fast_path(content))
+
+    async def cache_hit() -> bytes:
+        return cached_quote.to_response_json()
+
+    results = {
+        "legacy_validate_and_serialize": await measure(lambda: legacy_path(content), iterations),
+        "fast_path_cold": await measure(lambda: fast_path(content), iterations),
+        "fast_path_cache_hit": await measure(cache_hit, iterations),
+    }
+    baseline = results["legacy_validate_and_serialize"]
+
+    print(f"{'variante':<32}{'us/resp':>10}{'speedup':>10}")
+    for name, micros in results.items():
+        print(f"{name:<32}{micros:>10.2f}{baseline / micros:>9.1f}x")
+
+    if output:
+        with open(output, "w") as f:
+            json.dump({"iterations": iterations, "us_per_response": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--output", help="Arquivo JSON para salvar os resultados")
+    args = parser.parse_args()
+    asyncio.run(main(args.iterations, args.output))
@@ -0,0 +1,142 @@
+"""
+Benchmark do tempo de inicialização da aplicação.
+
+Mede, em processos novos:
+- importação: python -X importtime -c "import app.main", com o tempo total
+  e os pacotes mais caros (soma do tempo próprio dos seus módulos)
+- primeira requisição: tempo entre iniciar o uvicorn (--factory
+  app.main:create_app) e o primeiro 200 em GET /
+
+Uso:
+    python -m benchmarks.bench_startup --runs 5 --output startup.json
+"""
+import argparse
+import json
+import os
+import platform
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from collections import Counter
+from typing import Dict, List, Optional
+
+import httpx
+
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|\s*(\S+)$")
+
+
+def benchmark_env() -> Dict[str, str]:
+    env = dict(os.environ)
+    env.setdefault("COIN_DESK_API", "http://coindesk.stub")
+    env.setdefault("GENDERIZE_API", "http://genderize.stub")
+    env.setdefault("PREFETCH_ENABLED", "false")
+    env.setdefault("LOG_LEVEL", "WARNING")
+    return env
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def measure_import(top: int) -> Dict:
+    """
+    Importa app.main em um processo novo e retorna o tempo total e os pacotes
+    mais caros (soma do tempo próprio dos seus módulos), em ms
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        env=benchmark_env(), capture_output=True, text=True, check=True
+    )
+    total = 0.0
+    packages: Counter = Counter()
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        name = match.group(3)
+        packages[name.split(".")[0]] += int(match.group(1)) / 1000
+        if name == "app.main":
+            total = int(match.group(2)) / 1000
+
+    return {"total_ms": round(total, 1), "top_packages_ms": {name: round(ms, 1) for name, ms in packages.most_common(top)}}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def measure_first_request(timeout: float) -> float:
+    """Inicia o uvicorn e retorna o tempo em ms até o primeiro 200 em GET /"""
+    port = free_port()
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "--factory", "app.main:create_app", "--port", str(port), "--log-level", "warning"],
+        env=benchmark_env(), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        with httpx.Client(timeout=0.5) as client:
+            while time.perf_counter() - start < timeout:
+                try:
+                    if client.get(f"http://127.0.0.1:{port}/").status_code == 200:
+                        return (time.perf_counter() - start) * 1000
+                except httpx.TransportError:
+                    pass
+                if process.poll() is not None:
+                    raise RuntimeError(f"uvicorn encerrou com código {process.returncode}")
+                time.sleep(0.005)
+        raise TimeoutError(f"Nenhuma resposta 200 em {timeout}s")
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def summarize(samples: List[float]) -> Dict:
+    return {
+        "median_ms": round(statistics.median(samples), 1),
+        "min_ms": round(min(samples), 1),
+        "max_ms": round(max(samples), 1),
+    }
+
+
+def main(runs: int, top: int, timeout: float, output: Optional[str] = None):
+    imports = [measure_import(top) for _ in range(runs)]
+    first_requests = [measure_first_request(timeout) for _ in range(runs)]
+
+    results = {
+        "import": summarize([run["total_ms"] for run in imports]),
+        "import_top_packages_ms": imports[-1]["top_packages_ms"],
+        "first_request": summarize(first_requests),
+    }
+
+    print(f"import app.main:        mediana {results['import']['median_ms']:>8.1f} ms")
+    print(f"primeira requisição:    mediana {results['first_request']['median_ms']:>8.1f} ms")
+    print("pacotes mais caros na importação (última execução):")
+    for name, ms in results["import_top_packages_ms"].items():
+        print(f"  {name:<40}{ms:>8.1f} ms")
+
+    if output:
+        with open(output, "w") as f:
+            json.dump({
+                "commit": git_commit(),
+                "python": platform.python_version(),
+                "runs": runs,
+                "results": results
+            }, f, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="Execuções de cada medição")
+    parser.add_argument("--top", type=int, default=10, help="Quantidade de pacotes listados")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Tempo máximo em segundos até a primeira resposta")
+    parser.add_argument("--output", help="Arquivo JSON para salvar os resultados")
+    args = parser.parse_args()
+    main(args.runs, args.top, args.timeout, args.output)
@@ -0,0 +1,183 @@
+"""
+Benchmark de vazão da aplicação com 1 a N workers (gunicorn.conf.py).
+
+Para cada quantidade de workers, inicia o gunicorn contra o stub da
+CoinDesk (rodando como servidor), aquece o cache e gera carga em
+GET /api/v1/finance/active/{active_name} a partir de processos clientes
+separados, para que o gerador de carga não seja o gargalo. São reportados
+RPS, latências p50/p99 e a eficiência em relação a 1 worker.
+
+Uso:
+    python -m benchmarks.bench_workers --max-workers 4 --duration 10 --output workers.json
+
+O rate limit, o prefetch e o catálogo de instrumentos são desativados, e o
+nível de log é WARNING, para medir apenas o caminho da requisição.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+import httpx
+
+from benchmarks.bench_startup import free_port, git_commit
+
+ENDPOINT = "/api/v1/finance/active/{}"
+HOT_INSTRUMENTS = ["BTC-BRL", "BTC-USD", "ETH-USD", "SOL-USD", "XRP-USD"]
+
+
+def base_env() -> Dict[str, str]:
+    # O uvicorn também lê WEB_CONCURRENCY: ele não pode vazar para o stub
+    env = {key: value for key, value in os.environ.items() if key != "WEB_CONCURRENCY"}
+    env.setdefault("GENDERIZE_API", "http://genderize.stub")
+    env.update({
+        "PREFETCH_ENABLED": "false",
+        "INSTRUMENT_CATALOG_ENABLED": "false",
+        "RATE_LIMIT_ENABLED": "false",
+        "LOG_LEVEL": "WARNING",
+    })
+    return env
+
+
+def wait_ready(url: str, process: subprocess.Popen, timeout: float):
+    start = time.perf_counter()
+    with httpx.Client(timeout=0.5) as client:
+        while time.perf_counter() - start < timeout:
+            try:
+                if client.get(url).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            if process.poll() is not None:
+                raise RuntimeError(f"Processo encerrou com código {process.returncode}")
+            time.sleep(0.05)
+    raise TimeoutError(f"{url} não respondeu em {timeout}s")
+
+
+def stop(process: subprocess.Popen):
+    process.terminate()
+    try:
+        process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+async def _client_load(base_url: str, duration: float, concurrency: int) -> List[float]:
+    latencies: List[float] = []
+    stop_at = time.perf_counter() + duration
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=10.0) as client:
+        async def worker(offset: int):
+            index = offset
+            while time.perf_counter() < stop_at:
+                request_start = time.perf_counter()
+                response = await client.get(ENDPOINT.format(HOT_INSTRUMENTS[index % len(HOT_INSTRUMENTS)]))
+                if response.status_code == 200:
+                    latencies.append(time.perf_counter() - request_start)
+                index += 1
+
+        await asyncio.gather(*[worker(i) for i in range(concurrency)])
+    return latencies
+
+
+def client_load(base_url: str, duration: float, concurrency: int) -> List[float]:
+    """Executa em um processo cliente e retorna a latência das respostas 200"""
+    return asyncio.run(_client_load(base_url, duration, concurrency))
+
+
+def run_workers(workers: int, stub_url: str, clients: int, concurrency: int, duration: float, timeout: float) -> Dict:
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    with tempfile.TemporaryDirectory() as metrics_dir:
+        env = base_env()
+        env.update({
+            "COIN_DESK_API": stub_url,
+            "WEB_CONCURRENCY": str(workers),
+            "BIND": f"127.0.0.1:{port}",
+            "PROMETHEUS_MULTIPROC_DIR": metrics_dir,
+        })
+        process = subprocess.Popen(
+            [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py"],
+            env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        try:
+            wait_ready(f"{base_url}/", process, timeout)
+            with ProcessPoolExecutor(max_workers=clients) as pool:
+                # Aquecimento: cada worker precisa carregar os instrumentos no seu cache local
+                list(pool.map(client_load, [base_url] * clients, [1.0] * clients, [concurrency] * clients))
+                start = time.perf_counter()
+                results = pool.map(client_load, [base_url] * clients, [duration] * clients, [concurrency] * clients)
+                latencies = sorted(latency for result in results for latency in result)
+                elapsed = time.perf_counter() - start
+        finally:
+            stop(process)
+
+    latencies_ms = [latency * 1000 for latency in latencies]
+    cuts = statistics.quantiles(latencies_ms, n=100) if len(latencies_ms) > 1 else latencies_ms * 99
+    return {
+        "workers": workers,
+        "requests": len(latencies_ms),
+        "rps": round(len(latencies_ms) / elapsed, 1),
+        "latency_ms": {"p50": round(cuts[49], 3), "p99": round(cuts[98], 3)},
+    }
+
+
+def main(max_workers: int, clients: int, concurrency: int, duration: float, latency: float, timeout: float, output: Optional[str] = None):
+    stub_port = free_port()
+    stub = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.coin_desk_stub", "--port", str(stub_port), "--latency", str(latency)],
+        env=base_env(), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        stub_url = f"http://127.0.0.1:{stub_port}"
+        wait_ready(f"{stub_url}/index/cc/v1/latest/tick?instruments=BTC-BRL", stub, timeout)
+        results = [
+            run_workers(workers, stub_url, clients, concurrency, duration, timeout)
+            for workers in range(1, max_workers + 1)
+        ]
+    finally:
+        stop(stub)
+
+    baseline = results[0]["rps"] or 1
+    print(f"{'workers':>8}{'req':>10}{'rps':>10}{'p50 ms':>10}{'p99 ms':>10}{'eficiência':>12}")
+    for result in results:
+        result["efficiency"] = round(result["rps"] / (baseline * result["workers"]), 2)
+        print(
+            f"{result['workers']:>8}{result['requests']:>10}{result['rps']:>10}{result['latency_ms']['p50']:>10.2f}"
+            f"{result['latency_ms']['p99']:>10.2f}{result['efficiency']:>12.2f}"
+        )
+
+    if output:
+        with open(output, "w") as f:
+            json.dump({
+                "commit": git_commit(),
+                "python": platform.python_version(),
+                "cpus": os.cpu_count(),
+                "clients": clients,
+                "concurrency": concurrency,
+                "duration": duration,
+                "results": results
+            }, f, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1, help="Maior quantidade de workers medida")
+    parser.add_argument("--clients", type=int, default=2, help="Processos geradores de carga")
+    parser.add_argument("--concurrency", type=int, default=50, help="Requisições simultâneas por processo cliente")
+    parser.add_argument("--duration", type=float, default=10.0, help="Duração da medição de cada quantidade de workers em segundos")
+    parser.add_argument("--latency", type=float, default=0.02, help="Latência do stub da CoinDesk em segundos")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Tempo máximo em segundos até o servidor responder")
+    parser.add_argument("--output", help="Arquivo JSON para salvar os resultados")
+    args = parser.parse_args()
+    main(args.max_workers, args.clients, args.concurrency, args.duration, args.latency, args.timeout, args.output)
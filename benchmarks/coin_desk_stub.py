@@ -0,0 +1,91 @@
+"""
+Stub local do endpoint de ticks da CoinDesk para benchmarks.
+
+Responde GET /index/cc/v1/latest/tick?instruments=A,B com um tick válido
+para cada instrumento, com latência, jitter e taxa de erro configuráveis.
+Pode ser usado em processo (httpx.ASGITransport) ou como servidor:
+
+    python -m benchmarks.coin_desk_stub --port 9000 --latency 0.05 --error-rate 0.1
+    COIN_DESK_API=http://127.0.0.1:9000 uvicorn app.main:app
+"""
+import argparse
+import asyncio
+import json
+import random
+from typing import Optional
+from urllib.parse import parse_qs
+
+TICK_TEMPLATE = {
+    "TYPE": "952", "MARKET": "cadli", "CCSEQ": 1, "VALUE": 350000.0, "VALUE_FLAG": "UP",
+    "VALUE_LAST_UPDATE_TS": 1700000000, "VALUE_LAST_UPDATE_TS_NS": 0,
+    "LAST_UPDATE_QUANTITY": 0.01, "LAST_UPDATE_QUOTE_QUANTITY": 3500.0,
+    "LAST_UPDATE_VOLUME_TOP_TIER": 0.01, "LAST_UPDATE_QUOTE_VOLUME_TOP_TIER": 3500.0,
+    "LAST_UPDATE_VOLUME_DIRECT": 0.01, "LAST_UPDATE_QUOTE_VOLUME_DIRECT": 3500.0,
+    "LAST_UPDATE_VOLUME_TOP_TIER_DIRECT": 0.01, "LAST_UPDATE_QUOTE_VOLUME_TOP_TIER_DIRECT": 3500.0,
+    "LAST_UPDATE_CCSEQ": 1, "CURRENT_HOUR_VOLUME": 12.5, "CURRENT_HOUR_QUOTE_VOLUME": 4375000.0,
+    "CURRENT_HOUR_OPEN": 349000.0, "CURRENT_HOUR_HIGH": 351000.0, "CURRENT_HOUR_LOW": 348500.0,
+    "CURRENT_HOUR_CHANGE": 1000.0, "CURRENT_HOUR_CHANGE_PERCENTAGE": 0.29,
+}
+
+
+class CoinDeskStub:
+    """App ASGI que imita o endpoint de ticks da CoinDesk"""
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0, seed: Optional[int] = None):
+        """
+        Args:
+            latency: Latência média em segundos de cada resposta
+            jitter: Variação máxima em segundos (para mais ou para menos) sobre a latência
+            error_rate: Fração (0 a 1) das requisições respondidas com 503
+            seed: Semente do gerador aleatório, para execuções reproduzíveis
+        """
+        self.random = random.Random(seed)
+        self.requests = 0
+        self.errors = 0
+        self.configure(latency, jitter, error_rate)
+
+    def configure(self, latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+
+    def _delay(self) -> float:
+        return max(0.0, self.latency + self.random.uniform(-self.jitter, self.jitter))
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return
+
+        self.requests += 1
+        delay = self._delay()
+        if delay:
+            await asyncio.sleep(delay)
+
+        if self.random.random() < self.error_rate:
+            self.errors += 1
+            status, body = 503, b'{"Err":{"message":"stub error"}}'
+        else:
+            query = parse_qs(scope["query_string"].decode())
+            instruments = query.get("instruments", [""])[0].split(",")
+            data = {name: {**TICK_TEMPLATE, "INSTRUMENT": name} for name in instruments if name}
+            status, body = 200, json.dumps({"Data": data, "Err": {}}).encode()
+
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--latency", type=float, default=0.0, help="Latência média em segundos")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Variação da latência em segundos")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fração de respostas 503")
+    args = parser.parse_args()
+    uvicorn.run(CoinDeskStub(args.latency, args.jitter, args.error_rate), host=args.host, port=args.port, log_level="warning")
@@ -0,0 +1,194 @@
+"""
+Teste de carga sustentada de GET /api/v1/finance/active/{active_name}.
+
+A aplicação roda em processo e recebe as requisições via ASGI. O serviço
+externo é o CoinDeskStub, ligado ao cliente HTTP compartilhado, com
+latência, jitter e taxa de erro definidas por cenário:
+
+- cold_cache: cada requisição pede um instrumento diferente (sempre vai ao stub)
+- warm_cache: poucos instrumentos, já carregados no cache
+- breaker_open: o stub só responde 503 e o Circuit Breaker já está aberto
+- brownout: o stub fica lento, com jitter alto e 20% de erros
+
+Para cada cenário são reportados RPS, latências p50/p95/p99, status HTTP e
+memória (RSS). Com --output os resultados são salvos em JSON para comparar
+commits:
+
+    python -m benchmarks.load_finance_active --duration 10 --concurrency 50 --output before.json
+
+O rate limit é desativado durante a execução e o nível de log padrão é
+CRITICAL, para que a saída no console não domine a medição.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import statistics
+import subprocess
+import time
+from collections import Counter
+from typing import Dict, Iterator, List, Optional
+
+os.environ.setdefault("COIN_DESK_API", "http://coindesk.stub")
+os.environ.setdefault("GENDERIZE_API", "http://genderize.stub")
+os.environ.setdefault("PREFETCH_ENABLED", "false")
+os.environ.setdefault("LOG_LEVEL", "CRITICAL")
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+
+import httpx  # noqa: E402
+
+from app.core.config import settings  # noqa: E402
+from app.core.http_client import PerHostLimitedTransport  # noqa: E402
+from app.main import create_app  # noqa: E402
+from app.services.coin_desk_api_service import breaker, quote_cache  # noqa: E402
+from benchmarks.coin_desk_stub import CoinDeskStub  # noqa: E402
+
+ENDPOINT = "/api/v1/finance/active/{}"
+HOT_INSTRUMENTS = ["BTC-BRL", "BTC-USD", "ETH-USD", "SOL-USD", "XRP-USD"]
+
+SCENARIOS = {
+    "cold_cache": {"stub": {"latency": 0.02, "jitter": 0.005}, "instruments": "unique"},
+    "warm_cache": {"stub": {"latency": 0.02, "jitter": 0.005}, "instruments": "hot", "warm": True},
+    "breaker_open": {"stub": {"latency": 0.02, "error_rate": 1.0}, "instruments": "unique", "trip_breaker": True},
+    "brownout": {"stub": {"latency": 0.3, "jitter": 0.2, "error_rate": 0.2}, "instruments": "unique"},
+}
+
+
+def rss_mb() -> Optional[float]:
+    """RSS atual do processo em MB (Linux); None se indisponível"""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return round(pages * os.sysconf("SC_PAGE_SIZE") / 2**20, 1)
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def peak_rss_mb() -> Optional[float]:
+    try:
+        import resource
+    except ImportError:
+        return None
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def instrument_names(kind: str) -> Iterator[str]:
+    if kind == "hot":
+        return itertools.cycle(HOT_INSTRUMENTS)
+    return (f"SYM{i}-USD" for i in itertools.count())
+
+
+def summarize(latencies: List[float], statuses: Counter, elapsed: float) -> Dict:
+    latencies_ms = sorted(latency * 1000 for latency in latencies)
+    cuts = statistics.quantiles(latencies_ms, n=100) if len(latencies_ms) > 1 else latencies_ms * 99
+    return {
+        "requests": len(latencies_ms),
+        "rps": round(len(latencies_ms) / elapsed, 1),
+        "latency_ms": {
+            "p50": round(cuts[49], 3),
+            "p95": round(cuts[94], 3),
+            "p99": round(cuts[98], 3),
+            "max": round(latencies_ms[-1], 3) if latencies_ms else None,
+        },
+        "status_codes": {str(code): count for code, count in sorted(statuses.items())},
+        "rss_mb": rss_mb(),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+async def run_scenario(
+    client: httpx.AsyncClient,
+    stub: CoinDeskStub,
+    spec: Dict,
+    duration: float,
+    concurrency: int
+) -> Dict:
+    stub.configure(**spec["stub"])
+    quote_cache.clear()
+    breaker.reset()
+    names = instrument_names(spec["instruments"])
+
+    if spec.get("warm"):
+        for name in HOT_INSTRUMENTS:
+            await client.get(ENDPOINT.format(name))
+    if spec.get("trip_breaker"):
+        for _ in range(1000):
+            if breaker.current_state == "open":
+                break
+            await client.get(ENDPOINT.format(next(names)))
+
+    upstream_before = stub.requests
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    start = time.perf_counter()
+    stop_at = start + duration
+
+    async def worker():
+        while time.perf_counter() < stop_at:
+            request_start = time.perf_counter()
+            response = await client.get(ENDPOINT.format(next(names)))
+            latencies.append(time.perf_counter() - request_start)
+            statuses[response.status_code] += 1
+
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    result = summarize(latencies, statuses, time.perf_counter() - start)
+    result["upstream_requests"] = stub.requests - upstream_before
+    return result
+
+
+async def main(scenarios: List[str], duration: float, concurrency: int, output: Optional[str] = None):
+    stub = CoinDeskStub(seed=42)
+    app = create_app()
+
+    async with app.router.lifespan_context(app):
+        await app.state.http_client.aclose()
+        app.state.http_client = httpx.AsyncClient(
+            transport=PerHostLimitedTransport(
+                httpx.ASGITransport(app=stub),
+                max_connections_per_host=settings.HTTP_CLIENT_MAX_CONNECTIONS_PER_HOST
+            ),
+            timeout=settings.HTTP_CLIENT_TIMEOUT
+        )
+
+        transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            results = {}
+            for name in scenarios:
+                results[name] = await run_scenario(client, stub, SCENARIOS[name], duration, concurrency)
+
+    print(f"{'cenário':<14}{'req':>8}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'rss MB':>9}  status")
+    for name, result in results.items():
+        latency = result["latency_ms"]
+        print(
+            f"{name:<14}{result['requests']:>8}{result['rps']:>10}{latency['p50']:>10.2f}"
+            f"{latency['p95']:>10.2f}{latency['p99']:>10.2f}{result['rss_mb'] or 0:>9}  {result['status_codes']}"
+        )
+
+    if output:
+        with open(output, "w") as f:
+            json.dump({
+                "commit": git_commit(),
+                "python": platform.python_version(),
+                "duration": duration,
+                "concurrency": concurrency,
+                "scenarios": results
+            }, f, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--duration", type=float, default=10.0, help="Duração de cada cenário em segundos")
+    parser.add_argument("--concurrency", type=int, default=50, help="Requisições simultâneas")
+    parser.add_argument("--scenario", action="append", choices=list(SCENARIOS), help="Cenário a executar (padrão: todos)")
+    parser.add_argument("--output", help="Arquivo JSON para salvar os resultados")
+    args = parser.parse_args()
+    asyncio.run(main(args.scenario or list(SCENARIOS), args.duration, args.concurrency, args.output))
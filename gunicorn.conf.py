@@ -0,0 +1,41 @@
+"""
+Configuração do gunicorn para rodar a aplicação com vários workers uvicorn:
+
+    gunicorn -c gunicorn.conf.py
+
+Cada worker é um processo com seu próprio event loop, cache local e
+Circuit Breaker. As métricas Prometheus de todos os workers são gravadas
+em PROMETHEUS_MULTIPROC_DIR e agregadas em GET /metrics por qualquer worker.
+Para compartilhar cotações e limites de requisição entre os workers, use
+REDIS_URL e RATE_LIMIT_STORAGE_URI.
+
+Variáveis de ambiente:
+- WEB_CONCURRENCY: número de workers (padrão: número de CPUs)
+- BIND: endereço de escuta (padrão: 0.0.0.0:8000)
+- PROMETHEUS_MULTIPROC_DIR: diretório das métricas dos workers, limpo na inicialização
+"""
+import multiprocessing
+import os
+import shutil
+
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", "/tmp/dummy_api_prometheus")
+
+wsgi_app = "app.main:create_app()"
+worker_class = "uvicorn.workers.UvicornWorker"
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+bind = os.environ.get("BIND", "0.0.0.0:8000")
+graceful_timeout = 30
+
+
+def on_starting(server):
+    # Arquivos de uma execução anterior somariam contadores de processos que não existem mais
+    metrics_dir = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir)
+
+
+def child_exit(server, worker):
+    # Remove os gauges "live*" do worker encerrado; contadores e histogramas continuam somados
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,8 @@
+import os
+
+# As configurações são lidas do ambiente no primeiro uso, não na importação:
+# os testes definem aqui os valores obrigatórios que não tiverem sido exportados.
+os.environ.setdefault("COIN_DESK_API", "https://data-api.coindesk.com")
+os.environ.setdefault("GENDERIZE_API", "https://api.genderize.io")
+# O cliente dos testes (127.0.0.1) decide a amostragem pelo traceparent
+os.environ.setdefault("TRACING_TRUSTED_NETWORKS", "127.0.0.1/32")
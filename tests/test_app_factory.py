@@ -0,0 +1,89 @@
+import os
+import subprocess
+import sys
+import pytest
+from fastapi.testclient import TestClient
+from httpx import AsyncClient, ASGITransport
+from starlette.websockets import WebSocketDisconnect
+from app.core import config
+from app.core.config import Settings
+from app.main import create_app
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_import_has_no_side_effects(tmp_path):
+    """Test that importing app.main reads no settings, configures no logging and opens no files"""
+    env = {key: value for key, value in os.environ.items() if key not in ("COIN_DESK_API", "GENDERIZE_API")}
+    env["PYTHONPATH"] = REPO_ROOT
+    script = (
+        "import logging, sys\n"
+        "import app.main\n"
+        "from app.core import config\n"
+        "assert config._settings is None\n"
+        "assert logging.getLogger().handlers == []\n"
+        "assert 'redis' not in sys.modules\n"
+    )
+    result = subprocess.run([sys.executable, "-c", script], cwd=tmp_path, env=env, capture_output=True, text=True)
+
+    assert result.returncode == 0, result.stderr
+    assert list(tmp_path.iterdir()) == []
+
+
+@pytest.fixture
+def restore_settings():
+    previous = config._settings
+    yield
+    config._settings = previous
+
+
+@pytest.mark.asyncio
+async def test_create_app_uses_given_settings(restore_settings):
+    """Test that the factory builds a working app bound to the given settings"""
+    settings = Settings(COIN_DESK_API="http://coindesk.test", GENDERIZE_API="http://genderize.test", PREFETCH_ENABLED=False)
+    app = create_app(settings)
+
+    assert app.state.settings is settings
+    assert config.get_settings() is settings
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        response = await client.get("/")
+    assert response.status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_each_app_gets_a_limiter_from_its_settings(restore_settings):
+    """Test that route limits apply to the limiter built from settings and can be disabled"""
+    limited = create_app(Settings(COIN_DESK_API="http://coindesk.test", GENDERIZE_API="http://genderize.test"))
+    unlimited = create_app(Settings(COIN_DESK_API="http://coindesk.test", GENDERIZE_API="http://genderize.test", RATE_LIMIT_ENABLED=False))
+
+    statuses = {}
+    for name, app in (("limited", limited), ("unlimited", unlimited)):
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+            statuses[name] = [(await client.get("/api/v1/finance/instruments", params={"query": "BTC"})).status_code for _ in range(31)]
+
+    assert statuses["limited"][:30] == [200] * 30
+    assert statuses["limited"][30] == 429
+    assert statuses["unlimited"] == [200] * 31
+
+
+def test_stream_endpoints_are_rate_limited_and_capped(restore_settings):
+    """Test that SSE and WebSocket subscriptions are rate limited and reject too many names"""
+    app = create_app(Settings(COIN_DESK_API="http://coindesk.test", GENDERIZE_API="http://genderize.test", STREAM_MAX_NAMES=2))
+    app.state.quote_stream_hub = None
+    client = TestClient(app)
+
+    too_many = client.get("/api/v1/finance/stream/sse", params={"names": "BTC-BRL,ETH-BRL,SOL-BRL"})
+    sse_statuses = [client.get("/api/v1/finance/stream/sse", params={"names": "invalid"}).status_code for _ in range(10)]
+    ws_reasons = []
+    for _ in range(11):
+        with pytest.raises(WebSocketDisconnect) as refused:
+            with client.websocket_connect("/api/v1/finance/stream/ws?names=invalid"):
+                pass
+        ws_reasons.append(refused.value.reason)
+
+    assert too_many.status_code == 400
+    assert "No máximo 2 ativos" in too_many.json()["detail"]
+    assert sse_statuses[:9] == [400] * 9
+    assert sse_statuses[9] == 429
+    assert "Nome de ativo inválido" in ws_reasons[9]
+    assert ws_reasons[10] == "Limite de conexões excedido."
@@ -1,110 +1,164 @@
 import pytest
 import asyncio
-from app.services.circuit_breaker import AsyncRedisCircuitBreaker
-from unittest.mock import patch, MagicMock
-import time
+from app.core.exceptions import CircuitBreakerError
+from app.services.circuit_breaker import AsyncCircuitBreaker
 from prometheus_client import REGISTRY
 
 
-@pytest.fixture
-def mock_redis():
-    with patch('app.services.circuit_breaker.Redis') as mock:
-        mock_instance = MagicMock()
-        mock.from_url.return_value = mock_instance
-        yield mock_instance
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+async def failing_call():
+    raise RuntimeError("upstream down")
+
+
+async def ok_call():
+    return "ok"
+
+
+def metric_value(name, service_name):
+    return REGISTRY.get_sample_value(name, {"service_name": service_name})
 
 
 @pytest.mark.asyncio
-async def test_circuit_breaker_fail_and_open(mock_redis):
-    """Test that circuit breaker opens after max failures"""
-    # Configurar o mock para simular o Redis
-    mock_redis.get.side_effect = [
-        None,  # get_state - inicialmente None = closed
-        "0",   # get_failure_count - inicialmente 0
-        "1",   # depois do incr (1ª falha)
-        "2",   # depois do incr (2ª falha)
-        "3",   # depois do incr (3ª falha)
-        "open" # estado após 3 falhas
-    ]
-    mock_redis.incr.side_effect = ["1", "2", "3"]
-    
-    # Criar o circuit breaker
-    cb = AsyncRedisCircuitBreaker(
-        redis_url="redis://fake",
+async def test_circuit_breaker_fail_and_open():
+    """Test that circuit breaker opens once the failure rate crosses the threshold"""
+    cb = AsyncCircuitBreaker(
         fail_max=3,
         reset_timeout=30,
-        state_name="test_service"
+        state_name="test_service",
+        window_size=10,
+        failure_rate_threshold=0.5
     )
-    
+
     # Verificar estado inicial
     assert await cb.can_execute() is True
-    
+
     # Simular 3 falhas consecutivas
-    await cb.fail()
-    await cb.fail()
-    await cb.fail()
-    
+    for _ in range(3):
+        with pytest.raises(RuntimeError):
+            await cb.execute(failing_call)
+
     # Verificar que o circuit breaker abriu
     assert await cb.can_execute() is False
-    
+    with pytest.raises(CircuitBreakerError):
+        await cb.execute(ok_call)
+
     # Verificar as métricas
-    for metric in REGISTRY.collect():
-        if metric.name == "dummy_api_circuit_breaker_state":
-            for sample in metric.samples:
-                if sample.labels.get('service_name') == 'test_service':
-                    assert sample.value == 1.0  # 1 = aberto
-        
-        if metric.name == "dummy_api_circuit_breaker_tripped_total":
-            for sample in metric.samples:
-                if sample.labels.get('service_name') == 'test_service':
-                    assert sample.value == 1.0  # foi aberto uma vez
+    assert metric_value("dummy_api_circuit_breaker_state", "test_service") == 1.0
+    assert metric_value("dummy_api_circuit_breaker_tripped_total", "test_service") == 1.0
 
 
 @pytest.mark.asyncio
-async def test_circuit_breaker_success_and_reset(mock_redis):
-    """Test that circuit breaker resets after success"""
-    # Configurar o mock
-    mock_redis.get.return_value = "closed"
-    
-    # Criar o circuit breaker
-    cb = AsyncRedisCircuitBreaker(
-        redis_url="redis://fake",
-        fail_max=3,
+async def test_failure_rate_uses_sliding_window():
+    """Test that sparse failures below the rate threshold keep the circuit closed"""
+    cb = AsyncCircuitBreaker(
+        fail_max=4,
         reset_timeout=30,
-        state_name="test_service"
+        state_name="test_sliding_window",
+        window_size=4,
+        failure_rate_threshold=0.5
     )
-    
-    # Registrar um sucesso deve resetar o contador
-    await cb.success()
-    
-    # Verificar as chamadas ao Redis
-    mock_redis.delete.assert_called_once()
-    mock_redis.set.assert_called_with('cb:test_service:state', 'closed')
+
+    for _ in range(10):
+        await cb.execute(ok_call)
+        await cb.execute(ok_call)
+        await cb.execute(ok_call)
+        with pytest.raises(RuntimeError):
+            await cb.execute(failing_call)
+
+    assert cb.current_state == "closed"
+    assert cb.failure_rate == 0.25
 
 
 @pytest.mark.asyncio
-async def test_circuit_breaker_auto_reset(mock_redis):
-    """Test that circuit breaker automatically resets after timeout"""
-    # Tempo atual simulado
-    current_time = int(time.time())
-    
-    # Configurar o mock para simular o Redis
-    mock_redis.get.side_effect = [
-        "open",  # get_state - inicialmente open
-        str(current_time - 10),  # open_until já expirou (10 segundos atrás)
-        "closed"  # get_state após verificar o tempo
-    ]
-    
-    # Criar o circuit breaker
-    cb = AsyncRedisCircuitBreaker(
-        redis_url="redis://fake",
-        fail_max=3,
-        reset_timeout=5,  # 5 segundos
-        state_name="test_service"
+async def test_slow_calls_count_as_failures():
+    """Test that calls slower than slow_call_duration open the circuit"""
+    clock = FakeClock()
+    cb = AsyncCircuitBreaker(
+        fail_max=2,
+        reset_timeout=30,
+        state_name="test_slow_calls",
+        slow_call_duration=1.0,
+        clock=clock
     )
-    
-    # Verificar que o circuit breaker vai detectar que o tempo expirou
-    assert await cb.can_execute() is True
-    
-    # Verificar que o estado foi atualizado
-    mock_redis.set.assert_called()
+
+    async def slow_call():
+        clock.now += 2.0
+        return "late"
+
+    assert await cb.execute(slow_call) == "late"
+    assert await cb.execute(slow_call) == "late"
+
+    assert cb.current_state == "open"
+
+
+@pytest.mark.asyncio
+async def test_excluded_exceptions_are_not_failures():
+    """Test that excluded exceptions propagate without counting as failures"""
+    cb = AsyncCircuitBreaker(fail_max=1, reset_timeout=30, state_name="test_excluded")
+
+    async def missing_key():
+        raise KeyError("BTC-BRL")
+
+    with pytest.raises(KeyError):
+        await cb.execute(missing_key)
+
+    assert cb.current_state == "closed"
+    assert cb.fail_counter == 0
+
+
+@pytest.mark.asyncio
+async def test_half_open_admits_limited_probes_and_closes():
+    """Test that half-open admits only the configured probes and closes after they succeed"""
+    clock = FakeClock()
+    cb = AsyncCircuitBreaker(
+        fail_max=1,
+        reset_timeout=5,
+        state_name="test_half_open",
+        half_open_max_calls=2,
+        clock=clock
+    )
+    with pytest.raises(RuntimeError):
+        await cb.execute(failing_call)
+    assert cb.current_state == "open"
+
+    clock.now = 5
+    assert cb.current_state == "half-open"
+
+    release = asyncio.Event()
+
+    async def probe():
+        await release.wait()
+        return "ok"
+
+    probes = [asyncio.create_task(cb.execute(probe)) for _ in range(2)]
+    await asyncio.sleep(0)
+    with pytest.raises(CircuitBreakerError):
+        await cb.execute(ok_call)
+
+    release.set()
+    assert await asyncio.gather(*probes) == ["ok", "ok"]
+    assert cb.current_state == "closed"
+    assert metric_value("dummy_api_circuit_breaker_state", "test_half_open") == 0.0
+
+
+@pytest.mark.asyncio
+async def test_half_open_probe_failure_reopens():
+    """Test that a failing probe sends the circuit back to open"""
+    clock = FakeClock()
+    cb = AsyncCircuitBreaker(fail_max=1, reset_timeout=5, state_name="test_reopen", clock=clock)
+    with pytest.raises(RuntimeError):
+        await cb.execute(failing_call)
+
+    clock.now = 5
+    with pytest.raises(RuntimeError):
+        await cb.execute(failing_call)
+
+    assert cb.current_state == "open"
+    assert metric_value("dummy_api_circuit_breaker_tripped_total", "test_reopen") == 2.0
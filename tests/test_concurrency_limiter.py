@@ -0,0 +1,130 @@
+import pytest
+import asyncio
+import httpx
+from app.core.exceptions import ServiceOverloadedError, service_overloaded_exception_handler
+from app.services.concurrency_limiter import (
+    AdaptiveConcurrencyLimiter,
+    PRIORITY_BACKGROUND,
+    PRIORITY_INTERACTIVE
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_limiter(name, **kwargs):
+    defaults = dict(initial_limit=1, min_limit=1, max_limit=10, queue_size=10, max_queue_wait=1.0)
+    defaults.update(kwargs)
+    return AdaptiveConcurrencyLimiter(name, **defaults)
+
+
+@pytest.mark.asyncio
+async def test_limit_grows_on_fast_calls_and_shrinks_on_slow_or_overloaded_calls():
+    """Test the additive increase and multiplicative decrease of the limit"""
+    clock = FakeClock()
+    limiter = make_limiter("test_aimd", initial_limit=4, latency_threshold=1.0, backoff_ratio=0.5, clock=clock)
+
+    async def fast():
+        return "ok"
+
+    for _ in range(8):
+        await limiter.execute(fast)
+    assert limiter.limit == 5
+
+    async def slow():
+        clock.now += 2
+        return "late"
+
+    await limiter.execute(slow)
+    assert limiter.limit == 2
+
+    async def timeout():
+        raise httpx.ReadTimeout("timeout")
+
+    with pytest.raises(httpx.ReadTimeout):
+        await limiter.execute(timeout)
+    assert limiter.limit == 1
+
+
+@pytest.mark.asyncio
+async def test_waiters_are_served_by_priority():
+    """Test that interactive calls queued after background calls get the slot first"""
+    limiter = make_limiter("test_priority")
+    release = asyncio.Event()
+    order = []
+
+    async def hold():
+        await release.wait()
+
+    def record(label):
+        async def call():
+            order.append(label)
+        return call
+
+    holder = asyncio.create_task(limiter.execute(hold))
+    await asyncio.sleep(0)
+    background = asyncio.create_task(limiter.execute(record("background"), PRIORITY_BACKGROUND))
+    interactive = asyncio.create_task(limiter.execute(record("interactive"), PRIORITY_INTERACTIVE))
+    await asyncio.sleep(0)
+    assert limiter.queue_depth == 2
+
+    release.set()
+    await asyncio.gather(holder, background, interactive)
+    assert order == ["interactive", "background"]
+    assert limiter.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_full_queue_sheds_and_interactive_calls_evict_background_ones():
+    """Test load shedding when the wait queue is full"""
+    limiter = make_limiter("test_shedding", queue_size=1)
+    release = asyncio.Event()
+
+    async def hold():
+        await release.wait()
+
+    holder = asyncio.create_task(limiter.execute(hold))
+    await asyncio.sleep(0)
+    background = asyncio.create_task(limiter.execute(hold, PRIORITY_BACKGROUND))
+    await asyncio.sleep(0)
+
+    with pytest.raises(ServiceOverloadedError):
+        await limiter.execute(hold, PRIORITY_BACKGROUND)
+
+    interactive = asyncio.create_task(limiter.execute(hold, PRIORITY_INTERACTIVE))
+    await asyncio.sleep(0)
+    with pytest.raises(ServiceOverloadedError):
+        await background
+
+    release.set()
+    await asyncio.gather(holder, interactive)
+    assert limiter.in_flight == 0 and limiter.queue_depth == 0
+
+
+@pytest.mark.asyncio
+async def test_queue_wait_timeout_sheds_with_retry_after():
+    """Test that a call waiting longer than max_queue_wait is shed with a Retry-After hint"""
+    limiter = make_limiter("test_queue_timeout", max_queue_wait=0.01, retry_after=3)
+    release = asyncio.Event()
+
+    async def hold():
+        await release.wait()
+
+    holder = asyncio.create_task(limiter.execute(hold))
+    await asyncio.sleep(0)
+
+    with pytest.raises(ServiceOverloadedError) as exc_info:
+        await limiter.execute(hold)
+    assert limiter.queue_depth == 0
+
+    response = service_overloaded_exception_handler(None, exc_info.value)
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "3"
+
+    release.set()
+    await holder
@@ -0,0 +1,76 @@
+import pytest
+import respx
+from httpx import AsyncClient, ASGITransport
+from prometheus_client import REGISTRY
+from app.main import app
+from app.services.coin_desk_api_service import quote_cache
+from test_finance_batch import TICK_URL, tick_handler
+from test_quote_cache import FakeClock
+
+ACTIVE_ENDPOINT = "/api/v1/finance/active/{active_name}"
+
+
+@pytest.mark.asyncio
+async def test_active_answers_304_while_ccseq_is_unchanged(monkeypatch):
+    """Test that a matching If-None-Match gets an empty 304 with the same validators"""
+    quote_cache.clear()
+    clock = FakeClock()
+    monkeypatch.setattr(quote_cache, "_clock", clock)
+    app.state.limiter.reset()
+    labels = {"method": "GET", "endpoint": ACTIVE_ENDPOINT, "status_code": "304"}
+    before = REGISTRY.get_sample_value("dummy_api_http_requests_total", labels) or 0
+
+    with respx.mock:
+        respx.get(TICK_URL).mock(side_effect=tick_handler())
+        async with app.router.lifespan_context(app), AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+            first = await client.get("/api/v1/finance/active/ETAG-USD")
+            clock.now += 3
+            second = await client.get("/api/v1/finance/active/ETAG-USD", headers={"If-None-Match": first.headers["ETag"]})
+            stale = await client.get("/api/v1/finance/active/ETAG-USD", headers={"If-None-Match": '"ETAG-USD-0"'})
+
+    assert first.status_code == 200
+    assert first.headers["ETag"] == '"ETAG-USD-1"'
+    assert first.headers["Cache-Control"] == "public, max-age=5"
+    assert second.status_code == 304
+    assert second.content == b""
+    assert second.headers["ETag"] == first.headers["ETag"]
+    assert second.headers["Cache-Control"] == "public, max-age=2"
+    assert stale.status_code == 200
+    assert REGISTRY.get_sample_value("dummy_api_http_requests_total", labels) == before + 1
+
+
+@pytest.mark.asyncio
+async def test_batch_etag_covers_every_instrument():
+    """Test that the batch ETag matches only the same set of instruments"""
+    quote_cache.clear()
+    app.state.limiter.reset()
+    with respx.mock:
+        respx.get(TICK_URL).mock(side_effect=tick_handler())
+        async with app.router.lifespan_context(app), AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+            first = await client.get("/api/v1/finance/actives", params={"names": "BTC-BRL,ETH-USD"})
+            etag = first.headers["ETag"]
+            same = await client.get("/api/v1/finance/actives", params={"names": "ETH-USD,BTC-BRL"}, headers={"If-None-Match": etag})
+            other = await client.get("/api/v1/finance/actives", params={"names": "BTC-BRL"}, headers={"If-None-Match": etag})
+
+    assert first.status_code == 200
+    assert same.status_code == 304
+    assert other.status_code == 200
+    assert other.headers["ETag"] != etag
+
+
+@pytest.mark.asyncio
+async def test_batch_max_age_is_the_shortest_remaining_ttl(monkeypatch):
+    """Test that the batch max-age never outlives the quote closest to expiring"""
+    quote_cache.clear()
+    app.state.limiter.reset()
+    clock = FakeClock()
+    monkeypatch.setattr(quote_cache, "_clock", clock)
+    with respx.mock:
+        respx.get(TICK_URL).mock(side_effect=tick_handler())
+        async with app.router.lifespan_context(app), AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+            await client.get("/api/v1/finance/actives", params={"names": "BTC-BRL"})
+            clock.now += 4
+            batch = await client.get("/api/v1/finance/actives", params={"names": "BTC-BRL,ETH-USD"})
+
+    assert batch.status_code == 200
+    assert batch.headers["Cache-Control"] == "public, max-age=1"
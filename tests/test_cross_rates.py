@@ -0,0 +1,135 @@
+import pytest
+import httpx
+import respx
+from app.schemas.coin_desk import BTCData
+from app.services.coin_desk_api_service import ExternalApiService, get_instrument_catalog, quote_cache
+from app.services.cross_rates import CrossRateEngine
+from app.services.quote_cache import AsyncTTLCache
+from test_finance_batch import TICK_URL, make_tick, tick_handler
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def quote(instrument: str, value: float) -> BTCData:
+    return BTCData(**{**make_tick(instrument), "VALUE": value})
+
+
+def make_engine(max_age: float = 5, max_hops: int = 3):
+    clock = FakeClock()
+    cache = AsyncTTLCache("cross_rate_test", ttl=5, max_size=100, max_staleness=10, clock=clock)
+    return cache, clock, CrossRateEngine(cache, max_age=max_age, max_hops=max_hops, clock=clock)
+
+
+def test_pair_is_derived_through_a_common_currency():
+    """Test that BTC-EUR is computed from BTC-USD and EUR-USD with the oldest quote as staleness"""
+    cache, clock, engine = make_engine()
+    cache.set("BTC-USD", quote("BTC-USD", 50000.0))
+    clock.now = 2
+    cache.set("EUR-USD", quote("EUR-USD", 1.25))
+    clock.now = 3
+
+    rate = engine.derive("BTC-EUR")
+
+    assert rate.value == pytest.approx(40000.0)
+    assert rate.derived is True
+    assert rate.path == ["BTC-USD", "EUR-USD"]
+    assert rate.staleness == pytest.approx(3)
+
+
+def test_direct_quote_is_not_marked_derived():
+    """Test that a pair held in the cache is answered as is"""
+    cache, clock, engine = make_engine()
+    cache.set("BTC-USD", quote("BTC-USD", 50000.0))
+
+    rate = engine.derive("BTC-USD")
+
+    assert rate.derived is False
+    assert rate.value == 50000.0
+
+
+def test_freshest_of_the_shortest_paths_wins():
+    """Test that among paths with the same number of hops the most recent one is used"""
+    cache, clock, engine = make_engine()
+    cache.set("BTC-USD", quote("BTC-USD", 50000.0))
+    cache.set("EUR-USD", quote("EUR-USD", 1.25))
+    clock.now = 3
+    cache.set("BTC-USDT", quote("BTC-USDT", 50100.0))
+    cache.set("EUR-USDT", quote("EUR-USDT", 1.26))
+    cache.set("BTC-GBP", quote("BTC-GBP", 39000.0))
+    cache.set("GBP-JPY", quote("GBP-JPY", 190.0))
+    cache.set("JPY-EUR", quote("JPY-EUR", 0.0061))
+
+    rate = engine.derive("BTC-EUR")
+
+    assert rate.path == ["BTC-USDT", "EUR-USDT"]
+    assert rate.staleness == 0
+
+
+def test_quotes_older_than_the_freshness_limit_are_ignored():
+    """Test that no rate is derived once a quote on the only path is too old"""
+    cache, clock, engine = make_engine(max_age=5)
+    cache.set("BTC-USD", quote("BTC-USD", 50000.0))
+    cache.set("EUR-USD", quote("EUR-USD", 1.25))
+    clock.now = 6
+
+    assert engine.derive("BTC-EUR") is None
+
+
+def test_derive_many_shares_one_traversal_per_base():
+    """Test that several pairs are answered together and unreachable ones are left out"""
+    cache, clock, engine = make_engine()
+    cache.set("BTC-USD", quote("BTC-USD", 50000.0))
+    cache.set("EUR-USD", quote("EUR-USD", 1.25))
+    cache.set("USD-BRL", quote("USD-BRL", 5.0))
+
+    rates = engine.derive_many(["BTC-EUR", "BTC-BRL", "EUR-BRL", "BTC-XYZ"])
+
+    assert set(rates) == {"BTC-EUR", "BTC-BRL", "EUR-BRL"}
+    assert rates["BTC-BRL"].value == pytest.approx(250000.0)
+    assert rates["EUR-BRL"].value == pytest.approx(6.25)
+
+
+@pytest.mark.asyncio
+async def test_service_falls_back_to_upstream_without_a_path():
+    """Test that a pair with no local path is fetched once and then served from the cache"""
+    quote_cache.clear()
+    get_instrument_catalog().clear()
+    with respx.mock:
+        route = respx.get(TICK_URL).mock(side_effect=tick_handler())
+        async with httpx.AsyncClient() as client:
+            service = ExternalApiService(client=client)
+            first = await service.get_cross_rate("SOL-CHF")
+            second = await service.get_cross_rate("CHF-SOL")
+
+    assert route.call_count == 1
+    assert first.derived is False and first.path == ["SOL-CHF"]
+    assert second.derived is True
+    assert second.value == pytest.approx(1 / first.value)
+
+
+@pytest.mark.asyncio
+async def test_batch_derives_known_pairs_and_fetches_the_rest_together():
+    """Test that derivable pairs are answered locally and the others share one upstream call"""
+    quote_cache.clear()
+    get_instrument_catalog().clear()
+    quote_cache.set("BTC-USD", quote("BTC-USD", 50000.0))
+    quote_cache.set("EUR-USD", quote("EUR-USD", 1.25))
+    with respx.mock:
+        route = respx.get(TICK_URL).mock(side_effect=tick_handler(unknown={"NOPE-XYZ"}))
+        async with httpx.AsyncClient() as client:
+            rates, errors = await ExternalApiService(client=client).get_cross_rates(
+                ["BTC-EUR", "SOL-CHF", "ETH-BRL", "NOPE-XYZ", "invalid"]
+            )
+
+    assert route.call_count == 1
+    assert set(route.calls[0].request.url.params["instruments"].split(",")) == {"SOL-CHF", "ETH-BRL", "NOPE-XYZ"}
+    assert rates["BTC-EUR"].derived is True
+    assert rates["BTC-EUR"].value == pytest.approx(40000.0)
+    assert rates["SOL-CHF"].derived is False and rates["ETH-BRL"].path == ["ETH-BRL"]
+    assert set(errors) == {"NOPE-XYZ", "invalid"}
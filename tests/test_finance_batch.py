@@ -0,0 +1,70 @@
+import pytest
+import httpx
+import respx
+from app.core.config import settings
+from app.services.coin_desk_api_service import ExternalApiService, quote_cache, _split_in_chunks
+
+TICK_URL = f"{settings.COIN_DESK_API}/index/cc/v1/latest/tick"
+
+
+def make_tick(instrument: str) -> dict:
+    return {
+        "TYPE": "952", "MARKET": "cadli", "INSTRUMENT": instrument, "CCSEQ": 1,
+        "VALUE": 100.0, "VALUE_FLAG": "UP", "VALUE_LAST_UPDATE_TS": 1700000000,
+        "VALUE_LAST_UPDATE_TS_NS": 0, "LAST_UPDATE_QUANTITY": 1.0,
+        "LAST_UPDATE_QUOTE_QUANTITY": 100.0, "LAST_UPDATE_VOLUME_TOP_TIER": 1.0,
+        "LAST_UPDATE_QUOTE_VOLUME_TOP_TIER": 100.0, "LAST_UPDATE_VOLUME_DIRECT": 1.0,
+        "LAST_UPDATE_QUOTE_VOLUME_DIRECT": 100.0, "LAST_UPDATE_VOLUME_TOP_TIER_DIRECT": 1.0,
+        "LAST_UPDATE_QUOTE_VOLUME_TOP_TIER_DIRECT": 100.0, "LAST_UPDATE_CCSEQ": 1,
+        "CURRENT_HOUR_VOLUME": 1.0, "CURRENT_HOUR_QUOTE_VOLUME": 100.0,
+        "CURRENT_HOUR_OPEN": 90.0, "CURRENT_HOUR_HIGH": 110.0, "CURRENT_HOUR_LOW": 80.0,
+        "CURRENT_HOUR_CHANGE": 10.0, "CURRENT_HOUR_CHANGE_PERCENTAGE": 11.1,
+    }
+
+
+def tick_handler(unknown=()):
+    def handler(request):
+        instruments = request.url.params["instruments"].split(",")
+        data = {name: make_tick(name) for name in instruments if name not in unknown}
+        return httpx.Response(200, json={"Data": data, "Err": {}})
+    return handler
+
+
+def test_split_in_chunks_uses_fewest_balanced_chunks():
+    """Test that names are split in the fewest chunks with balanced sizes"""
+    names = [f"A{i}-USD" for i in range(30)]
+    chunks = _split_in_chunks(names, 25)
+
+    assert [len(chunk) for chunk in chunks] == [15, 15]
+    assert sum(chunks, []) == names
+
+
+@pytest.mark.asyncio
+async def test_batch_reports_unknown_instruments_without_failing():
+    """Test that one unknown symbol is reported in the error map while the others succeed"""
+    quote_cache.clear()
+    with respx.mock:
+        route = respx.get(TICK_URL).mock(side_effect=tick_handler(unknown={"BAD-XYZ"}))
+        async with httpx.AsyncClient() as client:
+            service = ExternalApiService(client=client)
+            quotes, errors = await service.get_actives_by_names(["BTC-BRL", "ETH-USD", "BAD-XYZ"])
+
+    assert route.call_count == 1
+    assert set(quotes) == {"BTC-BRL", "ETH-USD"}
+    assert set(errors) == {"BAD-XYZ"}
+
+
+@pytest.mark.asyncio
+async def test_batch_serves_cached_instruments_without_upstream_call():
+    """Test that instruments already in the quote cache are not requested again"""
+    quote_cache.clear()
+    with respx.mock:
+        route = respx.get(TICK_URL).mock(side_effect=tick_handler())
+        async with httpx.AsyncClient() as client:
+            service = ExternalApiService(client=client)
+            await service.get_actives_by_names(["BTC-BRL", "ETH-USD"])
+            quotes, errors = await service.get_actives_by_names(["BTC-BRL", "ETH-USD"])
+
+    assert route.call_count == 1
+    assert set(quotes) == {"BTC-BRL", "ETH-USD"}
+    assert errors == {}
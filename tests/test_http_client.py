@@ -0,0 +1,42 @@
+import pytest
+import asyncio
+import httpx
+from httpx import AsyncClient, ASGITransport
+from app.core.http_client import PerHostLimitedTransport
+from app.main import app, lifespan
+from app.api.dependencies import get_http_client
+
+
+@pytest.mark.asyncio
+async def test_per_host_limit_caps_concurrent_requests():
+    """Test that no more than max_connections_per_host requests run at once for the same host"""
+    active = 0
+    peak = 0
+
+    async def handler(request):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.01)
+        active -= 1
+        return httpx.Response(200, json={"ok": True})
+
+    transport = PerHostLimitedTransport(httpx.MockTransport(handler), max_connections_per_host=2)
+    async with AsyncClient(transport=transport) as client:
+        responses = await asyncio.gather(*[client.get("http://upstream.test/") for _ in range(6)])
+
+    assert all(response.status_code == 200 for response in responses)
+    assert peak == 2
+    assert transport.in_flight == 0
+    assert transport.waiting_requests() == 0
+
+
+@pytest.mark.asyncio
+async def test_lifespan_shares_one_client():
+    """Test that the lifespan creates one client reused by every request"""
+    async with lifespan(app):
+        shared = app.state.http_client
+        request = type("FakeRequest", (), {"app": app})()
+        assert await get_http_client(request) is shared
+        assert await get_http_client(request) is shared
+    assert shared.is_closed
@@ -0,0 +1,151 @@
+import asyncio
+import pytest
+import httpx
+import respx
+from prometheus_client import REGISTRY
+from starlette.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+from app.core.exceptions import InstrumentNotFoundError
+from app.services.coin_desk_api_service import ExternalApiService, get_instrument_catalog, quote_cache
+from app.main import app
+from app.services.instrument_catalog import InstrumentCatalog
+from app.services.quote_stream import QuoteStreamHub
+from test_finance_batch import TICK_URL, tick_handler
+
+
+def rejections(reason: str) -> float:
+    return REGISTRY.get_sample_value("dummy_api_instrument_rejections_total", {"reason": reason}) or 0
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def catalog():
+    catalog = get_instrument_catalog()
+    catalog.clear()
+    yield catalog
+    catalog.clear()
+
+
+def test_invalid_format_is_rejected_locally():
+    """Test that malformed names are rejected and counted apart from upstream errors"""
+    catalog = InstrumentCatalog(negative_ttl=30, max_negative=10)
+    before = rejections("invalid_format")
+
+    with pytest.raises(InstrumentNotFoundError):
+        catalog.validate("BTCBRL")
+    catalog.validate("BTC-BRL")
+
+    assert rejections("invalid_format") == before + 1
+
+
+def test_loaded_catalog_rejects_unknown_instruments():
+    """Test that once loaded the catalog only accepts listed instruments"""
+    catalog = InstrumentCatalog(negative_ttl=30, max_negative=10)
+    catalog.validate("XYZ-BRL")
+
+    catalog.replace(["BTC-BRL", "BTC-USD", "ETH-USD"])
+    with pytest.raises(InstrumentNotFoundError):
+        catalog.validate("XYZ-BRL")
+    catalog.validate("ETH-USD")
+
+
+def test_negative_cache_expires_after_ttl():
+    """Test that an instrument reported as missing is rejected only until the TTL expires"""
+    clock = FakeClock()
+    catalog = InstrumentCatalog(negative_ttl=30, max_negative=10, clock=clock)
+    catalog.mark_not_found("BAD-XYZ")
+
+    with pytest.raises(InstrumentNotFoundError):
+        catalog.validate("BAD-XYZ")
+    clock.now = 31
+    catalog.validate("BAD-XYZ")
+
+
+def test_search_returns_prefix_matches_in_order():
+    """Test that the index is searched by prefix, case-insensitively and up to the limit"""
+    catalog = InstrumentCatalog(negative_ttl=30, max_negative=10)
+    catalog.replace(["ETH-USD", "BTC-USD", "BTC-BRL", "BTCB-USD", "ADA-USD"])
+
+    assert catalog.search("btc") == ["BTC-BRL", "BTC-USD", "BTCB-USD"]
+    assert catalog.search("BTC", limit=2) == ["BTC-BRL", "BTC-USD"]
+    assert catalog.search("DOGE") == []
+
+
+@pytest.mark.asyncio
+async def test_unknown_instrument_is_not_retried_and_negative_cached(catalog):
+    """Test that an upstream 404 costs a single call and repeated requests are answered locally"""
+    quote_cache.clear()
+    before = rejections("negative_cache")
+    with respx.mock:
+        route = respx.get(TICK_URL).mock(return_value=httpx.Response(404))
+        async with httpx.AsyncClient() as client:
+            service = ExternalApiService(client=client)
+            for _ in range(3):
+                with pytest.raises(InstrumentNotFoundError):
+                    await service.get_active_by_name("GONE-USD")
+
+    assert route.call_count == 1
+    assert rejections("negative_cache") == before + 2
+
+
+@pytest.mark.asyncio
+async def test_batch_rejects_unknown_names_before_upstream(catalog):
+    """Test that names missing from the catalog never reach the external service"""
+    quote_cache.clear()
+    catalog.replace(["BTC-BRL", "ETH-USD"])
+    with respx.mock:
+        route = respx.get(TICK_URL).mock(side_effect=tick_handler())
+        async with httpx.AsyncClient() as client:
+            service = ExternalApiService(client=client)
+            quotes, errors = await service.get_actives_by_names(["BTC-BRL", "NOPE-USD"])
+
+    assert route.call_count == 1
+    assert route.calls[0].request.url.params["instruments"] == "BTC-BRL"
+    assert set(quotes) == {"BTC-BRL"}
+    assert set(errors) == {"NOPE-USD"}
+
+
+def test_stream_endpoints_reject_invalid_names_before_subscribing(catalog):
+    """Test that SSE and WebSocket subscriptions validate names before any poller starts"""
+    with respx.mock(assert_all_called=False) as mock:
+        route = mock.get(TICK_URL).mock(side_effect=tick_handler())
+        with TestClient(app) as client:
+            response = client.get("/api/v1/finance/stream/sse", params={"names": "BTC-BRL&market=evil"})
+            with pytest.raises(WebSocketDisconnect) as refused:
+                with client.websocket_connect("/api/v1/finance/stream/ws?names=BTC-BRL%26market%3Devil,NOPE"):
+                    pass
+            pollers = dict(app.state.quote_stream_hub._pollers)
+
+    assert response.status_code == 400
+    assert refused.value.code == 1008
+    assert pollers == {}
+    assert route.call_count == 0
+
+
+@pytest.mark.asyncio
+async def test_stream_poller_stops_on_unknown_instrument(catalog):
+    """Test that a streamed instrument unknown upstream is negative-cached and no longer polled"""
+    quote_cache.clear()
+    with respx.mock:
+        route = respx.get(TICK_URL).mock(return_value=httpx.Response(404))
+        async with httpx.AsyncClient() as client:
+            hub = QuoteStreamHub(ExternalApiService(client=client), poll_interval=0.01, queue_size=4)
+            subscription = hub.subscribe(["GHOST-USD"], transport="test")
+            for _ in range(50):
+                if not hub._pollers:
+                    break
+                await asyncio.sleep(0.01)
+            hub.unsubscribe(subscription)
+            await hub.close()
+
+    assert hub._pollers == {}
+    assert route.call_count == 1
+    with pytest.raises(InstrumentNotFoundError):
+        get_instrument_catalog().validate("GHOST-USD")
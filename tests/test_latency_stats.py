@@ -0,0 +1,102 @@
+import random
+import pytest
+from httpx import AsyncClient, ASGITransport
+from app.core.latency_stats import UPSTREAM, DDSketch, LatencyStats, SlidingWindowSketch, get_latency_stats
+from app.main import app
+from app.services.coin_desk_api_service import TICK_ENDPOINT, create_coin_desk_provider
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_sketch_quantiles_stay_within_relative_accuracy():
+    """Test that tail quantiles are accurate and memory stays bounded"""
+    rng = random.Random(7)
+    values = [rng.lognormvariate(-3, 1.5) for _ in range(50000)]
+    sketch = DDSketch(relative_accuracy=0.01, max_bins=1024)
+    for value in values:
+        sketch.add(value)
+
+    values.sort()
+    for q in (0.5, 0.9, 0.99, 0.999):
+        exact = values[int(q * (len(values) - 1))]
+        assert sketch.quantile(q) == pytest.approx(exact, rel=0.011)
+    assert sketch.quantile(1) == values[-1]
+
+    bounded = DDSketch(relative_accuracy=0.01, max_bins=64)
+    for value in values:
+        bounded.add(value)
+    assert len(bounded.bins) <= 64
+    assert bounded.quantile(0.999) == pytest.approx(sketch.quantile(0.999))
+
+
+def test_merged_sketches_match_sketch_of_union():
+    """Test that merging per-slice sketches gives the same quantiles as one sketch"""
+    rng = random.Random(3)
+    union, left, right = DDSketch(), DDSketch(), DDSketch()
+    for index in range(2000):
+        value = rng.expovariate(10)
+        union.add(value)
+        (left if index % 2 else right).add(value)
+
+    left.merge(right)
+    assert left.count == union.count
+    assert left.quantiles([0.5, 0.99]) == union.quantiles([0.5, 0.99])
+
+
+def test_sliding_window_drops_old_slices():
+    """Test that observations older than the window stop affecting the quantiles"""
+    clock = FakeClock()
+    window = SlidingWindowSketch(window=60, slices=6, relative_accuracy=0.01, max_bins=1024, clock=clock)
+    for _ in range(100):
+        window.add(1.0)
+    clock.now = 30
+    for _ in range(100):
+        window.add(0.01)
+    assert window.quantile(0.99) == pytest.approx(1.0, rel=0.01)
+
+    clock.now = 65
+    assert window.merged().count == 100
+    assert window.quantile(0.99) == pytest.approx(0.01, rel=0.01)
+    clock.now = 200
+    assert window.quantile(0.5) is None
+
+
+def test_series_beyond_limit_are_grouped():
+    """Test that the number of series per kind is bounded"""
+    stats = LatencyStats(window=60, slices=6, relative_accuracy=0.01, max_bins=128, max_series=2, slo_target=0.5)
+    for name in ("a", "b", "c", "d"):
+        stats.record(UPSTREAM, name, 0.1)
+
+    assert sorted(stats.snapshot()[UPSTREAM]) == ["a", "b", "other"]
+    assert stats.snapshot()[UPSTREAM]["other"]["count"] == 2
+
+
+@pytest.mark.asyncio
+async def test_stats_endpoint_reports_route_percentiles():
+    """Test that /internal/stats exposes per-route percentiles and the SLO fraction"""
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        for _ in range(5):
+            await client.get("/")
+        response = await client.get("/internal/stats")
+
+    assert response.status_code == 200
+    route = response.json()["routes"]["GET /"]
+    assert route["count"] >= 5
+    assert route["within_slo"] == 1.0
+    assert 0 < route["p50"] <= route["p99"] <= route["p999"] <= route["max"]
+
+
+def test_hedge_delay_uses_upstream_sketch():
+    """Test that the hedge delay follows the sliding-window percentile of the tick endpoint"""
+    provider = create_coin_desk_provider("hedge_sketch_test", "http://hedge.test")
+    assert provider.retry_policy.hedge_delay_source() is None
+
+    for index in range(100):
+        get_latency_stats().record(UPSTREAM, f"hedge_sketch_test {TICK_ENDPOINT}", 0.1 if index < 90 else 1.0)
+    assert provider.retry_policy.hedge_delay_source() == pytest.approx(1.0, rel=0.01)
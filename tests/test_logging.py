@@ -0,0 +1,53 @@
+import json
+import logging
+import queue
+from prometheus_client import REGISTRY
+from app.core.logging import BoundedQueueHandler, JsonFormatter, SamplingFilter, parse_sampling_rates
+
+
+def make_record(level=logging.INFO, name="api", msg="mensagem %s", args=("x",)):
+    return logging.LogRecord(name, level, __file__, 1, msg, args, None)
+
+
+def dropped(reason):
+    return REGISTRY.get_sample_value("dummy_api_log_records_dropped_total", {"reason": reason}) or 0.0
+
+
+def test_sampling_keeps_one_in_n_and_all_warnings():
+    """Test that sampled loggers keep 1 in N records while warnings always pass"""
+    sampling = SamplingFilter(parse_sampling_rates("api.health=10, api.other = 2"))
+    before = dropped("sampled")
+
+    kept = sum(sampling.filter(make_record(name="api.health")) for _ in range(100))
+
+    assert kept == 10
+    assert dropped("sampled") - before == 90
+    assert sampling.filter(make_record(name="api.health", level=logging.WARNING))
+    assert sampling.filter(make_record(name="api"))
+
+
+def test_full_buffer_drops_info_and_evicts_oldest_for_warnings():
+    """Test the drop policy of the bounded log buffer"""
+    handler = BoundedQueueHandler(queue.Queue(maxsize=2))
+    first, second = make_record(msg="primeiro"), make_record(msg="segundo")
+    handler.handle(first)
+    handler.handle(second)
+
+    handler.handle(make_record(msg="descartado"))
+    warning = make_record(level=logging.WARNING, msg="aviso")
+    handler.handle(warning)
+
+    assert [handler.queue.get_nowait(), handler.queue.get_nowait()] == [second, warning]
+
+
+def test_message_is_formatted_by_the_writer():
+    """Test that enqueued records keep their args unformatted and render as JSON"""
+    handler = BoundedQueueHandler(queue.Queue())
+    handler.handle(make_record(args=("BTC-BRL",)))
+
+    record = handler.queue.get_nowait()
+    assert record.msg == "mensagem %s" and record.args == ("BTC-BRL",)
+
+    payload = json.loads(JsonFormatter().format(record))
+    assert payload["message"] == "mensagem BTC-BRL"
+    assert payload["level"] == "INFO" and payload["logger"] == "api"
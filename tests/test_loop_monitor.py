@@ -0,0 +1,36 @@
+import asyncio
+import time
+import pytest
+from prometheus_client import REGISTRY
+from app.core import loop_monitor
+from app.core.loop_monitor import EventLoopMonitor
+
+
+def block_event_loop(seconds: float):
+    time.sleep(seconds)
+
+
+@pytest.mark.asyncio
+async def test_lag_is_observed_and_stall_is_logged_with_stack(monkeypatch):
+    """Test that blocking the loop is measured as lag and logged with the blocking stack"""
+    warnings = []
+    monkeypatch.setattr(loop_monitor.logger, "warning", lambda message, *args: warnings.append(message % args))
+    lag_before = REGISTRY.get_sample_value("dummy_api_event_loop_lag_seconds_count") or 0
+    slow_lag_before = REGISTRY.get_sample_value("dummy_api_event_loop_lag_seconds_bucket", {"le": "0.1"}) or 0
+    stalls_before = REGISTRY.get_sample_value("dummy_api_event_loop_stalls_total") or 0
+
+    monitor = EventLoopMonitor(interval=0.01, slow_threshold=0.05)
+    monitor.start()
+    await asyncio.sleep(0.05)
+    block_event_loop(0.3)
+    await asyncio.sleep(0.05)
+    await monitor.stop()
+
+    lag_count = REGISTRY.get_sample_value("dummy_api_event_loop_lag_seconds_count")
+    assert lag_count > lag_before + 2
+    # A medição do bloqueio fica acima de 0.1s
+    assert REGISTRY.get_sample_value("dummy_api_event_loop_lag_seconds_bucket", {"le": "0.1"}) - slow_lag_before < lag_count - lag_before
+    assert REGISTRY.get_sample_value("dummy_api_event_loop_stalls_total") == stalls_before + 1
+    assert len(warnings) == 1
+    assert "block_event_loop" in warnings[0]
+    assert "test_lag_is_observed_and_stall_is_logged_with_stack" in warnings[0]
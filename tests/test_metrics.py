@@ -9,4 +9,87 @@ async def test_metrics_exposure():
         metrics_response = await ac.get("/metrics")
     assert metrics_response.status_code == 200
     assert b"http_requests_total" in metrics_response.content
-    assert b"/" in metrics_response.content or b"/metrics" in metrics_response.content
\ No newline at end of file
+    assert b"/" in metrics_response.content or b"/metrics" in metrics_response.content
+@pytest.mark.asyncio
+async def test_request_metrics_use_route_template():
+    from prometheus_client import REGISTRY
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        await ac.get("/api/v1/finance/actives")
+        await ac.get("/some/unknown/path-123")
+
+    labels = {"method": "GET", "endpoint": "/api/v1/finance/actives", "status_code": "422"}
+    assert REGISTRY.get_sample_value("dummy_api_http_requests_total", labels) >= 1
+    labels = {"method": "GET", "endpoint": "other", "status_code": "404"}
+    assert REGISTRY.get_sample_value("dummy_api_http_requests_total", labels) >= 1
+    labels = {"method": "GET", "endpoint": "/some/unknown/path-123", "status_code": "404"}
+    assert REGISTRY.get_sample_value("dummy_api_http_requests_total", labels) is None
+
+
+def test_metrics_aggregate_across_worker_processes(tmp_path):
+    """Test that /metrics sums counters and takes the worst breaker state over all workers"""
+    import os
+    import subprocess
+    import sys
+
+    env = dict(os.environ, PROMETHEUS_MULTIPROC_DIR=str(tmp_path), PYTHONPATH=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    worker = (
+        "import sys\n"
+        "from app.core.metrics import CIRCUIT_BREAKER_STATE, EXTERNAL_SERVICE_REQUESTS\n"
+        "EXTERNAL_SERVICE_REQUESTS.labels(service_name='coin_desk_api', endpoint='/tick', method='GET').inc(int(sys.argv[1]))\n"
+        "CIRCUIT_BREAKER_STATE.labels(service_name='coin_desk_api').set(int(sys.argv[2]))\n"
+    )
+    for requests, state in ((3, 0), (4, 1)):
+        subprocess.run([sys.executable, "-c", worker, str(requests), str(state)], env=env, check=True)
+
+    scraper = (
+        "from app.core.metrics import render_metrics\n"
+        "print(render_metrics()[0].decode())\n"
+    )
+    output = subprocess.run([sys.executable, "-c", scraper], env=env, check=True, capture_output=True, text=True).stdout
+
+    assert 'dummy_api_external_service_requests_total{endpoint="/tick",method="GET",service_name="coin_desk_api"} 7.0' in output
+    assert 'dummy_api_circuit_breaker_state{service_name="coin_desk_api"} 1.0' in output
+
+
+def test_pool_and_limiter_gauges_are_exported_in_multiprocess_mode(tmp_path):
+    """Test that connection pool and concurrency limiter gauges export their current values across workers"""
+    import os
+    import subprocess
+    import sys
+
+    env = dict(os.environ, PROMETHEUS_MULTIPROC_DIR=str(tmp_path), PYTHONPATH=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    worker = (
+        "import asyncio, httpx\n"
+        "from app.core.http_client import PerHostLimitedTransport, register_pool_metrics\n"
+        "from app.core.metrics import render_metrics\n"
+        "from app.services.concurrency_limiter import AdaptiveConcurrencyLimiter\n"
+        "async def main():\n"
+        "    gate = asyncio.Event()\n"
+        "    async def handler(request):\n"
+        "        await gate.wait()\n"
+        "        return httpx.Response(200)\n"
+        "    transport = PerHostLimitedTransport(httpx.MockTransport(handler), max_connections_per_host=1)\n"
+        "    register_pool_metrics(transport, 'multiprocess')\n"
+        "    limiter = AdaptiveConcurrencyLimiter('multiprocess', initial_limit=2, max_limit=2)\n"
+        "    async with httpx.AsyncClient(transport=transport) as client:\n"
+        "        calls = [asyncio.create_task(limiter.execute(lambda: client.get('http://upstream.test/'))) for _ in range(3)]\n"
+        "        await asyncio.sleep(0.05)\n"
+        "        print(render_metrics()[0].decode())\n"
+        "        gate.set()\n"
+        "        await asyncio.gather(*calls)\n"
+        "    print('---')\n"
+        "    print(render_metrics()[0].decode())\n"
+        "asyncio.run(main())\n"
+    )
+    output = subprocess.run([sys.executable, "-c", worker], env=env, check=True, capture_output=True, text=True).stdout
+    busy, idle = output.split("---")
+
+    assert 'dummy_api_concurrency_in_flight{limiter_name="multiprocess"} 2.0' in busy
+    assert 'dummy_api_concurrency_queue_depth{limiter_name="multiprocess"} 1.0' in busy
+    assert 'dummy_api_external_service_pool_in_use_connections{pool_name="multiprocess"} 1.0' in busy
+    assert 'dummy_api_external_service_pool_waiting_requests{pool_name="multiprocess"} 1.0' in busy
+    assert 'dummy_api_concurrency_in_flight{limiter_name="multiprocess"} 0.0' in idle
+    assert 'dummy_api_concurrency_queue_depth{limiter_name="multiprocess"} 0.0' in idle
+    assert 'dummy_api_external_service_pool_in_use_connections{pool_name="multiprocess"} 0.0' in idle
+    assert 'dummy_api_external_service_pool_waiting_requests{pool_name="multiprocess"} 0.0' in idle
@@ -0,0 +1,124 @@
+import asyncio
+import pytest
+import httpx
+import respx
+from prometheus_client import REGISTRY
+from app.core.exceptions import DeadlineExceededError, InstrumentNotFoundError
+from app.services.coin_desk_api_service import ExternalApiService, get_instrument_catalog, quote_cache
+from app.services.micro_batcher import MicroBatcher
+from app.services.retry_policy import Deadline
+from app.services.quote_providers import ProviderRegistry
+from test_finance_batch import TICK_URL, tick_handler
+from test_quote_providers import FakeProvider
+
+
+class RejectingProvider(FakeProvider):
+    """Provedor que responde todo lote com mais de um ativo com o status dado"""
+
+    def __init__(self, name, status_code):
+        super().__init__(name)
+        self.status_code = status_code
+
+    async def _fetch_ticks(self, client, actives, deadline, priority):
+        if len(actives) == 1:
+            return await super()._fetch_ticks(client, actives, deadline, priority)
+        self.calls += 1
+        request = httpx.Request("GET", TICK_URL)
+        response = httpx.Response(self.status_code, request=request)
+        raise httpx.HTTPStatusError(f"{self.status_code}", request=request, response=response)
+
+
+def flushes(reason: str) -> float:
+    return REGISTRY.get_sample_value("dummy_api_micro_batch_flushes_total", {"reason": reason}) or 0
+
+
+@pytest.mark.asyncio
+async def test_concurrent_lookups_share_one_upstream_call():
+    """Test that distinct instruments requested together are fetched in a single call"""
+    quote_cache.clear()
+    get_instrument_catalog().clear()
+    names = ["MB1-USD", "MB2-USD", "MB3-USD", "MISSING-USD"]
+    with respx.mock:
+        route = respx.get(TICK_URL).mock(side_effect=tick_handler(unknown={"MISSING-USD"}))
+        async with httpx.AsyncClient() as client:
+            service = ExternalApiService(client=client)
+            outcomes = await asyncio.gather(*[service.get_active_by_name(name) for name in names], return_exceptions=True)
+
+    get_instrument_catalog().clear()
+    assert route.call_count == 1
+    assert set(route.calls[0].request.url.params["instruments"].split(",")) == set(names)
+    assert [quote.instrument for quote in outcomes[:3]] == names[:3]
+    assert isinstance(outcomes[3], InstrumentNotFoundError)
+
+
+@pytest.mark.asyncio
+async def test_full_batch_is_sent_before_the_window_ends():
+    """Test that reaching the maximum size flushes immediately and the rest waits for the window"""
+    calls = []
+
+    async def fetch(actives, deadline):
+        calls.append(list(actives))
+        return {active: active.lower() for active in actives}, {}
+
+    batcher = MicroBatcher(window=0.05, max_batch_size=2)
+    before_size, before_window = flushes("size"), flushes("window")
+
+    results = await asyncio.gather(*[batcher.load("key", name, None, fetch) for name in ["A-USD", "B-USD", "C-USD", "A-USD"]])
+
+    assert results == ["a-usd", "b-usd", "c-usd", "a-usd"]
+    assert calls == [["A-USD", "B-USD"], ["C-USD", "A-USD"]]
+    assert flushes("size") == before_size + 2
+    assert flushes("window") == before_window
+
+
+@pytest.mark.asyncio
+async def test_caller_deadline_is_kept_inside_a_batch():
+    """Test that a caller with a short deadline gives up while the batch still serves the others"""
+    async def fetch(actives, deadline):
+        await asyncio.sleep(0.05)
+        return {active: active for active in actives}, {}
+
+    batcher = MicroBatcher(window=0.001, max_batch_size=10)
+    short = batcher.load("key", "A-USD", Deadline.after(0.01), fetch)
+    long = batcher.load("key", "B-USD", Deadline.after(1.0), fetch)
+    outcomes = await asyncio.gather(short, long, return_exceptions=True)
+
+    assert isinstance(outcomes[0], DeadlineExceededError)
+    assert outcomes[1] == "B-USD"
+
+
+@pytest.mark.asyncio
+async def test_only_request_rejections_split_a_batch():
+    """Test that a 400 batch is retried per instrument while a 503 batch fails every waiter without fanning out"""
+    quote_cache.clear()
+    get_instrument_catalog().clear()
+    names = ["SPLIT1-USD", "SPLIT2-USD", "SPLIT3-USD"]
+    outcomes = {}
+    providers = {}
+    for status_code in (400, 503):
+        provider = RejectingProvider(f"rejecting_{status_code}", status_code)
+        service = ExternalApiService(client=None, registry=ProviderRegistry([provider]))
+        outcomes[status_code] = await asyncio.gather(*[service.get_active_by_name(name) for name in names], return_exceptions=True)
+        providers[status_code] = provider
+        quote_cache.clear()
+
+    assert providers[400].calls == 1 + len(names)
+    assert [quote.instrument for quote in outcomes[400]] == names
+    assert providers[503].calls == 1
+    assert all(isinstance(outcome, httpx.HTTPStatusError) for outcome in outcomes[503])
+
+
+@pytest.mark.asyncio
+async def test_failed_chunk_is_reported_without_per_instrument_fetches():
+    """Test that a /finance/actives chunk failing with 503 reports the error for every instrument without splitting"""
+    quote_cache.clear()
+    get_instrument_catalog().clear()
+    provider = RejectingProvider("rejecting_chunk", 503)
+    service = ExternalApiService(client=None, registry=ProviderRegistry([provider]))
+
+    quotes, errors = await service.get_actives_by_names(["CHUNK1-USD", "CHUNK2-USD", "CHUNK3-USD"])
+
+    assert provider.calls == 1
+    assert quotes == {}
+    assert set(errors) == {"CHUNK1-USD", "CHUNK2-USD", "CHUNK3-USD"}
+    assert len(set(errors.values())) == 1
@@ -0,0 +1,120 @@
+import pytest
+import asyncio
+from app.services.prefetch_scheduler import InstrumentPopularity, PrefetchScheduler
+from app.services.quote_cache import AsyncTTLCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeRegistry:
+    def __init__(self, closed=True):
+        self.closed = closed
+
+    async def can_execute(self):
+        return self.closed
+
+
+class FakeService:
+    def __init__(self, cache):
+        self.cache = cache
+        self.refreshed = []
+
+    def refresh_active(self, active):
+        self.refreshed.append(active)
+
+        async def loader():
+            return f"{active}-refreshed"
+
+        return self.cache.refresh(active, loader)
+
+
+def make_scheduler(cache, registry, popularity):
+    return PrefetchScheduler(
+        service=FakeService(cache),
+        cache=cache,
+        registry=registry,
+        popularity=popularity,
+        top_n=1,
+        interval=1,
+        refresh_ahead=1.5,
+        decay=0.9
+    )
+
+
+def test_popularity_ranks_and_decays():
+    """Test that the most requested instruments rank first and idle ones fade out"""
+    popularity = InstrumentPopularity(min_score=0.5)
+    for _ in range(3):
+        popularity.record("BTC-BRL")
+    popularity.record("ETH-USD")
+
+    assert popularity.top(2) == ["BTC-BRL", "ETH-USD"]
+
+    popularity.decay(0.4)
+    assert popularity.top(2) == ["BTC-BRL"]
+
+
+@pytest.mark.asyncio
+async def test_refreshes_hot_instrument_close_to_expiry():
+    """Test that only the top-N instrument about to expire is refreshed"""
+    clock = FakeClock()
+    cache = AsyncTTLCache("test_prefetch", ttl=5, max_size=10, clock=clock)
+    cache.set("BTC-BRL", "old")
+    cache.set("ETH-USD", "old")
+    popularity = InstrumentPopularity()
+    popularity.record("BTC-BRL")
+    popularity.record("BTC-BRL")
+    popularity.record("ETH-USD")
+    scheduler = make_scheduler(cache, FakeRegistry(), popularity)
+
+    assert await scheduler.run_once() == []
+
+    clock.now = 4
+    assert await scheduler.run_once() == ["BTC-BRL"]
+    await asyncio.sleep(0)
+    assert cache.get("BTC-BRL") == "BTC-BRL-refreshed"
+
+
+@pytest.mark.asyncio
+async def test_open_breaker_pauses_prefetch():
+    """Test that nothing is refreshed while the circuit breaker is open"""
+    clock = FakeClock()
+    cache = AsyncTTLCache("test_prefetch_open", ttl=5, max_size=10, clock=clock)
+    cache.set("BTC-BRL", "old")
+    popularity = InstrumentPopularity()
+    popularity.record("BTC-BRL")
+    scheduler = make_scheduler(cache, FakeRegistry(closed=False), popularity)
+
+    clock.now = 4
+    assert await scheduler.run_once() == []
+    assert scheduler.service.refreshed == []
+
+
+@pytest.mark.asyncio
+async def test_failed_refresh_is_logged_once(caplog):
+    """Test that a failed prefetch is reported by the scheduler only, not again by the cache"""
+    clock = FakeClock()
+    cache = AsyncTTLCache("test_prefetch_failure", ttl=5, max_size=10, clock=clock)
+    cache.set("BTC-BRL", "old")
+    popularity = InstrumentPopularity()
+    popularity.record("BTC-BRL")
+    scheduler = make_scheduler(cache, FakeRegistry(), popularity)
+
+    async def failing_loader():
+        raise RuntimeError("upstream down")
+
+    scheduler.service.refresh_active = lambda active: cache.refresh(active, failing_loader)
+    clock.now = 4
+    with caplog.at_level("WARNING", logger="api"):
+        assert await scheduler.run_once() == ["BTC-BRL"]
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+
+    assert [record.getMessage() for record in caplog.records] == ["Falha no prefetch de BTC-BRL: upstream down"]
+    assert cache.get("BTC-BRL") == "old"
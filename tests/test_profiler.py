@@ -0,0 +1,49 @@
+import asyncio
+import time
+import pytest
+from httpx import AsyncClient, ASGITransport
+from app.core import config
+from app.core.config import Settings
+from app.main import create_app
+
+
+@pytest.fixture
+def restore_settings():
+    previous = config._settings
+    yield
+    config._settings = previous
+
+
+def busy_handler(seconds: float):
+    stop_at = time.perf_counter() + seconds
+    while time.perf_counter() < stop_at:
+        pass
+
+
+def make_app(**overrides):
+    return create_app(Settings(COIN_DESK_API="http://coindesk.test", GENDERIZE_API="http://genderize.test", **overrides))
+
+
+@pytest.mark.asyncio
+async def test_profile_endpoint_is_disabled_by_default(restore_settings):
+    """Test that /debug/profile does not exist without a token"""
+    async with AsyncClient(transport=ASGITransport(app=make_app()), base_url="http://test") as client:
+        response = await client.get("/debug/profile", params={"seconds": 0.1})
+    assert response.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_profile_endpoint_requires_token_and_returns_collapsed_stacks(restore_settings):
+    """Test that the profiler samples the event loop and returns flamegraph collapsed stacks"""
+    app = make_app(DEBUG_PROFILE_TOKEN="secret", DEBUG_PROFILE_SAMPLE_INTERVAL=0.001)
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        unauthorized = await client.get("/debug/profile", params={"seconds": 0.1}, headers={"Authorization": "Bearer wrong"})
+        asyncio.get_running_loop().call_later(0.05, busy_handler, 0.1)
+        response = await client.get("/debug/profile", params={"seconds": 0.3}, headers={"Authorization": "Bearer secret"})
+
+    assert unauthorized.status_code == 401
+    assert response.status_code == 200
+    lines = response.text.splitlines()
+    assert int(lines[0].rsplit(" ", 1)[1]) > 0
+    leaves = [stack.split(";")[-1] for stack, _ in (line.rsplit(" ", 1) for line in lines)]
+    assert any(leaf.startswith("busy_handler (") for leaf in leaves)
@@ -0,0 +1,109 @@
+import pytest
+import asyncio
+from app.services.quote_cache import AsyncTTLCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_are_coalesced():
+    """Test that concurrent misses for the same key trigger a single load"""
+    cache = AsyncTTLCache("test_coalesce", ttl=5, max_size=10)
+    calls = 0
+
+    async def loader():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return "quote"
+
+    results = await asyncio.gather(*[cache.get_or_load("BTC-BRL", loader) for _ in range(50)])
+
+    assert results == ["quote"] * 50
+    assert calls == 1
+
+
+@pytest.mark.asyncio
+async def test_entries_expire_after_ttl():
+    """Test that an entry is reloaded once its TTL has passed"""
+    clock = FakeClock()
+    cache = AsyncTTLCache("test_ttl", ttl=5, max_size=10, clock=clock)
+    values = iter(["first", "second"])
+
+    async def loader():
+        return next(values)
+
+    assert await cache.get_or_load("BTC-BRL", loader) == "first"
+    clock.now = 4.9
+    assert await cache.get_or_load("BTC-BRL", loader) == "first"
+    clock.now = 5.0
+    assert await cache.get_or_load("BTC-BRL", loader) == "second"
+
+
+def test_least_recently_used_entry_is_evicted():
+    """Test that the least recently used key is dropped when the cache is full"""
+    cache = AsyncTTLCache("test_lru", ttl=5, max_size=2)
+    cache.set("A", 1)
+    cache.set("B", 2)
+    cache.get("A")
+    cache.set("C", 3)
+
+    assert "A" in cache
+    assert "B" not in cache
+    assert "C" in cache
+
+
+@pytest.mark.asyncio
+async def test_failures_are_not_cached():
+    """Test that a loader error propagates to every waiter and is not stored"""
+    cache = AsyncTTLCache("test_errors", ttl=5, max_size=10)
+
+    async def failing_loader():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("upstream down")
+
+    results = await asyncio.gather(
+        *[cache.get_or_load("BTC-BRL", failing_loader) for _ in range(3)],
+        return_exceptions=True
+    )
+
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert len(cache) == 0
+
+
+@pytest.mark.asyncio
+async def test_stale_value_is_served_while_refreshing():
+    """Test that an expired entry within max_staleness is returned immediately and refreshed"""
+    clock = FakeClock()
+    cache = AsyncTTLCache("test_stale", ttl=5, max_size=10, max_staleness=10, clock=clock)
+    values = iter(["first", "second"])
+
+    async def loader():
+        return next(values)
+
+    assert await cache.get_or_load("BTC-BRL", loader) == "first"
+    clock.now = 6
+    assert await cache.get_or_load("BTC-BRL", loader) == "first"
+    await asyncio.sleep(0)
+    assert cache.get("BTC-BRL") == "second"
+
+
+@pytest.mark.asyncio
+async def test_value_past_max_staleness_is_reloaded():
+    """Test that callers wait for a fresh value once max_staleness has passed"""
+    clock = FakeClock()
+    cache = AsyncTTLCache("test_too_stale", ttl=5, max_size=10, max_staleness=10, clock=clock)
+    values = iter(["first", "second"])
+
+    async def loader():
+        return next(values)
+
+    await cache.get_or_load("BTC-BRL", loader)
+    clock.now = 15
+    assert await cache.get_or_load("BTC-BRL", loader) == "second"
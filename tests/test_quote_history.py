@@ -0,0 +1,95 @@
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.schemas.coin_desk import BTCData
+from app.services.coin_desk_api_service import quote_history
+from app.services.quote_history import InstrumentHistory, QuoteHistory
+from test_finance_batch import make_tick
+
+
+def make_quote(instrument, ts, value, quantity=1.0, ccseq=None):
+    tick = make_tick(instrument)
+    tick.update(VALUE_LAST_UPDATE_TS=ts, VALUE=value, LAST_UPDATE_QUANTITY=quantity, CCSEQ=ccseq or ts)
+    return BTCData(**tick)
+
+
+def test_ring_buffer_is_bounded_and_skips_repeated_ticks():
+    """Test that the buffer keeps only the newest points and ignores duplicated CCSEQ"""
+    history = InstrumentHistory(capacity=3)
+    for ts in range(5):
+        history.append(ts, float(ts), 1.0, ts)
+    assert history.append(4, 4.0, 1.0, 4) is False
+
+    timestamps, values, _, _ = history.columns()
+    assert list(timestamps) == [2, 3, 4]
+    assert list(values) == [2.0, 3.0, 4.0]
+
+
+def test_aggregate_computes_ohlc_and_vwap_per_interval():
+    """Test OHLC/VWAP candles over the requested window"""
+    history = QuoteHistory(max_points=100, max_instruments=10)
+    for ts, value, quantity in [(0, 10, 1), (30, 14, 3), (59, 12, 1), (60, 20, 2), (90, 18, 2)]:
+        history.record(make_quote("BTC-BRL", ts, value, quantity))
+
+    candles = history.aggregate("BTC-BRL", interval=60, window=3600)
+
+    assert [c["start"] for c in candles] == [0, 60]
+    assert candles[0] | {"vwap": round(candles[0]["vwap"], 2)} == {
+        "start": 0, "open": 10, "high": 14, "low": 10, "close": 12,
+        "volume": 5.0, "ticks": 3, "vwap": 12.8,
+    }
+    assert candles[1]["vwap"] == 19.0
+    assert len(history.aggregate("BTC-BRL", interval=60, window=30)) == 1
+
+
+def test_aggregate_on_wrapped_buffer_with_gaps():
+    """Test that candles are built from the retained ticks in order after the ring buffer wraps"""
+    history = InstrumentHistory(capacity=6)
+    for ts, value in [(1, 1.0), (2, 2.0), (10, 5.0), (11, 3.0), (12, 4.0), (40, 9.0), (41, 7.0), (95, 8.0)]:
+        history.append(ts, value, 1.0, ts)
+
+    candles = history.aggregate(interval=10, since=0)
+
+    assert [(c["start"], c["open"], c["high"], c["low"], c["close"], c["ticks"]) for c in candles] == [
+        (10, 5.0, 5.0, 3.0, 4.0, 3), (40, 9.0, 9.0, 7.0, 7.0, 2), (90, 8.0, 8.0, 8.0, 8.0, 1)
+    ]
+    assert candles[0]["vwap"] == pytest.approx(4.0)
+
+
+def test_least_recently_used_instruments_are_evicted():
+    """Test that memory stays bounded by max_instruments"""
+    history = QuoteHistory(max_points=10, max_instruments=2)
+    for instrument in ["A-USD", "B-USD", "C-USD"]:
+        history.record(make_quote(instrument, 1, 1.0))
+
+    assert len(history) == 2
+    assert history.get("A-USD") is None
+
+
+def test_snapshot_round_trip(tmp_path):
+    """Test that history saved to a memory-mapped snapshot is restored"""
+    path = str(tmp_path / "history.bin")
+    history = QuoteHistory(max_points=10, max_instruments=10)
+    for ts in range(3):
+        history.record(make_quote("BTC-BRL", ts, 100.0 + ts))
+        history.record(make_quote("ETH-USD", ts, 10.0 + ts))
+    history.save_snapshot(path)
+
+    restored = QuoteHistory(max_points=10, max_instruments=10)
+    assert restored.load_snapshot(path) == 2
+    assert restored.aggregate("BTC-BRL", 60, 60) == history.aggregate("BTC-BRL", 60, 60)
+    assert restored.load_snapshot(str(tmp_path / "missing.bin")) == 0
+
+
+def test_history_endpoint():
+    """Test the history endpoint response and parameter validation"""
+    quote_history.clear()
+    quote_history.record(make_quote("BTC-BRL", 120, 100.0))
+    client = TestClient(app)
+
+    response = client.get("/api/v1/finance/active/BTC-BRL/history?interval=1m&window=1h")
+    assert response.status_code == 200
+    assert response.json()["candles"][0]["start"] == 120
+
+    assert client.get("/api/v1/finance/active/BTC-BRL/history?interval=1x").status_code == 400
+    assert client.get("/api/v1/finance/active/SOL-USD/history").status_code == 404
@@ -0,0 +1,127 @@
+import pytest
+import httpx
+import respx
+from app.core.exceptions import DeadlineExceededError, ExternalAPIServiceError, InstrumentNotFoundError
+from app.schemas.coin_desk import BTCData
+from app.services.circuit_breaker import AsyncCircuitBreaker
+from app.services.coin_desk_api_service import ExternalApiService, create_coin_desk_provider, quote_cache
+from app.services.concurrency_limiter import AdaptiveConcurrencyLimiter
+from app.services.quote_providers import ProviderRegistry, QuoteProvider
+from app.services.retry_policy import RetryBudget, RetryPolicy
+from test_finance_batch import make_tick, tick_handler
+
+
+class FakeProvider(QuoteProvider):
+    def __init__(self, name, fail=False, instruments=None):
+        super().__init__(
+            name,
+            breaker=AsyncCircuitBreaker(fail_max=1, reset_timeout=30, state_name=name),
+            retry_policy=RetryPolicy(name, max_attempts=1, backoff_base=0, backoff_max=0,
+                                     budget=RetryBudget(ratio=0, window=1, min_per_second=0)),
+            concurrency_limiter=AdaptiveConcurrencyLimiter(name),
+            instruments=instruments
+        )
+        self.fail = fail
+        self.calls = 0
+
+    async def _fetch_ticks(self, client, actives, deadline, priority):
+        self.calls += 1
+        if self.fail:
+            raise ExternalAPIServiceError(f"{self.name} fora do ar")
+        return {active: BTCData(**make_tick(active)) for active in actives}, {}
+
+
+@pytest.mark.asyncio
+async def test_candidates_prefer_available_and_fastest_providers():
+    """Test routing by recent latency, with open breakers and unsupported instruments last or excluded"""
+    slow, fast, broken, limited = FakeProvider("slow"), FakeProvider("fast"), FakeProvider("broken"), FakeProvider("limited", instruments=["ETH-USD"])
+    slow.latency, fast.latency, broken.latency = 0.5, 0.1, 0.01
+    await broken.breaker.fail()
+    registry = ProviderRegistry([slow, fast, broken, limited])
+
+    candidates = await registry.candidates(["BTC-BRL"])
+
+    assert [provider.name for provider in candidates] == ["fast", "slow", "broken"]
+
+
+
+@pytest.mark.asyncio
+async def test_unobserved_providers_rank_after_measured_ones_in_registration_order():
+    """Test that a provider without observed latency does not jump ahead of a measured one"""
+    primary, first_mirror, second_mirror = FakeProvider("primary"), FakeProvider("mirror_1"), FakeProvider("mirror_2")
+    registry = ProviderRegistry([primary, first_mirror, second_mirror])
+
+    assert [provider.name for provider in await registry.candidates(["BTC-BRL"])] == ["primary", "mirror_1", "mirror_2"]
+
+    primary.latency = 0.3
+    second_mirror.latency = 0.5
+    assert [provider.name for provider in await registry.candidates(["BTC-BRL"])] == ["primary", "mirror_2", "mirror_1"]
+
+@pytest.mark.asyncio
+async def test_failing_provider_fails_over_and_is_penalized():
+    """Test that a failing provider hands over to the next one and loses its routing priority"""
+    primary, secondary = FakeProvider("primary", fail=True), FakeProvider("secondary")
+    primary.latency, secondary.latency = 0.01, 0.2
+    registry = ProviderRegistry([primary, secondary])
+
+    quotes, errors = await registry.fetch_ticks(None, ["BTC-BRL"])
+
+    assert set(quotes) == {"BTC-BRL"} and errors == {}
+    assert primary.calls == 1 and secondary.calls == 1
+    assert [provider.name for provider in await registry.candidates(["BTC-BRL"])] == ["secondary", "primary"]
+
+    secondary.fail = True
+    with pytest.raises(ExternalAPIServiceError):
+        await registry.fetch_ticks(None, ["BTC-BRL"])
+
+
+
+@pytest.mark.asyncio
+async def test_request_errors_do_not_penalize_provider_latency():
+    """Test that unknown symbols and caller deadlines leave the latency average untouched, unlike provider failures"""
+    provider = FakeProvider("penalized")
+    provider.latency = 0.1
+    for error in (InstrumentNotFoundError("Ativo NOPE-USD não encontrado"), DeadlineExceededError("prazo esgotado")):
+        async def raise_error(client, actives, deadline, priority, error=error):
+            raise error
+        provider._fetch_ticks = raise_error
+        with pytest.raises(type(error)):
+            await provider.fetch_ticks(None, ["NOPE-USD"])
+        assert provider.latency == 0.1
+
+    provider.fail = True
+    del provider._fetch_ticks
+    with pytest.raises(ExternalAPIServiceError):
+        await provider.fetch_ticks(None, ["BTC-BRL"])
+    assert provider.latency > 0.1
+
+@pytest.mark.asyncio
+async def test_service_fails_over_to_coin_desk_mirror():
+    """Test that the service reaches a mirror when the primary CoinDesk URL rejects the call"""
+    primary = create_coin_desk_provider("test_primary", "http://primary.test")
+    mirror = create_coin_desk_provider("test_mirror", "http://mirror.test")
+    quote_cache.clear()
+
+    with respx.mock:
+        primary_route = respx.get("http://primary.test/index/cc/v1/latest/tick").mock(return_value=httpx.Response(403))
+        mirror_route = respx.get("http://mirror.test/index/cc/v1/latest/tick").mock(side_effect=tick_handler())
+        async with httpx.AsyncClient() as client:
+            service = ExternalApiService(client=client, registry=ProviderRegistry([primary, mirror]))
+            quote = await service.get_active_by_name("BTC-BRL")
+
+    assert quote.instrument == "BTC-BRL"
+    assert primary_route.call_count == 1 and mirror_route.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_instrument_names_cannot_inject_query_parameters():
+    """Test that instrument names are encoded as a single upstream query value"""
+    provider = create_coin_desk_provider("test_encoding", "http://encoding.test")
+    with respx.mock:
+        route = respx.get("http://encoding.test/index/cc/v1/latest/tick").mock(return_value=httpx.Response(200, json={"Data": {}}))
+        async with httpx.AsyncClient() as client:
+            await provider._fetch_ticks(client, ["BTC-BRL&market=evil"], None, 0)
+
+    params = route.calls[0].request.url.params
+    assert params.get_list("market") == ["cadli"]
+    assert params["instruments"] == "BTC-BRL&market=evil"
@@ -0,0 +1,107 @@
+import pytest
+import asyncio
+from app.api.endpoints.v1.finance_router import _sse_events
+from app.core.exceptions import InstrumentNotFoundError
+from app.services.quote_stream import QuoteStreamHub, StreamEnded, Subscription
+
+
+class FakeQuote:
+    def __init__(self, ccseq):
+        self.ccseq = ccseq
+
+
+class FakeService:
+    def __init__(self):
+        self.calls = 0
+
+    def refresh_active(self, active):
+        self.calls += 1
+        quote = FakeQuote(self.calls)
+
+        async def fetch():
+            return quote
+
+        return asyncio.ensure_future(fetch())
+
+
+class MissingInstrumentService(FakeService):
+    def __init__(self, missing):
+        super().__init__()
+        self.missing = missing
+
+    def refresh_active(self, active):
+        if active != self.missing:
+            return super().refresh_active(active)
+
+        async def fetch():
+            raise InstrumentNotFoundError(detail=f"Ativo {active} não encontrado.")
+
+        return asyncio.ensure_future(fetch())
+
+
+def test_slow_consumer_drops_oldest_quotes():
+    """Test that a full subscriber queue keeps only the most recent quotes"""
+    subscription = Subscription(["BTC-BRL"], transport="test", queue_size=2)
+    for ccseq in range(5):
+        subscription.publish(FakeQuote(ccseq))
+
+    assert subscription.queue.qsize() == 2
+    assert subscription.queue.get_nowait().ccseq == 3
+    assert subscription.queue.get_nowait().ccseq == 4
+
+
+@pytest.mark.asyncio
+async def test_single_poller_fans_out_to_all_subscribers():
+    """Test that subscribers of the same instrument share one poller"""
+    service = FakeService()
+    hub = QuoteStreamHub(service, poll_interval=0.01, queue_size=8)
+    first = hub.subscribe(["BTC-BRL"], transport="test")
+    second = hub.subscribe(["BTC-BRL"], transport="test")
+
+    quotes = await asyncio.gather(first.get(), second.get())
+
+    assert quotes[0] is quotes[1]
+    assert len(hub._pollers) == 1
+
+    hub.unsubscribe(first)
+    assert len(hub._pollers) == 1
+    hub.unsubscribe(second)
+    assert hub._pollers == {}
+    await hub.close()
+
+
+@pytest.mark.asyncio
+async def test_missing_instrument_ends_its_subscriptions():
+    """Test that subscribers are told when their instrument disappears and the subscriber set is dropped"""
+    hub = QuoteStreamHub(MissingInstrumentService("GHOST"), poll_interval=0.01, queue_size=8)
+    only_missing = hub.subscribe(["GHOST"], transport="test")
+    mixed = hub.subscribe(["GHOST", "BTC-BRL"], transport="test")
+
+    ended = await asyncio.wait_for(only_missing.get(), timeout=1)
+    assert isinstance(ended, StreamEnded)
+    assert ended.instrument == "GHOST"
+    assert only_missing.finished
+    assert "GHOST" not in hub._subscribers
+
+    while not isinstance(await asyncio.wait_for(mixed.get(), timeout=1), StreamEnded):
+        pass
+    assert mixed.instruments == {"BTC-BRL"}
+    assert not mixed.finished
+
+    hub.unsubscribe(only_missing)
+    hub.unsubscribe(mixed)
+    assert hub._subscribers == {}
+    await hub.close()
+
+
+@pytest.mark.asyncio
+async def test_sse_stream_closes_after_its_last_instrument_ends():
+    """Test that the SSE stream sends an end event and finishes when no instrument is left"""
+    hub = QuoteStreamHub(MissingInstrumentService("GHOST"), poll_interval=0.01, queue_size=8)
+
+    events = [event async for event in _sse_events(hub, ["GHOST"])]
+
+    assert events[-1].startswith("event: end\n")
+    assert "GHOST" in events[-1]
+    assert hub._subscribers == {}
+    await hub.close()
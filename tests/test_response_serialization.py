@@ -0,0 +1,25 @@
+import json
+from app.schemas.coin_desk import BTCData, BTCDataResponse
+from app.services.coin_desk_api_service import _parse_ticks
+from test_finance_batch import make_tick
+
+
+def test_fast_path_body_matches_response_model():
+    """Test that the memoised body is identical to the response_model serialization"""
+    quote = BTCData(**make_tick("BTC-BRL"))
+    expected = BTCDataResponse(**{"BTC-DATA": quote}).model_dump_json(by_alias=True).encode()
+
+    assert quote.to_response_json() == expected
+    assert quote.to_response_json() is quote.to_response_json()
+
+
+def test_parse_ticks_keeps_valid_instruments_when_one_is_invalid():
+    """Test that one malformed instrument does not discard the rest of the payload"""
+    broken = make_tick("ETH-USD")
+    broken["VALUE"] = "not-a-number"
+    content = json.dumps({"Data": {"BTC-BRL": make_tick("BTC-BRL"), "ETH-USD": broken}, "Err": {}}).encode()
+
+    quotes, errors = _parse_ticks(content, ["BTC-BRL", "ETH-USD", "SOL-USD"])
+
+    assert set(quotes) == {"BTC-BRL"}
+    assert set(errors) == {"ETH-USD", "SOL-USD"}
@@ -0,0 +1,102 @@
+import pytest
+import asyncio
+import httpx
+from app.core.exceptions import DeadlineExceededError
+from app.services.retry_policy import Deadline, RetryBudget, RetryPolicy
+
+
+def make_policy(budget=None, **kwargs):
+    return RetryPolicy(
+        service_name="test_service",
+        max_attempts=kwargs.pop("max_attempts", 3),
+        backoff_base=0.001,
+        backoff_max=0.001,
+        budget=budget or RetryBudget(ratio=1.0, window=10, min_per_second=10),
+        **kwargs
+    )
+
+
+def status_error(status_code):
+    request = httpx.Request("GET", "http://upstream.test/")
+    return httpx.HTTPStatusError("error", request=request, response=httpx.Response(status_code, request=request))
+
+
+@pytest.mark.asyncio
+async def test_server_errors_are_retried_until_success():
+    """Test that 5xx responses are retried up to max_attempts"""
+    calls = 0
+
+    async def flaky():
+        nonlocal calls
+        calls += 1
+        if calls < 3:
+            raise status_error(503)
+        return "ok"
+
+    assert await make_policy().execute(flaky) == "ok"
+    assert calls == 3
+
+
+@pytest.mark.asyncio
+async def test_client_errors_are_never_retried():
+    """Test that 4xx responses fail on the first attempt"""
+    calls = 0
+
+    async def not_found():
+        nonlocal calls
+        calls += 1
+        raise status_error(404)
+
+    with pytest.raises(httpx.HTTPStatusError):
+        await make_policy().execute(not_found)
+    assert calls == 1
+
+
+@pytest.mark.asyncio
+async def test_exhausted_budget_stops_retries():
+    """Test that retries stop once the budget for recent traffic is spent"""
+    budget = RetryBudget(ratio=0.0, window=10, min_per_second=0.1)
+    calls = 0
+
+    async def failing():
+        nonlocal calls
+        calls += 1
+        raise httpx.ConnectTimeout("timeout")
+
+    with pytest.raises(httpx.ConnectTimeout):
+        await make_policy(budget).execute(failing)
+    assert calls == 2
+
+    calls = 0
+    with pytest.raises(httpx.ConnectTimeout):
+        await make_policy(budget).execute(failing)
+    assert calls == 1
+
+
+@pytest.mark.asyncio
+async def test_deadline_bounds_the_call():
+    """Test that a call running past the request deadline raises DeadlineExceededError"""
+    async def slow():
+        await asyncio.sleep(1)
+
+    with pytest.raises(DeadlineExceededError):
+        await make_policy().execute(slow, Deadline.after(0.01))
+
+
+@pytest.mark.asyncio
+async def test_hedge_fires_after_observed_latency_and_first_response_wins():
+    """Test that a slow primary call triggers a hedge whose response is returned"""
+    calls = 0
+
+    async def call():
+        nonlocal calls
+        calls += 1
+        if calls == 1:
+            await asyncio.sleep(1)
+            return "primary"
+        return "hedge"
+
+    policy = make_policy(hedge_enabled=True, hedge_min_delay=0.001, hedge_delay_source=lambda: 0.01)
+
+    assert await policy.execute(call, Deadline.after(0.5)) == "hedge"
+    assert calls == 2
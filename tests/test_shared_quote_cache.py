@@ -0,0 +1,71 @@
+import pytest
+import httpx
+import respx
+from fakeredis import FakeServer
+from fakeredis.aioredis import FakeRedis
+from app.schemas.coin_desk import BTCData
+from app.services.coin_desk_api_service import ExternalApiService, quote_cache
+from app.services.shared_quote_cache import RedisQuoteCache
+from test_finance_batch import TICK_URL, make_tick, tick_handler
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.mark.asyncio
+async def test_set_many_and_get_many_round_trip_with_ttl():
+    """Test that quotes written in one pipeline are read back with one MGET and expire"""
+    redis = FakeRedis()
+    cache = RedisQuoteCache(redis, ttl=5)
+    quote = BTCData(**make_tick("BTC-BRL"))
+
+    await cache.set_many({"BTC-BRL": quote})
+    found = await cache.get_many(["BTC-BRL", "ETH-USD"])
+
+    assert found == {"BTC-BRL": quote}
+    assert 0 < await redis.pttl("dummy_api:quote:BTC-BRL") <= 5000
+
+
+@pytest.mark.asyncio
+async def test_unreachable_redis_falls_back_to_local_state():
+    """Test that Redis errors behave as misses and skip Redis until retry_after passes"""
+    server = FakeServer()
+    server.connected = False
+    clock = FakeClock()
+    cache = RedisQuoteCache(FakeRedis(server=server), ttl=5, retry_after=5, clock=clock)
+
+    assert await cache.get_many(["BTC-BRL"]) == {}
+    await cache.set_many({"BTC-BRL": BTCData(**make_tick("BTC-BRL"))})
+    assert cache.available is False
+
+    server.connected = True
+    clock.now = 5
+    assert cache.available is True
+    assert await cache.get_many(["BTC-BRL"]) == {}
+
+
+@pytest.mark.asyncio
+async def test_replicas_share_quotes_through_redis():
+    """Test that a quote fetched by one replica is served to another without an upstream call"""
+    server = FakeServer()
+    with respx.mock:
+        route = respx.get(TICK_URL).mock(side_effect=tick_handler())
+        async with httpx.AsyncClient() as client:
+            quote_cache.clear()
+            replica_a = ExternalApiService(client=client, shared_cache=RedisQuoteCache(FakeRedis(server=server), ttl=5))
+            await replica_a.get_actives_by_names(["BTC-BRL", "ETH-USD"])
+
+            quote_cache.clear()
+            replica_b = ExternalApiService(client=client, shared_cache=RedisQuoteCache(FakeRedis(server=server), ttl=5))
+            quote = await replica_b.get_active_by_name("BTC-BRL")
+            quotes, errors = await replica_b.get_actives_by_names(["ETH-USD", "SOL-USD"])
+
+    assert route.call_count == 2
+    assert route.calls[1].request.url.params["instruments"] == "SOL-USD"
+    assert quote.instrument == "BTC-BRL"
+    assert set(quotes) == {"ETH-USD", "SOL-USD"} and errors == {}
@@ -0,0 +1,109 @@
+import asyncio
+import json
+import pytest
+import respx
+from fastapi import FastAPI
+from httpx import AsyncClient, ASGITransport
+from prometheus_client import REGISTRY
+from app.core.tracing import NOOP_SPAN, SpanExporter, Trace, TracingMiddleware, _current_trace, span
+from app.main import app
+from app.services.coin_desk_api_service import quote_cache
+from test_finance_batch import TICK_URL, tick_handler
+
+TRACEPARENT = "00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01"
+
+
+def make_app(sample_rate: float, trusted_networks=("127.0.0.1/32",)) -> FastAPI:
+    traced = FastAPI()
+    traced.add_middleware(TracingMiddleware, sample_rate=sample_rate, trusted_networks=trusted_networks)
+
+    @traced.get("/work")
+    async def work():
+        with span("upstream"):
+            await asyncio.sleep(0.01)
+        return {"ok": True}
+
+    return traced
+
+
+def test_span_is_noop_outside_traced_requests():
+    """Test that spans cost nothing when the request was not sampled"""
+    assert span("upstream") is NOOP_SPAN
+
+
+@pytest.mark.asyncio
+async def test_sampled_request_reports_server_timing():
+    """Test that a sampled request gets per-stage timings in the header and the histogram"""
+    before = REGISTRY.get_sample_value("dummy_api_request_stage_duration_seconds_count", {"stage": "upstream"}) or 0
+
+    async with AsyncClient(transport=ASGITransport(app=make_app(sample_rate=1.0)), base_url="http://test") as client:
+        response = await client.get("/work")
+
+    timing = dict(item.split(";dur=") for item in response.headers["Server-Timing"].split(", "))
+    assert float(timing["upstream"]) >= 10
+    assert float(timing["total"]) >= float(timing["upstream"])
+    assert REGISTRY.get_sample_value("dummy_api_request_stage_duration_seconds_count", {"stage": "upstream"}) == before + 1
+
+
+@pytest.mark.asyncio
+async def test_traceparent_overrides_sampling():
+    """Test that the W3C sampled flag from a trusted client forces tracing on and off"""
+    async with AsyncClient(transport=ASGITransport(app=make_app(sample_rate=0.0)), base_url="http://test") as client:
+        assert "Server-Timing" not in (await client.get("/work")).headers
+        assert "Server-Timing" in (await client.get("/work", headers={"traceparent": TRACEPARENT})).headers
+
+    async with AsyncClient(transport=ASGITransport(app=make_app(sample_rate=1.0)), base_url="http://test") as client:
+        response = await client.get("/work", headers={"traceparent": TRACEPARENT[:-2] + "00"})
+    assert "Server-Timing" not in response.headers
+
+
+@pytest.mark.asyncio
+async def test_untrusted_traceparent_follows_local_sample_rate():
+    """Test that the sampled flag from an untrusted client neither forces nor suppresses tracing"""
+    async with AsyncClient(transport=ASGITransport(app=make_app(sample_rate=0.0, trusted_networks=["10.0.0.0/8"])), base_url="http://test") as client:
+        forced = await client.get("/work", headers={"traceparent": TRACEPARENT})
+    async with AsyncClient(transport=ASGITransport(app=make_app(sample_rate=1.0, trusted_networks=())), base_url="http://test") as client:
+        suppressed = await client.get("/work", headers={"traceparent": TRACEPARENT[:-2] + "00"})
+
+    assert "Server-Timing" not in forced.headers
+    assert "Server-Timing" in suppressed.headers
+
+
+@pytest.mark.asyncio
+async def test_finance_request_breaks_down_upstream_stages():
+    """Test that the finance endpoint reports rate limit, breaker, upstream and parsing stages"""
+    quote_cache.clear()
+    with respx.mock:
+        respx.get(TICK_URL).mock(side_effect=tick_handler())
+        async with app.router.lifespan_context(app):
+            async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+                response = await client.get("/api/v1/finance/active/TRACE-USD", headers={"traceparent": TRACEPARENT})
+
+    assert response.status_code == 200
+    stages = {item.split(";")[0] for item in response.headers["Server-Timing"].split(", ")}
+    assert {"rate_limit", "concurrency_queue", "breaker", "upstream", "parse", "serialize", "total"} <= stages
+
+
+def test_exporter_writes_otlp_json_lines(tmp_path):
+    """Test that finished traces are written as OTLP/JSON with parent links"""
+    trace = Trace(trace_id="0af7651916cd43dd8448eb211c80319c")
+    token = _current_trace.set(trace)
+    try:
+        with span("upstream", provider="coin_desk_api"):
+            with span("parse"):
+                pass
+    finally:
+        _current_trace.reset(token)
+
+    path = tmp_path / "traces.jsonl"
+    exporter = SpanExporter(path=str(path))
+    exporter.start()
+    exporter.export(trace)
+    exporter.stop()
+
+    payload = json.loads(path.read_text().splitlines()[0])
+    spans = {item["name"]: item for item in payload["resourceSpans"][0]["scopeSpans"][0]["spans"]}
+    assert spans["upstream"]["traceId"] == trace.trace_id
+    assert spans["upstream"]["parentSpanId"] == trace.root_span_id
+    assert spans["parse"]["parentSpanId"] == spans["upstream"]["spanId"]
+    assert spans["upstream"]["attributes"] == [{"key": "provider", "value": {"stringValue": "coin_desk_api"}}]
@@ -0,0 +1,112 @@
+import asyncio
+import time
+import pytest
+from prometheus_client import REGISTRY
+from app.schemas.coin_desk import BTCData
+from app.services.circuit_breaker import STATE_CLOSED, STATE_OPEN
+from app.services.prefetch_scheduler import InstrumentPopularity
+from app.services.quote_cache import AsyncTTLCache
+from app.services.quote_providers import ProviderRegistry
+from app.services.warm_start import WarmStartSnapshotter, encode_snapshot
+from test_finance_batch import make_tick
+from test_quote_providers import FakeProvider
+
+
+class FakeService:
+    def __init__(self, cache):
+        self.cache = cache
+        self.requested = []
+
+    async def get_actives_by_names(self, actives):
+        self.requested.extend(actives)
+        for active in actives:
+            self.cache.set(active, BTCData(**make_tick(active)))
+        return {}, {}
+
+
+def make_snapshotter(path, max_age: float = 15):
+    cache = AsyncTTLCache("warm_start_test", ttl=5, max_size=100, max_staleness=10)
+    popularity = InstrumentPopularity()
+    registry = ProviderRegistry([FakeProvider("warm_start_primary")])
+    snapshotter = WarmStartSnapshotter(
+        path=str(path), interval=30, max_age=max_age, max_instruments=10,
+        service=FakeService(cache), cache=cache, popularity=popularity, registry=registry
+    )
+    return snapshotter, cache, popularity, registry
+
+
+def restored_total(kind: str, result: str) -> float:
+    return REGISTRY.get_sample_value("dummy_api_warm_start_entries_total", {"kind": kind, "result": result}) or 0
+
+
+@pytest.mark.asyncio
+async def test_snapshot_round_trip(tmp_path):
+    """Test that quotes, popularity and breaker windows saved on shutdown are restored on startup"""
+    path = tmp_path / "warm.bin"
+    snapshotter, cache, popularity, registry = make_snapshotter(path)
+    quote = BTCData(**make_tick("WARM-BRL"))
+    cache.set("WARM-BRL", quote)
+    popularity.record("WARM-BRL")
+    popularity.record("COLD-BRL")
+    registry.providers[0].breaker.restore_state(STATE_CLOSED, 0, [True, False, False])
+    await snapshotter.save()
+
+    restored, restored_cache, restored_popularity, restored_registry = make_snapshotter(path)
+    assert sorted(restored.load()) == ["COLD-BRL", "WARM-BRL"]
+    assert restored_cache.get("WARM-BRL") == quote
+    assert restored_cache.get("COLD-BRL") is None
+    assert dict(restored_popularity.top_scores(10)).keys() == {"WARM-BRL", "COLD-BRL"}
+    breaker = restored_registry.providers[0].breaker
+    assert list(breaker.window) == [True, False, False]
+    assert breaker.fail_counter == 1
+
+
+def test_expired_quotes_are_discarded(tmp_path):
+    """Test that quotes older than the maximum age are not restored"""
+    path = tmp_path / "warm.bin"
+    now = time.time()
+    path.write_bytes(encode_snapshot(now - 20, [], [
+        ("OLD-BRL", 1.0, (BTCData(**make_tick("OLD-BRL")), now - 20)),
+        ("NEW-BRL", 1.0, (BTCData(**make_tick("NEW-BRL")), now - 2)),
+    ]))
+    expired_before = restored_total("quote", "expired")
+
+    snapshotter, cache, _, _ = make_snapshotter(path, max_age=15)
+    snapshotter.load()
+
+    assert cache.get("OLD-BRL") is None
+    assert cache.get("NEW-BRL") is not None
+    assert 0 < cache.time_to_expiry("NEW-BRL") <= 3
+    assert restored_total("quote", "expired") == expired_before + 1
+
+
+def test_open_breaker_stays_open_for_remaining_timeout(tmp_path):
+    """Test that a breaker open before the restart rejects calls only for what was left of its reset timeout"""
+    path = tmp_path / "warm.bin"
+    path.write_bytes(encode_snapshot(time.time() - 5, [("warm_start_primary", STATE_OPEN, 10.0, [True])], []))
+
+    snapshotter, _, _, registry = make_snapshotter(path)
+    snapshotter.load()
+
+    state, open_age, _ = registry.providers[0].breaker.export_state()
+    assert state == STATE_OPEN
+    assert 15 <= open_age < 16
+
+
+@pytest.mark.asyncio
+async def test_missing_hot_instruments_are_fetched_and_time_to_warm_is_reported(tmp_path):
+    """Test that hot instruments without a valid quote are fetched in one batch after startup"""
+    path = tmp_path / "warm.bin"
+    path.write_bytes(encode_snapshot(time.time(), [], [("HOT-BRL", 2.0, None), ("HOT-USD", 1.0, None)]))
+
+    snapshotter, cache, _, _ = make_snapshotter(path)
+    snapshotter.start()
+    for _ in range(50):
+        if cache.get("HOT-BRL") is not None and cache.get("HOT-USD") is not None:
+            break
+        await asyncio.sleep(0.01)
+    await asyncio.sleep(0.2)
+    await snapshotter.stop()
+
+    assert snapshotter.service.requested == ["HOT-BRL", "HOT-USD"]
+    assert REGISTRY.get_sample_value("dummy_api_warm_start_time_to_warm_seconds") > 0
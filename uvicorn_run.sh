@@ -1 +1 @@
-poetry run uvicorn app.main:app --host 0.0.0.0 --port 8000 --reload
\ No newline at end of file
+poetry run uvicorn --factory app.main:create_app --host 0.0.0.0 --port 8000 --reload
\ No newline at end of file